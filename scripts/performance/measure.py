@@ -3,9 +3,29 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+"""Measure the startup time of common `az` commands.
+
+Usage: python measure.py [--loop N] [--max-mean SECONDS]
+
+With --max-mean, the script exits with a non-zero code if the mean real time of any scenario exceeds the given
+threshold, so that startup regressions can be caught in CI.
+"""
+
+import argparse
 import sys
 from subprocess import check_output, STDOUT, CalledProcessError
 
+SCENARIOS = [
+    'az',
+    'az version',
+    'az cloud list',
+    'az group list -h',
+    'az vm show -h',
+    'az network vnet create -h',
+    'az cloud show --this-does-not-exist'
+]
+
+
 def mean(data):
     """Return the sample arithmetic mean of data."""
     n = len(data)
@@ -37,7 +57,7 @@ def scenario(command, loop=10):
     test_command = 'time -p ' + command
     for i in range(loop):
         try:
-            lines = check_output([test_command], shell=True, stderr=STDOUT).split('\n')
+            lines = check_output([test_command], shell=True, stderr=STDOUT, universal_newlines=True).split('\n')
         except CalledProcessError as e:
             lines = e.output.split('\n')
         real_time = float(lines[-4].split()[1])
@@ -52,9 +72,29 @@ def scenario(command, loop=10):
     print('User: mean => {} \t pstdev => {}'.format(mean(user), pstdev(user)))
     print('Syst: mean => {} \t pstdev => {}'.format(mean(syst), pstdev(syst)))
     print('')
+    return mean(real)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the startup time of common az commands.')
+    parser.add_argument('--loop', type=int, default=10, help='Number of runs per scenario.')
+    parser.add_argument('--max-mean', type=float, default=None,
+                        help='Fail if the mean real time of any scenario exceeds this value in seconds.')
+    args = parser.parse_args()
+
+    # Warm up the command index, so that the first scenario doesn't pay for building it
+    check_output(['az version'], shell=True, stderr=STDOUT)
+
+    slow_scenarios = []
+    for command in SCENARIOS:
+        real_mean = scenario(command, args.loop)
+        if args.max_mean is not None and real_mean > args.max_mean:
+            slow_scenarios.append((command, real_mean))
+
+    for command, real_mean in slow_scenarios:
+        print('Regression: `{}` took {:.3f}s on average, exceeding {}s'.format(command, real_mean, args.max_mean))
+    sys.exit(1 if slow_scenarios else 0)
+
 
-scenario('az')
-scenario('az cl')
-scenario('az cloud')
-scenario('az cloud list')
-scenario('az cloud show --this-does-not-exist')
+if __name__ == '__main__':
+    main()
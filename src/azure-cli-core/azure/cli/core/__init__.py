@@ -264,8 +264,9 @@ class MainCommandsLoader(CLICommandsLoader):
                 try:
                     start_time = timeit.default_timer()
                     module_command_table, module_group_table = _load_module_command_loader(self, args, mod)
-                    for cmd in module_command_table.values():
+                    for cmd_name, cmd in module_command_table.items():
                         cmd.command_source = mod
+                        loaded_command_modules[cmd_name].append(cmd.loader.__module__)
                     self.command_table.update(module_command_table)
                     self.command_group_table.update(module_group_table)
 
@@ -366,6 +367,7 @@ class MainCommandsLoader(CLICommandsLoader):
                                 overrides_command=cmd_name in module_commands,
                                 preview=ext.preview,
                                 experimental=ext.experimental)
+                            loaded_command_modules[cmd_name].append(cmd.loader.__module__)
 
                         self.command_table.update(extension_command_table)
                         self.command_group_table.update(extension_group_table)
@@ -420,6 +422,10 @@ class MainCommandsLoader(CLICommandsLoader):
         # Clear the tables to make this method idempotent
         self.command_group_table.clear()
         self.command_table.clear()
+        # Every module and extension registering a command, in loading order, like
+        # {"hello overridden": ["azure.cli.command_modules.hello", "azext_hello2"]}
+        from collections import defaultdict
+        loaded_command_modules = defaultdict(list)
 
         command_index = None
         # Set fallback=False to turn off command index in case of regression
@@ -467,6 +473,7 @@ class MainCommandsLoader(CLICommandsLoader):
 
         # No module found from the index. Load all command modules and extensions
         logger.debug("Loading all modules and extensions")
+        loaded_command_modules.clear()
         _update_command_table_from_modules(args)
 
         ext_suppressions = _get_extension_suppressions(self.loaders)
@@ -476,7 +483,7 @@ class MainCommandsLoader(CLICommandsLoader):
         logger.debug("Loaded %d groups, %d commands.", len(self.command_group_table), len(self.command_table))
 
         if use_command_index:
-            command_index.update(self.command_table)
+            command_index.update(self.command_table, loaded_command_modules)
 
         return self.command_table
 
@@ -526,6 +533,8 @@ class CommandIndex:
     _COMMAND_INDEX = 'commandIndex'
     _COMMAND_INDEX_VERSION = 'version'
     _COMMAND_INDEX_CLOUD_PROFILE = 'cloudProfile'
+    _COMMAND_INDEX_EXTENSIONS = 'extensions'
+    _COMMAND_PATH_INDEX = 'commandPathIndex'
 
     def __init__(self, cli_ctx=None):
         """Class to manage command index.
@@ -554,11 +563,25 @@ class CommandIndex:
             self.invalidate()
             return None
 
+        # Extensions may be added or removed without `az extension` commands, like deleting the extension
+        # folder or changing the extension directory, which doesn't invalidate the command index.
+        if self.INDEX[self._COMMAND_INDEX_EXTENSIONS] != self._get_extensions_signature():
+            logger.debug("Installed extensions don't match the command index.")
+            self.invalidate()
+            return None
+
         # Make sure the top-level command is provided, like `az version`.
         # Skip command index for `az` or `az --help`.
         if not args or args[0].startswith('-'):
             return None
 
+        # Prefer the full command path index, so that `network vnet show` only loads the module that
+        # registers it, instead of every module and extension under `network`
+        index_modules_extensions = self._get_by_command_path(args)
+        if index_modules_extensions:
+            logger.debug("Modules found from command path index for '%s': %s", args, index_modules_extensions)
+            return self._split_modules_extensions(index_modules_extensions)
+
         # Get the top-level command, like `network` in `network vnet create -h`
         top_command = args[0]
         index = self.INDEX[self._COMMAND_INDEX]
@@ -567,35 +590,81 @@ class CommandIndex:
         index_modules_extensions = index.get(top_command)
 
         if index_modules_extensions:
-            # This list contains both built-in modules and extensions
-            index_builtin_modules = []
-            index_extensions = []
             # Found modules from index
             logger.debug("Modules found from index for '%s': %s", top_command, index_modules_extensions)
-            command_module_prefix = 'azure.cli.command_modules.'
-            for m in index_modules_extensions:
-                if m.startswith(command_module_prefix):
-                    # The top-level command is from a command module
-                    index_builtin_modules.append(m[len(command_module_prefix):])
-                elif m.startswith('azext_'):
-                    # The top-level command is from an extension
-                    index_extensions.append(m)
-                else:
-                    logger.warning("Unrecognized module: %s", m)
-            return index_builtin_modules, index_extensions
+            return self._split_modules_extensions(index_modules_extensions)
 
         return None
 
-    def update(self, command_table):
+    def _get_by_command_path(self, args):
+        """Get the modules and extensions of the longest command or command group matching `args`.
+
+        :param args: command arguments, like ['network', 'vnet', 'show', '-g', 'rg']
+        :return: a list of module and extension names, or None if nothing matches.
+        """
+        path_index = self.INDEX[self._COMMAND_PATH_INDEX]
+        if not path_index:
+            return None
+
+        from azure.cli.core.util import roughly_parse_command
+        nouns = roughly_parse_command(args).split()
+        # Try the longest path first. Trailing words may be positional arguments, like `vm create` in
+        # `az find vm create`
+        for i in range(len(nouns), 0, -1):
+            path = ' '.join(nouns[:i])
+            if path in path_index:
+                return path_index[path]
+            # A command group needs all modules and extensions that register a command under it
+            group_prefix = path + ' '
+            group_modules = []
+            for command_name, modules in path_index.items():
+                if command_name.startswith(group_prefix):
+                    group_modules.extend(m for m in modules if m not in group_modules)
+            if group_modules:
+                return group_modules
+        return None
+
+    @staticmethod
+    def _get_extensions_signature():
+        """Get a cheap signature of the installed extensions, made of the entries and modification time of each
+        extension directory. Unlike `get_extensions`, it doesn't inspect every extension, as it runs on startup."""
+        from azure.cli.core.extension import EXTENSIONS_DIR, EXTENSIONS_SYS_DIR, DEV_EXTENSION_SOURCES
+        signature = []
+        for ext_dir in [EXTENSIONS_DIR, EXTENSIONS_SYS_DIR] + DEV_EXTENSION_SOURCES:
+            try:
+                signature.append([ext_dir, os.stat(ext_dir).st_mtime, sorted(os.listdir(ext_dir))])
+            except OSError:
+                signature.append([ext_dir, None, []])
+        return signature
+
+    @staticmethod
+    def _split_modules_extensions(index_modules_extensions):
+        # This list contains both built-in modules and extensions
+        index_builtin_modules = []
+        index_extensions = []
+        command_module_prefix = 'azure.cli.command_modules.'
+        for m in index_modules_extensions:
+            if m.startswith(command_module_prefix):
+                # The command is from a command module
+                index_builtin_modules.append(m[len(command_module_prefix):])
+            elif m.startswith('azext_'):
+                # The command is from an extension
+                index_extensions.append(m)
+            else:
+                logger.warning("Unrecognized module: %s", m)
+        return index_builtin_modules, index_extensions
+
+    def update(self, command_table, command_modules=None):
         """Update the command index according to the given command table.
 
         :param command_table: The command table built by azure.cli.core.MainCommandsLoader.load_command_table
+        :param command_modules: A {command: [module]} mapping of all modules and extensions registering each
+         command, in loading order. If not provided, only the module of the command's loader is indexed.
         """
         start_time = timeit.default_timer()
-        self.INDEX[self._COMMAND_INDEX_VERSION] = __version__
-        self.INDEX[self._COMMAND_INDEX_CLOUD_PROFILE] = self.cloud_profile
         from collections import defaultdict
         index = defaultdict(list)
+        path_index = {}
 
         # self.cli_ctx.invocation.commands_loader.command_table doesn't exist in DummyCli due to the lack of invocation
         for command_name, command in command_table.items():
@@ -605,8 +674,17 @@ class CommandIndex:
             module_name = command.loader.__module__
             if module_name not in index[top_command]:
                 index[top_command].append(module_name)
+            # Full command path: <vm create>. Keep every module registering the command, as an extension
+            # overriding a built-in command still needs the built-in module to know that it overrides it
+            path_index[command_name] = list((command_modules or {}).get(command_name) or [module_name])
+        # Write the command index file only once
+        with self.INDEX.batch():
+            self.INDEX[self._COMMAND_INDEX_VERSION] = __version__
+            self.INDEX[self._COMMAND_INDEX_CLOUD_PROFILE] = self.cloud_profile
+            self.INDEX[self._COMMAND_INDEX_EXTENSIONS] = self._get_extensions_signature()
+            self.INDEX[self._COMMAND_INDEX] = index
+            self.INDEX[self._COMMAND_PATH_INDEX] = path_index
         elapsed_time = timeit.default_timer() - start_time
-        self.INDEX[self._COMMAND_INDEX] = index
         logger.debug("Updated command index in %.3f seconds.", elapsed_time)
 
     def invalidate(self):
@@ -620,9 +698,12 @@ class CommandIndex:
 
         This function can be called when removing extensions.
         """
-        self.INDEX[self._COMMAND_INDEX_VERSION] = ""
-        self.INDEX[self._COMMAND_INDEX_CLOUD_PROFILE] = ""
-        self.INDEX[self._COMMAND_INDEX] = {}
+        with self.INDEX.batch():
+            self.INDEX[self._COMMAND_INDEX_VERSION] = ""
+            self.INDEX[self._COMMAND_INDEX_CLOUD_PROFILE] = ""
+            self.INDEX[self._COMMAND_INDEX_EXTENSIONS] = []
+            self.INDEX[self._COMMAND_INDEX] = {}
+            self.INDEX[self._COMMAND_PATH_INDEX] = {}
         logger.debug("Command index has been invalidated.")
 
 
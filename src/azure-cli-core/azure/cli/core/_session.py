@@ -6,7 +6,10 @@
 import json
 import logging
 import os
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
 
 try:
     import collections.abc as collections
@@ -28,7 +31,14 @@ class Session(collections.MutableMapping):
     A simple dict-like class that is backed by a JSON file.
 
     All direct modifications will save the file. Indirect modifications should
-    be followed by a call to `save_with_retry` or `save`.
+    be followed by a call to `save_with_retry` or `save`. Modifications made within
+    `batch()` are saved once when the outermost batch exits.
+
+    The file is replaced atomically and writers hold an exclusive lock on `<filename>.lock`,
+    so concurrent processes never observe or produce a partially written file.
+
+    Saving, setting, deleting and batching are thread-safe. Reading or modifying nested values from several
+    threads must be synchronized by the caller.
     """
 
     def __init__(self, encoding=None):
@@ -36,6 +46,9 @@ class Session(collections.MutableMapping):
         self.filename = None
         self.data = {}
         self._encoding = encoding if encoding else 'utf-8-sig'
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
 
     def load(self, filename, max_age=0):
         self.filename = filename
@@ -61,19 +74,57 @@ class Session(collections.MutableMapping):
             self.save()
 
     def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
         if self.filename:
-            with codecs_open(self.filename, 'w', encoding=self._encoding) as f:
-                json.dump(self.data, f)
+            dir_name, base_name = os.path.split(os.path.abspath(self.filename))
+            with _file_lock(self.filename + '.lock'):
+                fd, temp_path = tempfile.mkstemp(prefix=base_name + '.', suffix='.tmp', dir=dir_name)
+                os.close(fd)
+                try:
+                    with codecs_open(temp_path, 'w', encoding=self._encoding) as f:
+                        json.dump(self.data, f)
+                    if os.path.exists(self.filename):
+                        # Keep the permissions of the existing file instead of the private ones of the temp file
+                        os.chmod(temp_path, os.stat(self.filename).st_mode)
+                    os.replace(temp_path, self.filename)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+            self._dirty = False
 
     def save_with_retry(self, retries=5):
-        for _ in range(retries - 1):
-            try:
+        with self._lock:
+            if self._batch_depth:
+                self._dirty = True
+                return
+            for _ in range(retries - 1):
+                try:
+                    self.save()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            else:
                 self.save()
-                break
-            except OSError:
-                time.sleep(0.1)
-        else:
-            self.save()
+
+    @contextmanager
+    def batch(self):
+        """Defer saving the file until the outermost batch exits, so that several modifications are written once.
+
+        Batches opened by different threads are counted together, the file is saved once all of them exit.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self.save_with_retry()
 
     def get(self, key, default=None):
         return self.data.get(key, default)
@@ -82,12 +133,14 @@ class Session(collections.MutableMapping):
         return self.data.setdefault(key, {})
 
     def __setitem__(self, key, value):
-        self.data[key] = value
-        self.save_with_retry()
+        with self._lock:
+            self.data[key] = value
+            self.save_with_retry()
 
     def __delitem__(self, key):
-        del self.data[key]
-        self.save_with_retry()
+        with self._lock:
+            del self.data[key]
+            self.save_with_retry()
 
     def __iter__(self):
         return iter(self.data)
@@ -96,6 +149,54 @@ class Session(collections.MutableMapping):
         return len(self.data)
 
 
+@contextmanager
+def _file_lock(lock_path):
+    """Hold an exclusive inter-process lock on `lock_path`. Locking is skipped if the platform doesn't support it.
+
+    The lock file is removed on release where the platform allows it, so that it doesn't clutter the config directory.
+    """
+    while True:
+        try:
+            lock_file = open(lock_path, 'a')
+        except (OSError, IOError):
+            yield
+            return
+        try:
+            _lock_file(lock_file)
+        except BaseException:
+            lock_file.close()
+            raise
+        # The previous owner may have removed the lock file between opening and locking it. Locking the removed file
+        # doesn't exclude processes opening a new one, so try again.
+        try:
+            if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                break
+        except OSError:
+            pass
+        lock_file.close()
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            # Windows doesn't allow removing a file while it is open
+            pass
+        # Closing the file releases the lock
+        lock_file.close()
+
+
+def _lock_file(lock_file):
+    try:
+        import fcntl
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    except ImportError:
+        import msvcrt
+        lock_file.seek(0)
+        # LK_LOCK retries for 10 seconds before raising OSError
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+
+
 # ACCOUNT contains subscriptions information
 ACCOUNT = Session()
 
@@ -105,7 +206,8 @@ CONFIG = Session()
 # SESSION provides read-write session variables
 SESSION = Session()
 
-# INDEX contains {top-level command: [command_modules and extensions]} mapping index
+# INDEX contains {top-level command: [command_modules and extensions]} and
+# {full command path: [command_modules and extensions]} mapping indexes
 INDEX = Session()
 
 # VERSIONS provides local versions and pypi versions.
@@ -0,0 +1,369 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""Opt-in resident daemon that amortizes interpreter start-up and module import cost of `az`.
+
+Start the daemon with:
+
+    python -m azure.cli.core.daemon [--socket PATH]
+
+Then set AZURE_CLI_DAEMON_SOCKET to the socket path. `az` forwards argv, environment variables, working directory
+and its stdin/stdout/stderr file descriptors to the daemon over the Unix socket, and exits with the exit code of the
+command. The daemon forks a fresh worker for every request, so `cli_ctx.data`, `Session` objects and local context
+are never shared between requests. If the daemon is not reachable or declines the request, `az` runs the command
+in-process as usual. Once the request has been sent, the daemon may have started the command, so losing the
+connection fails the command instead of running it a second time in-process.
+
+The daemon serves requests from a single-threaded event loop, so that workers are never forked while other threads
+hold locks.
+
+The daemon is only supported on platforms with `os.fork` and Unix domain sockets.
+"""
+
+import array
+import json
+import os
+import socket
+import struct
+import sys
+
+DAEMON_SOCKET_ENV_NAME = 'AZURE_CLI_DAEMON_SOCKET'
+DEFAULT_SOCKET_NAME = 'daemon.sock'
+
+# Environment variables read at import time. Requests with different values can't reuse the modules imported by the
+# daemon and are run in-process by the client instead.
+IMPORT_TIME_ENV_NAMES = ['AZURE_CONFIG_DIR', 'AZURE_EXTENSION_DIR', 'AZURE_EXTENSION_SYS_DIR',
+                         'AZURE_EXTENSION_DEV_SOURCES']
+
+_HEADER_FORMAT = '!I'
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+_STD_FDS = [0, 1, 2]
+_INTERRUPT = b'\x03'
+
+
+def _recv_exactly(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise EOFError('Connection closed after {} of {} bytes.'.format(len(data), size))
+        data += chunk
+    return data
+
+
+def _send_message(conn, message, fds=None):
+    payload = json.dumps(message).encode('utf-8')
+    data = struct.pack(_HEADER_FORMAT, len(payload)) + payload
+    if fds:
+        # File descriptors go with the first bytes, sendmsg may not send the whole message
+        sent = conn.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))])
+        if sent < len(data):
+            conn.sendall(data[sent:])
+    else:
+        conn.sendall(data)
+
+
+def _recv_message(conn, max_fds=0):
+    """Receive a length-prefixed JSON message and the file descriptors sent along with it."""
+    fds = array.array('i')
+    if max_fds:
+        header, ancdata, _, _ = conn.recvmsg(_HEADER_SIZE, socket.CMSG_LEN(max_fds * fds.itemsize))
+        for cmsg_level, cmsg_type, cmsg_data in ancdata:
+            if cmsg_level == socket.SOL_SOCKET and cmsg_type == socket.SCM_RIGHTS:
+                fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+        if not header:
+            raise EOFError('Connection closed before the message header.')
+        header += _recv_exactly(conn, _HEADER_SIZE - len(header))
+    else:
+        header = _recv_exactly(conn, _HEADER_SIZE)
+    size, = struct.unpack(_HEADER_FORMAT, header)
+    return json.loads(_recv_exactly(conn, size).decode('utf-8')), list(fds)
+
+
+def get_default_socket_path():
+    from azure.cli.core._config import GLOBAL_CONFIG_DIR
+    return os.path.join(GLOBAL_CONFIG_DIR, DEFAULT_SOCKET_NAME)
+
+
+def forward_to_daemon(socket_path, args):
+    """Run a command in the daemon listening on `socket_path`.
+
+    :param socket_path: Path of the daemon's Unix socket.
+    :param args: Command arguments, like ['group', 'list'].
+    :return: The exit code of the command, or None if the daemon is not available or declines the request, and
+        the command must be run in-process.
+    """
+    from azure.cli.core import __version__
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            conn.connect(socket_path)
+            _send_message(conn, {'version': __version__, 'argv': args, 'env': dict(os.environ),
+                                 'cwd': os.getcwd()}, fds=_STD_FDS)
+        except OSError:
+            # The daemon never received the whole request, so it can't have run the command
+            return None
+        try:
+            while True:
+                try:
+                    response, _ = _recv_message(conn)
+                    break
+                except KeyboardInterrupt:
+                    # Let the worker handle Ctrl+C the same way as an in-process command
+                    conn.sendall(_INTERRUPT)
+        except (OSError, EOFError, ValueError) as ex:
+            # The command may have started. Running it again in-process could create or delete resources twice.
+            print('Lost the connection to the az daemon, the command may or may not have completed: {}'.format(ex),
+                  file=sys.stderr)
+            return 1
+    finally:
+        conn.close()
+    if response.get('declined'):
+        return None
+    return response.get('exit_code', 1)
+
+
+class AzDaemon:
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._import_time_env = {name: os.environ.get(name) for name in IMPORT_TIME_ENV_NAMES}
+        self._listener = None
+        self._selector = None
+        self._wakeup_r = self._wakeup_w = None
+        # The connection of the client waiting for each worker, by pid
+        self._workers = {}
+
+    def serve_forever(self):
+        import selectors
+        import signal
+        from knack.util import CLIError
+        if not hasattr(os, 'fork') or not hasattr(socket, 'AF_UNIX'):
+            raise CLIError('The az daemon is not supported on this platform.')
+
+        self._warm_up()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the current user may connect to the socket, as requests run with the daemon's credentials
+        old_umask = os.umask(0o177)
+        try:
+            self._listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self._listener.listen(64)
+
+        # Wake up the event loop when a worker exits
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.set_wakeup_fd(self._wakeup_w)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        print('Listening on {}. Set {} to this path to use the daemon.'.format(self.socket_path,
+                                                                               DAEMON_SOCKET_ENV_NAME), flush=True)
+        try:
+            while True:
+                for key, _ in self._selector.select(timeout=1):
+                    if key.fileobj is self._listener:
+                        self._accept()
+                    elif key.fileobj == self._wakeup_r:
+                        _drain(self._wakeup_r)
+                    else:
+                        self._watch_client(key.fileobj, key.data)
+                self._reap_workers()
+        finally:
+            signal.set_wakeup_fd(-1)
+            self._selector.close()
+            self._listener.close()
+            os.remove(self.socket_path)
+
+    @staticmethod
+    def _warm_up():
+        """Import the modules that every command needs, so that forked workers don't pay for them."""
+        from importlib import import_module
+        import pkgutil
+        import azure.cli.core.commands  # pylint: disable=unused-import
+        import azure.cli.core.parser  # pylint: disable=unused-import
+        import azure.cli.core.telemetry  # pylint: disable=unused-import
+        import azure.cli.core._profile  # pylint: disable=unused-import
+        import azure.cli.core._help  # pylint: disable=unused-import
+        import azure.cli.core._output  # pylint: disable=unused-import
+        try:
+            mods_ns_pkg = import_module('azure.cli.command_modules')
+            for _, modname, _ in pkgutil.iter_modules(mods_ns_pkg.__path__):
+                import_module('azure.cli.command_modules.' + modname)
+        except ImportError:
+            pass
+
+    def _get_fallback_reason(self, request):
+        from azure.cli.core import __version__
+        if request.get('version') != __version__:
+            return 'The daemon runs a different version of Azure CLI.'
+        env = request.get('env', {})
+        for name, value in self._import_time_env.items():
+            if env.get(name) != value:
+                return 'The value of {} is different from the daemon.'.format(name)
+        return None
+
+    def _accept(self):
+        conn, _ = self._listener.accept()
+        try:
+            request, fds = _recv_message(conn, max_fds=len(_STD_FDS))
+        except (OSError, EOFError, ValueError) as ex:
+            print('Failed to receive a request: {}'.format(ex), file=sys.stderr)
+            conn.close()
+            return
+        try:
+            self._handle(conn, request, fds)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _handle(self, conn, request, fds):
+        import selectors
+        reason = self._get_fallback_reason(request)
+        if not reason and len(fds) != len(_STD_FDS):
+            reason = 'The standard file descriptors of the client were not received.'
+        pid = None
+        if not reason:
+            # Only fork from the single-threaded event loop, no other thread may hold a lock in the worker.
+            # Buffered output of the daemon would otherwise be flushed by the worker into the client's output.
+            sys.stdout.flush()
+            sys.stderr.flush()
+            try:
+                pid = os.fork()
+            except OSError as ex:
+                reason = 'Failed to start a worker: {}'.format(ex)
+        if pid is None:
+            # The command didn't start, the client runs it in-process instead
+            try:
+                _send_message(conn, {'declined': True, 'reason': reason})
+            except OSError:
+                pass
+            conn.close()
+            return
+        if pid == 0:
+            self._close_in_worker(conn)
+            os._exit(_run_worker(request, fds))  # pylint: disable=protected-access
+        self._workers[pid] = conn
+        self._selector.register(conn, selectors.EVENT_READ, data=pid)
+
+    def _close_in_worker(self, conn):
+        import signal
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        self._selector.close()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            os.close(fd)
+        self._listener.close()
+        for worker_conn in self._workers.values():
+            worker_conn.close()
+        conn.close()
+
+    def _watch_client(self, conn, pid):
+        import signal
+        try:
+            data = conn.recv(1)
+        except OSError:
+            data = b''
+        if data == _INTERRUPT:
+            _kill(pid, signal.SIGINT)
+        elif not data:
+            # The client went away. Nobody is waiting for the result anymore.
+            self._selector.unregister(conn)
+            _kill(pid, signal.SIGTERM)
+
+    def _reap_workers(self):
+        for pid, conn in list(self._workers.items()):
+            try:
+                exited_pid, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                exited_pid, status = pid, 1 << 8
+            if not exited_pid:
+                continue
+            del self._workers[pid]
+            if os.WIFEXITED(status):
+                exit_code = os.WEXITSTATUS(status)
+            else:
+                exit_code = 128 + os.WTERMSIG(status) if os.WIFSIGNALED(status) else 1
+            try:
+                self._selector.unregister(conn)
+            except KeyError:
+                pass
+            try:
+                _send_message(conn, {'exit_code': exit_code})
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def _kill(pid, sig):
+    try:
+        os.kill(pid, sig)
+    except OSError:
+        pass
+
+
+def _run_worker(request, fds):
+    """Run a command in a forked worker with the client's stdio, environment and working directory."""
+    for target_fd, fd in zip(_STD_FDS, fds):
+        os.dup2(fd, target_fd)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = sys.argv[:1] + request['argv']
+
+    exit_code = 1
+    try:
+        import azure.cli.core.telemetry as telemetry
+        from azure.cli.core import get_default_cli
+        from knack.completion import ARGCOMPLETE_ENV_NAME
+
+        az_cli = get_default_cli()
+        telemetry.set_application(az_cli, ARGCOMPLETE_ENV_NAME)
+        try:
+            telemetry.start()
+            exit_code = az_cli.invoke(request['argv'])
+            if exit_code == 0:
+                telemetry.set_success()
+        except KeyboardInterrupt:
+            telemetry.set_user_fault('Keyboard interrupt is captured.')
+            exit_code = 1
+        finally:
+            telemetry.conclude()
+    except SystemExit as ex:
+        exit_code = ex.code if isinstance(ex.code, int) else (0 if ex.code is None else 1)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return exit_code
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m azure.cli.core.daemon',
+                                     description='Run a resident daemon that serves az commands.')
+    parser.add_argument('--socket', default=None,
+                        help='Path of the Unix socket to listen on. Default: {}'.format(get_default_socket_path()))
+    args = parser.parse_args()
+    AzDaemon(os.path.expanduser(args.socket or get_default_socket_path())).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,11 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import os
 import sys
+import shutil
 import logging
+import tempfile
 import mock
 import unittest
 from collections import namedtuple
@@ -234,6 +237,10 @@ class TestCommandRegistration(unittest.TestCase):
 
     expected_command_index = {'hello': ['azure.cli.command_modules.hello', 'azext_hello2', 'azext_hello1'],
                               'extra': ['azure.cli.command_modules.extra']}
+    expected_command_path_index = {'hello mod-only': ['azure.cli.command_modules.hello'],
+                                   'hello overridden': ['azure.cli.command_modules.hello', 'azext_hello2'],
+                                   'extra final': ['azure.cli.command_modules.extra'],
+                                   'hello ext-only': ['azext_hello1']}
     expected_command_table = ['hello mod-only', 'hello overridden', 'extra final', 'hello ext-only']
 
     @mock.patch('importlib.import_module', _mock_import_lib)
@@ -273,13 +280,15 @@ class TestCommandRegistration(unittest.TestCase):
         loader = cli.commands_loader
         command_index = CommandIndex(cli)
 
-        def _set_index(dict_):
+        def _set_index(dict_, path_dict=None):
             INDEX[CommandIndex._COMMAND_INDEX] = dict_
+            INDEX[CommandIndex._COMMAND_PATH_INDEX] = path_dict or {}
 
         def _check_index():
             self.assertEqual(INDEX[CommandIndex._COMMAND_INDEX_VERSION], __version__)
             self.assertEqual(INDEX[CommandIndex._COMMAND_INDEX_CLOUD_PROFILE], cli.cloud.profile)
             self.assertDictEqual(INDEX[CommandIndex._COMMAND_INDEX], self.expected_command_index)
+            self.assertDictEqual(INDEX[CommandIndex._COMMAND_PATH_INDEX], self.expected_command_path_index)
 
         # Clear the command index
         _set_index({})
@@ -308,6 +317,7 @@ class TestCommandRegistration(unittest.TestCase):
             # Test rebuild command index if version is not present
             del INDEX[CommandIndex._COMMAND_INDEX_VERSION]
             del INDEX[CommandIndex._COMMAND_INDEX]
+            del INDEX[CommandIndex._COMMAND_PATH_INDEX]
             update_and_check_index()
 
             # Test rebuild command index if version is not valid
@@ -325,6 +335,27 @@ class TestCommandRegistration(unittest.TestCase):
             _set_index({})
             update_and_check_index()
 
+        # Test rebuild command index if installed extensions don't match
+        INDEX[CommandIndex._COMMAND_INDEX_EXTENSIONS] = [["/outdated/extension/dir", None, []]]
+        _set_index({})
+        loader.load_command_table(["hello", "mod-only"])
+        _check_index()
+        self.assertEqual(INDEX[CommandIndex._COMMAND_INDEX_EXTENSIONS], CommandIndex._get_extensions_signature())
+
+        # Test the command index is invalidated when an extension is added outside of `az extension`
+        ext_dir = tempfile.mkdtemp()
+        try:
+            with mock.patch('azure.cli.core.extension.EXTENSIONS_DIR', ext_dir):
+                loader.load_command_table(["hello", "mod-only"])
+                self.assertIsNotNone(command_index.get(["hello", "mod-only"]))
+                os.mkdir(os.path.join(ext_dir, 'hello1'))
+                self.assertIsNone(command_index.get(["hello", "mod-only"]))
+                self.assertFalse(INDEX[CommandIndex._COMMAND_INDEX])
+        finally:
+            shutil.rmtree(ext_dir)
+        loader.load_command_table(["hello", "mod-only"])
+        _check_index()
+
         # Test rebuild command index if modules are found but outdated
         # This only happens in dev environment. For users, the version check logic prevents it
         _set_index({"hello": ["azure.cli.command_modules.extra"]})
@@ -336,6 +367,23 @@ class TestCommandRegistration(unittest.TestCase):
         cmd_tbl = loader.load_command_table(["hello", "mod-only"])
         self.assertEqual(['hello mod-only', 'hello overridden', 'hello ext-only'], list(cmd_tbl.keys()))
 
+        # Test only the module registering the command is loaded with the command path index
+        _set_index(self.expected_command_index, self.expected_command_path_index)
+        cmd_tbl = loader.load_command_table(["hello", "mod-only"])
+        self.assertEqual(['hello mod-only', 'hello overridden'], list(cmd_tbl.keys()))
+        # An extension overriding a built-in command is loaded after the built-in module, so that the override
+        # is still detected
+        cmd_tbl = loader.load_command_table(["hello", "overridden", "--debug"])
+        self.assertEqual(['hello mod-only', 'hello overridden'], list(cmd_tbl.keys()))
+        self.assertTrue(isinstance(cmd_tbl['hello overridden'].command_source, ExtensionCommandSource))
+        self.assertTrue(cmd_tbl['hello overridden'].command_source.overrides_command)
+        self.assertEqual(cmd_tbl['hello overridden'].loader.__module__, 'azext_hello2')
+
+        # Test all modules and extensions under a command group are loaded with the command path index
+        cmd_tbl = loader.load_command_table(["hello", "-h"])
+        self.assertEqual(['hello mod-only', 'hello overridden', 'hello ext-only'], list(cmd_tbl.keys()))
+        _check_index()
+
         # Full scenario test 1: Installing an extension 'azext_hello1' that extends 'hello' group
         outdated_command_index = {'hello': ['azure.cli.command_modules.hello'],
                                   'extra': ['azure.cli.command_modules.extra']}
@@ -378,16 +426,20 @@ class TestCommandRegistration(unittest.TestCase):
         _check_index()
         self.assertListEqual(list(cmd_tbl), self.expected_command_table)
 
-        # Call again with the new command index. Irrelevant commands are not loaded
+        # Call again with the new command index. Only the built-in module and the extension overriding the
+        # command are loaded
         cmd_tbl = loader.load_command_table(["hello", "overridden"])
         hello_overridden_cmd = cmd_tbl['hello overridden']
         self.assertTrue(isinstance(hello_overridden_cmd.command_source, ExtensionCommandSource))
+        self.assertTrue(hello_overridden_cmd.command_source.overrides_command)
         _check_index()
-        self.assertListEqual(list(cmd_tbl), ['hello mod-only', 'hello overridden', 'hello ext-only'])
+        self.assertListEqual(list(cmd_tbl), ['hello mod-only', 'hello overridden'])
 
         del INDEX[CommandIndex._COMMAND_INDEX_VERSION]
         del INDEX[CommandIndex._COMMAND_INDEX_CLOUD_PROFILE]
+        del INDEX[CommandIndex._COMMAND_INDEX_EXTENSIONS]
         del INDEX[CommandIndex._COMMAND_INDEX]
+        del INDEX[CommandIndex._COMMAND_PATH_INDEX]
 
     @mock.patch('importlib.import_module', _mock_import_lib)
     @mock.patch('pkgutil.iter_modules', _mock_iter_modules)
@@ -436,7 +488,7 @@ class TestCommandRegistration(unittest.TestCase):
         # Test command index is used by command with positional argument
         cmd_tbl = loader.load_command_table(["hello", "mod-only", "positional_argument"])
         self.assertDictEqual(INDEX[CommandIndex._COMMAND_INDEX], self.expected_command_index)
-        self.assertEqual(list(cmd_tbl), ['hello mod-only', 'hello overridden', 'hello ext-only'])
+        self.assertEqual(list(cmd_tbl), ['hello mod-only', 'hello overridden'])
 
         # Test command index is used by command with positional argument
         cmd_tbl = loader.load_command_table(["extra", "final", "positional_argument2"])
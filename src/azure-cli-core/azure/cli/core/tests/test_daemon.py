@@ -0,0 +1,134 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import io
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from azure.cli.core import __version__
+from azure.cli.core.daemon import AzDaemon, forward_to_daemon, _send_message, _recv_message
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX') and hasattr(os, 'fork'), 'The daemon requires Unix sockets and fork')
+class TestDaemon(unittest.TestCase):
+
+    def test_message_with_file_descriptors(self):
+        client, server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        read_fd, write_fd = os.pipe()
+        try:
+            _send_message(client, {'argv': ['group', 'list'], 'cwd': '/'}, fds=[write_fd])
+            message, fds = _recv_message(server, max_fds=3)
+            self.assertEqual(message, {'argv': ['group', 'list'], 'cwd': '/'})
+            self.assertEqual(len(fds), 1)
+            # The received descriptor refers to the same pipe
+            os.write(fds[0], b'hello')
+            os.close(fds[0])
+            self.assertEqual(os.read(read_fd, 5), b'hello')
+
+            _send_message(server, {'exit_code': 3})
+            self.assertEqual(_recv_message(client), ({'exit_code': 3}, []))
+        finally:
+            client.close()
+            server.close()
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_fallback_reason(self):
+        with mock.patch.dict('os.environ', {'AZURE_CONFIG_DIR': '/config1'}):
+            daemon = AzDaemon('/tmp/az.sock')
+        env = {'AZURE_CONFIG_DIR': '/config1'}
+        self.assertIsNone(daemon._get_fallback_reason({'version': __version__, 'env': env}))
+        self.assertIsNotNone(daemon._get_fallback_reason({'version': '0.0.1', 'env': env}))
+        self.assertIsNotNone(daemon._get_fallback_reason({'version': __version__,
+                                                          'env': {'AZURE_CONFIG_DIR': '/config2'}}))
+
+    def test_forward_to_unavailable_daemon(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertIsNone(forward_to_daemon(os.path.join(temp_dir, 'missing.sock'), ['version']))
+
+    def _forward_to_fake_daemon(self, respond):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            socket_path = os.path.join(temp_dir, 'az.sock')
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(socket_path)
+            listener.listen(1)
+
+            def _serve():
+                conn, _ = listener.accept()
+                _, fds = _recv_message(conn, max_fds=3)
+                for fd in fds:
+                    os.close(fd)
+                respond(conn)
+                conn.close()
+
+            server = threading.Thread(target=_serve)
+            server.start()
+            try:
+                return forward_to_daemon(socket_path, ['version'])
+            finally:
+                server.join()
+                listener.close()
+
+    def test_forward_to_declining_daemon(self):
+        self.assertIsNone(self._forward_to_fake_daemon(
+            lambda conn: _send_message(conn, {'declined': True, 'reason': 'different version'})))
+
+    def test_forward_to_daemon_losing_connection(self):
+        # Once the request is sent, the command may have started and must not run again in-process
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(self._forward_to_fake_daemon(lambda conn: None), 1)
+        self.assertIn('Lost the connection to the az daemon', stderr.getvalue())
+
+    def test_serve_request_in_worker(self):
+        def _run_worker(request, fds):
+            # Write the output of the command to the client's stdout, as the real worker does
+            os.dup2(fds[1], 1)
+            print(' '.join(request['argv']))
+            sys.stdout.flush()
+            return 7
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            socket_path = os.path.join(temp_dir, 'az.sock')
+            log_r, log_w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    # The daemon's stdout is a pipe, so that its output is buffered
+                    os.dup2(log_w, 1)
+                    with mock.patch.object(AzDaemon, '_warm_up'), \
+                            mock.patch('azure.cli.core.daemon._run_worker', side_effect=_run_worker), \
+                            mock.patch('sys.stdout', io.TextIOWrapper(io.FileIO(1, 'w', closefd=False))):
+                        AzDaemon(socket_path).serve_forever()
+                finally:
+                    os._exit(1)
+            os.close(log_w)
+            out_r, out_w = os.pipe()
+            try:
+                for _ in range(100):
+                    if os.path.exists(socket_path):
+                        break
+                    time.sleep(0.05)
+                with mock.patch('azure.cli.core.daemon._STD_FDS', [0, out_w, 2]):
+                    self.assertEqual(forward_to_daemon(socket_path, ['version']), 7)
+                    self.assertEqual(forward_to_daemon(socket_path, ['group', 'list']), 7)
+            finally:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+                os.close(out_w)
+            # Only the output of the commands reaches the client, the daemon's own output goes to its stdout
+            with os.fdopen(out_r) as out, os.fdopen(log_r) as log:
+                self.assertEqual(out.read(), 'version\ngroup list\n')
+                self.assertIn('Listening on', log.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from azure.cli.core._session import Session
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.temp_dir, 'test.json')
+        self.session = Session()
+        self.session.load(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _read_file(self):
+        with open(self.filename, 'r', encoding='utf-8-sig') as f:
+            return json.load(f)
+
+    def test_session_save_on_set_and_delete(self):
+        self.session['key1'] = 'value1'
+        self.assertEqual(self._read_file(), {'key1': 'value1'})
+        del self.session['key1']
+        self.assertEqual(self._read_file(), {})
+
+    def test_session_batch(self):
+        with mock.patch.object(self.session, 'save', wraps=self.session.save) as save_mock:
+            with self.session.batch():
+                self.session['key1'] = 'value1'
+                with self.session.batch():
+                    self.session['key2'] = 'value2'
+                self.session['key3'] = 'value3'
+                # Nothing is written until the outermost batch exits
+                self.assertEqual(self._read_file(), {})
+            save_mock.assert_called_once()
+        self.assertEqual(self._read_file(), {'key1': 'value1', 'key2': 'value2', 'key3': 'value3'})
+
+        # A batch without modifications doesn't write the file
+        with mock.patch.object(self.session, 'save') as save_mock:
+            with self.session.batch():
+                pass
+            save_mock.assert_not_called()
+
+    def test_session_save_is_atomic(self):
+        self.session['key1'] = 'value1'
+        with mock.patch('json.dump', side_effect=ValueError('not serializable')):
+            with self.assertRaises(ValueError):
+                self.session.save()
+        # The previous content is kept and no temp file is left behind
+        self.assertEqual(self._read_file(), {'key1': 'value1'})
+        self.assertEqual(os.listdir(self.temp_dir), ['test.json'])
+
+        # Load from the saved file
+        session = Session()
+        session.load(self.filename)
+        self.assertEqual(session['key1'], 'value1')
+
+    def test_session_batch_from_threads(self):
+        def _set_values(thread_index):
+            for i in range(50):
+                with self.session.batch():
+                    self.session['{}-{}'.format(thread_index, i)] = i
+
+        with mock.patch.object(self.session, 'save', wraps=self.session.save) as save_mock:
+            with self.session.batch():
+                threads = [threading.Thread(target=_set_values, args=(i,)) for i in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            save_mock.assert_called_once()
+        self.assertEqual(len(self._read_file()), 400)
+        self.assertEqual(self.session._batch_depth, 0)
+        # No lock file is left in the directory
+        self.assertEqual(os.listdir(self.temp_dir), ['test.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -321,8 +321,9 @@ def get_cached_latest_versions(versions=None):
                 return cache_versions.copy(), True
 
     versions, success = _update_latest_from_github(versions)
-    VERSIONS['versions'] = versions
-    VERSIONS[_VERSION_UPDATE_TIME] = str(datetime.datetime.now())
+    with VERSIONS.batch():
+        VERSIONS['versions'] = versions
+        VERSIONS[_VERSION_UPDATE_TIME] = str(datetime.datetime.now())
     return versions.copy(), success
 
 
@@ -1187,8 +1188,9 @@ def handle_version_update():
         elif parse(VERSIONS['versions']['core']['local']) != parse(__version__):
             logger.debug("Azure CLI has been updated.")
             logger.debug("Clean up versions and refresh cloud endpoints information in local files.")
-            VERSIONS['versions'] = {}
-            VERSIONS['update_time'] = ''
+            with VERSIONS.batch():
+                VERSIONS['versions'] = {}
+                VERSIONS['update_time'] = ''
             from azure.cli.core.cloud import refresh_known_clouds
             refresh_known_clouds()
     except Exception as ex:  # pylint: disable=broad-except
@@ -8,6 +8,7 @@ import timeit
 # Log the start time
 start_time = timeit.default_timer()
 
+import os
 import sys
 import uuid
 
@@ -35,6 +36,13 @@ def cli_main(cli, args):
     return cli.invoke(args)
 
 
+# Forward the command to the resident daemon if it is enabled and reachable. See azure.cli.core.daemon.
+if os.environ.get('AZURE_CLI_DAEMON_SOCKET') and ARGCOMPLETE_ENV_NAME not in os.environ:
+    from azure.cli.core.daemon import forward_to_daemon
+    daemon_exit_code = forward_to_daemon(os.environ['AZURE_CLI_DAEMON_SOCKET'], sys.argv[1:])
+    if daemon_exit_code is not None:
+        sys.exit(daemon_exit_code)
+
 az_cli = get_default_cli()
 
 telemetry.set_application(az_cli, ARGCOMPLETE_ENV_NAME)
@@ -104,7 +112,6 @@ finally:
                         else:
                             upgrade_exit_code = subprocess.call(cmd, shell=platform.system() == 'Windows')
                     else:
-                        import os
                         devnull = open(os.devnull, 'w')
                         cmd.append('-y')
                         upgrade_exit_code = subprocess.call(cmd, shell=platform.system() == 'Windows', stdout=devnull)
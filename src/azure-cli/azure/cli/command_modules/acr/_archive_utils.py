@@ -7,17 +7,33 @@ import tarfile
 import os
 import re
 import codecs
+import gzip
+import hashlib
+import time
+from collections import deque
 from io import open
 import requests
 from knack.log import get_logger
 from knack.util import CLIError
 from msrestazure.azure_exceptions import CloudError
 from azure.cli.core.profiles import ResourceType, get_sdk
+from azure.cli.core._session import Session
+from azure.cli.core.commands.client_factory import get_subscription_id
 from ._azure_utils import get_blob_info
 from ._constants import TASK_VALID_VSTS_URLS
 
 logger = get_logger(__name__)
 
+# Name of the file in the config directory that records the recently uploaded source code by content hash
+SOURCE_UPLOADS_FILE_NAME = 'acrSourceUploads.json'
+# Identical source code uploaded within this many seconds is not uploaded again
+SOURCE_UPLOAD_VALID_SECONDS = 3600
+# Size of the chunks of the tar stream compressed concurrently, when `pack_workers` is configured in the acr section
+PACK_CHUNK_SIZE = 1024 * 1024
+PACK_COMPRESS_LEVEL = 9
+
+_source_uploads = Session()
+
 
 def upload_source_code(cmd, client,
                        registry_name,
@@ -26,10 +42,11 @@ def upload_source_code(cmd, client,
                        tar_file_path,
                        docker_file_path,
                        docker_file_in_tar):
-    _pack_source_code(source_location,
-                      tar_file_path,
-                      docker_file_path,
-                      docker_file_in_tar)
+    content_hash = _pack_source_code(source_location,
+                                     tar_file_path,
+                                     docker_file_path,
+                                     docker_file_in_tar,
+                                     pack_workers=cmd.cli_ctx.config.getint('acr', 'pack_workers', fallback=1))
 
     size = os.path.getsize(tar_file_path)
     unit = 'GiB'
@@ -39,6 +56,15 @@ def upload_source_code(cmd, client,
             break
         size = size / 1024.0
 
+    upload_key = '/'.join([cmd.cli_ctx.cloud.name, get_subscription_id(cmd.cli_ctx), resource_group_name or '',
+                           registry_name, content_hash]).lower()
+    uploads = _load_source_uploads(cmd.cli_ctx)
+    upload = uploads.get(upload_key)
+    if upload and upload['timestamp'] + SOURCE_UPLOAD_VALID_SECONDS > time.time():
+        logger.warning("Identical source code was uploaded to registry %s recently. Skipping the upload.",
+                       registry_name)
+        return upload['relativePath']
+
     logger.warning("Uploading archived source code from '%s'...", tar_file_path)
     upload_url = None
     relative_path = None
@@ -61,12 +87,34 @@ def upload_source_code(cmd, client,
                          container_name=container_name,
                          blob_name=blob_name,
                          file_path=tar_file_path)
+    _save_source_upload(uploads, upload_key, relative_path)
     logger.warning("Sending context ({0:.3f} {1}) to registry: {2}...".format(
         size, unit, registry_name))
     return relative_path
 
 
-def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_file_in_tar):
+def _load_source_uploads(cli_ctx):
+    source_uploads_path = os.path.join(cli_ctx.config.config_dir, SOURCE_UPLOADS_FILE_NAME)
+    if _source_uploads.filename != source_uploads_path:
+        _source_uploads.load(source_uploads_path)
+    return _source_uploads
+
+
+def _save_source_upload(uploads, upload_key, relative_path):
+    now = time.time()
+    for key in [k for k, v in uploads.data.items() if v['timestamp'] + SOURCE_UPLOAD_VALID_SECONDS <= now]:
+        del uploads.data[key]
+    uploads.data[upload_key] = {'relativePath': relative_path, 'timestamp': now}
+    try:
+        uploads.save_with_retry()
+    except OSError as e:
+        logger.debug("Failed to record the uploaded source code. Exception: %s", str(e))
+
+
+def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_file_in_tar, pack_workers=1):
+    """Pack the source code into a gzipped tar, compressed with `pack_workers` threads.
+    :return: The SHA-256 hash of the uncompressed tar
+    """
     logger.warning("Packing source code into tar to upload...")
 
     original_docker_file_name = os.path.basename(docker_file_path.replace("\\", os.sep))
@@ -89,7 +137,7 @@ def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_f
             # at this point, current item should just inherit from parent
             if index >= parent_matching_rule_index:
                 break
-            if re.match(item.pattern, tarinfo.name):
+            if item.regex.match(tarinfo.name):
                 logger.debug(".dockerignore: rule '%s' matches '%s'.",
                              item.rule, tarinfo.name)
                 return item.ignore, index
@@ -99,22 +147,99 @@ def _pack_source_code(source_location, tar_file_path, docker_file_path, docker_f
         # inherit from parent
         return parent_ignored, parent_matching_rule_index
 
-    with tarfile.open(tar_file_path, "w:gz") as tar:
-        # need to set arcname to empty string as the archive root path
-        _archive_file_recursively(tar,
-                                  source_location,
-                                  arcname="",
-                                  parent_ignored=False,
-                                  parent_matching_rule_index=ignore_list_size,
-                                  ignore_check=_ignore_check)
+    def _prune_check(tarinfo, ignored, matching_rule_index):
+        # the items under an ignored directory can only be included again by an exception rule
+        # with a higher priority than the matching rule, which could match a path under the directory.
+        # The root is always walked, even when a rule like '*' matches its empty name.
+        if not ignored or not tarinfo.name:
+            return False
+        if ignore_list is None:
+            return True
+        return not any(not item.ignore and item.may_match_under(tarinfo.name)
+                       for item in ignore_list[:matching_rule_index])
 
-        # Add the Dockerfile if it's specified.
-        # In the case of run, there will be no Dockerfile.
-        if docker_file_path:
-            docker_file_tarinfo = tar.gettarinfo(
-                docker_file_path, docker_file_in_tar)
-            with open(docker_file_path, "rb") as f:
-                tar.addfile(docker_file_tarinfo, f)
+    with open(tar_file_path, "wb") as tar_file:
+        if pack_workers > 1:
+            compressed_file = _ParallelGzipWriter(tar_file, pack_workers)
+        else:
+            compressed_file = gzip.GzipFile(fileobj=tar_file, mode="wb", compresslevel=PACK_COMPRESS_LEVEL)
+        hashing_file = _HashingWriter(compressed_file)
+        try:
+            with tarfile.open(fileobj=hashing_file, mode="w|") as tar:
+                # need to set arcname to empty string as the archive root path
+                _archive_file_recursively(tar,
+                                          source_location,
+                                          arcname="",
+                                          parent_ignored=False,
+                                          parent_matching_rule_index=ignore_list_size,
+                                          ignore_check=_ignore_check,
+                                          prune_check=_prune_check)
+
+                # Add the Dockerfile if it's specified.
+                # In the case of run, there will be no Dockerfile.
+                if docker_file_path:
+                    docker_file_tarinfo = tar.gettarinfo(
+                        docker_file_path, docker_file_in_tar)
+                    with open(docker_file_path, "rb") as f:
+                        tar.addfile(docker_file_tarinfo, f)
+        finally:
+            compressed_file.close()
+
+    return hashing_file.hexdigest()
+
+
+class _HashingWriter:
+    """A write-only file that hashes the data written to the underlying file."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._fileobj.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class _ParallelGzipWriter:
+    """A write-only file that compresses chunks of the data concurrently into consecutive gzip members.
+    Gzip readers decompress the members as a single stream.
+    """
+
+    def __init__(self, fileobj, workers, chunk_size=PACK_CHUNK_SIZE):
+        from concurrent.futures import ThreadPoolExecutor
+        self._fileobj = fileobj
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        # zlib releases the GIL while compressing, so that threads compress in parallel
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = deque()
+        self._max_pending = workers * 2
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._compress(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def _compress(self, chunk):
+        self._pending.append(self._executor.submit(gzip.compress, chunk, PACK_COMPRESS_LEVEL))
+        # Bound the memory used by the chunks waiting to be written, in order
+        while len(self._pending) > self._max_pending:
+            self._fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        try:
+            if self._buffer:
+                self._compress(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._fileobj.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
 
 
 class IgnoreRule:  # pylint: disable=too-few-public-methods
@@ -147,6 +272,14 @@ class IgnoreRule:  # pylint: disable=too-few-public-methods
                 if index < token_length:
                     self.pattern += "/"  # add back / if it's not the last
         self.pattern += "$"
+        self.regex = re.compile(self.pattern)
+        # the part of the rule before the first wildcard, which the matching paths start with
+        self.literal_prefix = re.split(r"[*?\[\\]", rule, 1)[0]
+
+    def may_match_under(self, directory):
+        """Check whether the rule may match a path under the directory."""
+        prefix = directory + '/' if directory else ''
+        return self.literal_prefix.startswith(prefix) or prefix.startswith(self.literal_prefix)
 
 
 def _load_dockerignore_file(source_location, original_docker_file_name):
@@ -185,7 +318,8 @@ def _load_dockerignore_file(source_location, original_docker_file_name):
     return ignore_list, len(ignore_list)
 
 
-def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check):
+def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matching_rule_index, ignore_check,
+                              prune_check=None):
     # create a TarInfo object from the file
     tarinfo = tar.gettarinfo(name, arcname)
 
@@ -205,11 +339,15 @@ def _archive_file_recursively(tar, name, arcname, parent_ignored, parent_matchin
             tar.addfile(tarinfo)
 
     # even the dir is ignored, its child items can still be included, so continue to scan
+    # unless no rule can include them
     if tarinfo.isdir():
+        if prune_check and prune_check(tarinfo, ignored, matching_rule_index):
+            logger.debug("Skipping ignored directory '%s'.", tarinfo.name)
+            return
         for f in os.listdir(name):
             _archive_file_recursively(tar, os.path.join(name, f), os.path.join(arcname, f),
                                       parent_ignored=ignored, parent_matching_rule_index=matching_rule_index,
-                                      ignore_check=ignore_check)
+                                      ignore_check=ignore_check, prune_check=prune_check)
 
 
 def check_remote_source_code(source_location):
@@ -9,6 +9,8 @@ except ImportError:
     from urllib import urlencode
     from urlparse import urlparse, urlunparse
 
+import os
+import threading
 import time
 from json import loads
 from enum import Enum
@@ -23,6 +25,7 @@ from knack.prompting import prompt, prompt_pass, NoTTYException
 from knack.log import get_logger
 
 from azure.cli.core.util import should_disable_connection_verify
+from azure.cli.core._session import Session
 from azure.cli.core.cloud import CloudSuffixNotSetException
 from azure.cli.core._profile import _AZ_LOGIN_MESSAGE
 from azure.cli.core.commands.client_factory import get_subscription_id
@@ -41,6 +44,24 @@ AAD_TOKEN_BASE_ERROR_MESSAGE = "Unable to get AAD authorization tokens with mess
 ADMIN_USER_BASE_ERROR_MESSAGE = "Unable to get admin user credentials with message"
 ALLOWS_BASIC_AUTH = "allows_basic_auth"
 
+# Name of the file in the config directory where the access tokens of registries are cached. Refresh tokens are only
+# kept in memory, so that no long-lived credential of a registry is written to the file.
+ACR_TOKEN_CACHE_FILE_NAME = 'acrTokens.json'
+# Cached tokens are not used anymore when they expire within this many seconds
+ACR_TOKEN_EXPIRY_MARGIN = 300
+
+# Maximum number of connections kept open to a registry host, which bounds the concurrency of bulk operations
+MAX_REGISTRY_CONNECTIONS = 32
+
+# HTTP sessions by host, so that consecutive calls to a registry reuse their connections
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+_token_cache = Session()
+_token_cache_lock = threading.Lock()
+# AAD refresh tokens of registries got by the current process, by token cache key
+_refresh_tokens = {}
+
 
 class RepoAccessTokenPermission(Enum):
     METADATA_READ = 'metadata_read'
@@ -82,7 +103,8 @@ def _handle_challenge_phase(login_server,
 
     login_server = login_server.rstrip('/')
 
-    challenge = requests.get('https://' + login_server + '/v2/', verify=(not should_disable_connection_verify()))
+    url = 'https://' + login_server + '/v2/'
+    challenge = _get_http_session(url).get(url, verify=(not should_disable_connection_verify()))
     if challenge.status_code != 401 or 'WWW-Authenticate' not in challenge.headers:
         from ._errors import CONNECTIVITY_CHALLENGE_ERROR
         if is_diagnostics_context:
@@ -117,7 +139,8 @@ def _get_aad_token_after_challenge(cli_ctx,
                                    repository,
                                    artifact_repository,
                                    permission,
-                                   is_diagnostics_context):
+                                   is_diagnostics_context,
+                                   token_cache_key=None):
     authurl = urlparse(token_params['realm'])
     authhost = urlunparse((authurl[0], authurl[1], '/oauth2/exchange', '', '', ''))
 
@@ -136,8 +159,8 @@ def _get_aad_token_after_challenge(cli_ctx,
         'access_token': creds[1]
     }
 
-    response = requests.post(authhost, urlencode(content), headers=headers,
-                             verify=(not should_disable_connection_verify()))
+    response = _get_http_session(authhost).post(authhost, urlencode(content), headers=headers,
+                                                verify=(not should_disable_connection_verify()))
 
     if response.status_code not in [200]:
         from ._errors import CONNECTIVITY_REFRESH_TOKEN_ERROR
@@ -147,36 +170,49 @@ def _get_aad_token_after_challenge(cli_ctx,
                        .get_error_message())
 
     refresh_token = loads(response.content.decode("utf-8"))["refresh_token"]
+    if token_cache_key:
+        _cache_refresh_token(token_cache_key, login_server, token_params['realm'], refresh_token)
     if only_refresh_token:
         return refresh_token
 
-    authhost = urlunparse((authurl[0], authurl[1], '/oauth2/token', '', '', ''))
+    scope = _get_token_scope(repository, artifact_repository, permission)
+    response = _request_access_token(token_params['realm'], login_server, scope, refresh_token)
+
+    if response.status_code not in [200]:
+        from ._errors import CONNECTIVITY_ACCESS_TOKEN_ERROR
+        if is_diagnostics_context:
+            return CONNECTIVITY_ACCESS_TOKEN_ERROR.format_error_message(login_server, response.status_code)
+        raise CLIError(CONNECTIVITY_ACCESS_TOKEN_ERROR.format_error_message(login_server, response.status_code)
+                       .get_error_message())
+
+    access_token = loads(response.content.decode("utf-8"))["access_token"]
+    if token_cache_key:
+        _cache_token(cli_ctx, token_cache_key, login_server, token_params['realm'], scope, access_token)
+    return access_token
 
+
+def _get_token_scope(repository, artifact_repository, permission):
     if repository:
-        scope = 'repository:{}:{}'.format(repository, permission)
-    elif artifact_repository:
-        scope = 'artifact-repository:{}:{}'.format(artifact_repository, permission)
-    else:
-        # catalog only has * as permission, even for a read operation
-        scope = 'registry:catalog:*'
+        return 'repository:{}:{}'.format(repository, permission)
+    if artifact_repository:
+        return 'artifact-repository:{}:{}'.format(artifact_repository, permission)
+    # catalog only has * as permission, even for a read operation
+    return 'registry:catalog:*'
 
+
+def _request_access_token(realm, login_server, scope, refresh_token):
+    """Exchange an ACR refresh token for an access token of the given scope."""
+    authurl = urlparse(realm)
+    authhost = urlunparse((authurl[0], authurl[1], '/oauth2/token', '', '', ''))
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     content = {
         'grant_type': 'refresh_token',
         'service': login_server,
         'scope': scope,
         'refresh_token': refresh_token
     }
-    response = requests.post(authhost, urlencode(content), headers=headers,
-                             verify=(not should_disable_connection_verify()))
-
-    if response.status_code not in [200]:
-        from ._errors import CONNECTIVITY_ACCESS_TOKEN_ERROR
-        if is_diagnostics_context:
-            return CONNECTIVITY_ACCESS_TOKEN_ERROR.format_error_message(login_server, response.status_code)
-        raise CLIError(CONNECTIVITY_ACCESS_TOKEN_ERROR.format_error_message(login_server, response.status_code)
-                       .get_error_message())
-
-    return loads(response.content.decode("utf-8"))["access_token"]
+    return _get_http_session(authhost).post(authhost, urlencode(content), headers=headers,
+                                            verify=(not should_disable_connection_verify()))
 
 
 def _get_aad_token(cli_ctx,
@@ -185,13 +221,15 @@ def _get_aad_token(cli_ctx,
                    repository=None,
                    artifact_repository=None,
                    permission=None,
-                   is_diagnostics_context=False):
+                   is_diagnostics_context=False,
+                   token_cache_key=None):
     """Obtains refresh and access tokens for an AAD-enabled registry.
     :param str login_server: The registry login server URL to log in to
     :param bool only_refresh_token: Whether to ask for only refresh token, or for both refresh and access tokens
     :param str repository: Repository for which the access token is requested
     :param str artifact_repository: Artifact repository for which the access token is requested
     :param str permission: The requested permission on the repository, '*' or 'pull'
+    :param str token_cache_key: If specified, the obtained tokens are cached under this key
     """
     token_params = _handle_challenge_phase(
         login_server, repository, artifact_repository, permission, True, is_diagnostics_context
@@ -210,7 +248,8 @@ def _get_aad_token(cli_ctx,
                                           repository,
                                           artifact_repository,
                                           permission,
-                                          is_diagnostics_context)
+                                          is_diagnostics_context,
+                                          token_cache_key)
 
 
 def _get_token_with_username_and_password(login_server,
@@ -246,13 +285,7 @@ def _get_token_with_username_and_password(login_server,
     if ALLOWS_BASIC_AUTH in token_params:
         return username, password
 
-    if repository:
-        scope = 'repository:{}:{}'.format(repository, permission)
-    elif artifact_repository:
-        scope = 'artifact-repository:{}:{}'.format(artifact_repository, permission)
-    else:
-        # catalog only has * as permission, even for a read operation
-        scope = 'registry:catalog:*'
+    scope = _get_token_scope(repository, artifact_repository, permission)
 
     authurl = urlparse(token_params['realm'])
     authhost = urlunparse((authurl[0], authurl[1], '/oauth2/token', '', '', ''))
@@ -265,8 +298,8 @@ def _get_token_with_username_and_password(login_server,
         'scope': scope
     }
 
-    response = requests.post(authhost, urlencode(content), headers=headers,
-                             verify=(not should_disable_connection_verify()))
+    response = _get_http_session(authhost).post(authhost, urlencode(content), headers=headers,
+                                                verify=(not should_disable_connection_verify()))
 
     if response.status_code != 200:
         from ._errors import CONNECTIVITY_ACCESS_TOKEN_ERROR
@@ -280,6 +313,113 @@ def _get_token_with_username_and_password(login_server,
     return EMPTY_GUID, access_token
 
 
+def _get_token_cache_key(cli_ctx, registry_name, tenant_suffix):
+    """Get the key of the cached AAD tokens of a registry for the current account, or None if not logged in."""
+    from azure.cli.core._profile import Profile
+    try:
+        subscription = Profile(cli_ctx=cli_ctx).get_subscription(get_subscription_id(cli_ctx))
+    except CLIError:
+        return None
+    return '/'.join([cli_ctx.cloud.name, subscription['id'], subscription['user']['name'],
+                     registry_name, tenant_suffix or '']).lower()
+
+
+def _load_token_cache(cli_ctx):
+    token_cache_path = os.path.join(cli_ctx.config.config_dir, ACR_TOKEN_CACHE_FILE_NAME)
+    if _token_cache.filename != token_cache_path:
+        _token_cache.load(token_cache_path)
+    return _token_cache
+
+
+def _get_token_expiry(token):
+    """Get the expiry of a JWT in seconds since the epoch, or None if the token is not a JWT."""
+    import base64
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(loads(base64.urlsafe_b64decode(payload.encode('utf-8')).decode('utf-8'))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _is_token_valid(cached_token, now):
+    return cached_token['expiry'] - ACR_TOKEN_EXPIRY_MARGIN > now
+
+
+def _cache_token(cli_ctx, token_cache_key, login_server, realm, scope, token):
+    expiry = _get_token_expiry(token)
+    if expiry is None:
+        logger.debug("Token for scope '%s' doesn't have an expiry and is not cached.", scope)
+        return
+    now = time.time()
+    with _token_cache_lock:
+        token_cache = _load_token_cache(cli_ctx)
+        entry = token_cache.data.get(token_cache_key)
+        if not entry or entry['loginServer'] != login_server or entry['realm'] != realm:
+            entry = {'loginServer': login_server, 'realm': realm, 'tokens': {}}
+        entry['tokens'][scope] = {'token': token, 'expiry': expiry}
+        token_cache.data[token_cache_key] = entry
+        # Drop the expired tokens, and the registries without any valid token left
+        for key in list(token_cache.data):
+            tokens = {k: v for k, v in token_cache.data[key]['tokens'].items() if _is_token_valid(v, now)}
+            if tokens:
+                token_cache.data[key]['tokens'] = tokens
+            else:
+                del token_cache.data[key]
+        try:
+            token_cache.save_with_retry()
+        except OSError as e:
+            logger.debug("Failed to save the ACR token cache. Exception: %s", str(e))
+
+
+def _cache_refresh_token(token_cache_key, login_server, realm, refresh_token):
+    expiry = _get_token_expiry(refresh_token)
+    if expiry is None:
+        logger.debug("Refresh token doesn't have an expiry and is not cached.")
+        return
+    with _token_cache_lock:
+        _refresh_tokens[token_cache_key] = {'loginServer': login_server, 'realm': realm, 'token': refresh_token,
+                                            'expiry': expiry}
+
+
+def _get_cached_aad_credentials(cli_ctx,
+                                token_cache_key,
+                                repository,
+                                artifact_repository,
+                                permission):
+    """Get the access credentials of a registry from the cached AAD tokens.
+    The access token of the scope is read from the tokens cached by previous commands. Otherwise, a refresh token got
+    by the current process is exchanged for it.
+    :return: The login server, username and password, or None if there are no valid cached tokens
+    """
+    scope = _get_token_scope(repository, artifact_repository, permission)
+    now = time.time()
+    with _token_cache_lock:
+        entry = _load_token_cache(cli_ctx).data.get(token_cache_key)
+        cached_token = entry['tokens'].get(scope) if entry else None
+        refresh_entry = _refresh_tokens.get(token_cache_key)
+    if cached_token and _is_token_valid(cached_token, now):
+        logger.info("Using the cached access token of registry '%s'.", entry['loginServer'])
+        return entry['loginServer'], EMPTY_GUID, cached_token['token']
+    if not refresh_entry or not _is_token_valid(refresh_entry, now):
+        return None
+
+    login_server = refresh_entry['loginServer']
+    logger.info("Exchanging the cached AAD refresh token of registry '%s' for an access token...", login_server)
+    try:
+        response = _request_access_token(refresh_entry['realm'], login_server, scope, refresh_entry['token'])
+    except RequestException as e:
+        logger.debug("Could not get access token with the cached refresh token. Exception: %s", str(e))
+        return None
+    if response.status_code != 200:
+        logger.debug("Could not get access token with the cached refresh token. Status code: %s",
+                     response.status_code)
+        return None
+    access_token = loads(response.content.decode("utf-8"))["access_token"]
+    _cache_token(cli_ctx, token_cache_key, login_server, refresh_entry['realm'], scope, access_token)
+    return login_server, EMPTY_GUID, access_token
+
+
 def _get_credentials(cmd,  # pylint: disable=too-many-statements
                      registry_name,
                      tenant_suffix,
@@ -305,6 +445,14 @@ def _get_credentials(cmd,  # pylint: disable=too-many-statements
         raise CLIError('Please also specify username if password is specified.')
 
     cli_ctx = cmd.cli_ctx
+    token_cache_key = None if username else _get_token_cache_key(cli_ctx, registry_name, tenant_suffix)
+    # Refresh tokens are handed out by login and --expose-token, so they are always got fresh with their full lifetime
+    if token_cache_key and not only_refresh_token:
+        credentials = _get_cached_aad_credentials(
+            cli_ctx, token_cache_key, repository, artifact_repository, permission)
+        if credentials:
+            return credentials
+
     resource_not_found, registry = None, None
     try:
         registry, resource_group_name = get_registry_by_name(cli_ctx, registry_name)
@@ -328,7 +476,7 @@ def _get_credentials(cmd,  # pylint: disable=too-many-statements
     # Validate the login server is reachable
     url = 'https://' + login_server + '/v2/'
     try:
-        challenge = requests.get(url, verify=(not should_disable_connection_verify()))
+        challenge = _get_http_session(url).get(url, verify=(not should_disable_connection_verify()))
         if challenge.status_code == 403:
             raise CLIError("Looks like you don't have access to registry '{}'. "
                            "To see configured firewall rules, run 'az acr show --query networkRuleSet --name {}'. "
@@ -364,7 +512,8 @@ def _get_credentials(cmd,  # pylint: disable=too-many-statements
         logger.info("Attempting to retrieve AAD refresh token...")
         try:
             return login_server, EMPTY_GUID, _get_aad_token(
-                cli_ctx, login_server, only_refresh_token, repository, artifact_repository, permission)
+                cli_ctx, login_server, only_refresh_token, repository, artifact_repository, permission,
+                token_cache_key=token_cache_key)
         except CLIError as e:
             logger.warning("%s: %s", AAD_TOKEN_BASE_ERROR_MESSAGE, str(e))
 
@@ -484,6 +633,17 @@ def get_authorization_header(username, password):
     return {'Authorization': auth}
 
 
+def _get_http_session(url):
+    """Get the HTTP session shared by all the calls to the host of a URL."""
+    host = urlparse(url).netloc.lower()
+    with _http_sessions_lock:
+        if host not in _http_sessions:
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=MAX_REGISTRY_CONNECTIONS))
+            _http_sessions[host] = session
+        return _http_sessions[host]
+
+
 def request_data_from_registry(http_method,
                                login_server,
                                path,
@@ -495,7 +655,8 @@ def request_data_from_registry(http_method,
                                params=None,
                                retry_times=3,
                                retry_interval=5,
-                               timeout=300):
+                               timeout=300,
+                               headers=None):
     if http_method not in ALLOWED_HTTP_METHOD:
         raise ValueError("Allowed http method: {}".format(ALLOWED_HTTP_METHOD))
 
@@ -509,14 +670,16 @@ def request_data_from_registry(http_method,
         raise ValueError("Non-empty payload is required for http method: {}".format(http_method))
 
     url = 'https://{}{}'.format(login_server, path)
-    headers = get_authorization_header(username, password)
+    headers = dict(get_authorization_header(username, password), **(headers or {}))
+    session = _get_http_session(url)
 
     for i in range(0, retry_times):
         errorMessage = None
+        retry_after = retry_interval
         try:
             if file_payload:
                 with open(file_payload, 'rb') as data_payload:
-                    response = requests.request(
+                    response = session.request(
                         method=http_method,
                         url=url,
                         headers=headers,
@@ -526,7 +689,7 @@ def request_data_from_registry(http_method,
                         verify=(not should_disable_connection_verify())
                     )
             else:
-                response = requests.request(
+                response = session.request(
                     method=http_method,
                     url=url,
                     headers=headers,
@@ -567,17 +730,27 @@ def request_data_from_registry(http_method,
                 raise RegistryException(
                     parse_error_message('Failed to request data due to a conflict.', response),
                     response.status_code)
+            if response.status_code == 429:
+                # Back off exponentially unless the registry tells how long to wait
+                retry_after = _get_retry_after(response, retry_interval * (2 ** i))
             raise Exception(parse_error_message('Could not {} the requested data.'.format(http_method), response))
         except CLIError:
             raise
         except Exception as e:  # pylint: disable=broad-except
             errorMessage = str(e)
             logger.debug('Retrying %s with exception %s', i + 1, errorMessage)
-            time.sleep(retry_interval)
+            time.sleep(retry_after)
 
     raise CLIError(errorMessage)
 
 
+def _get_retry_after(response, default):
+    try:
+        return max(0, int(response.headers['Retry-After']))
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
 def parse_error_message(error_message, response):
     import json
     try:
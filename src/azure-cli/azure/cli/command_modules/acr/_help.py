@@ -435,6 +435,20 @@ examples:
     text: az acr repository list -n MyRegistry
 """
 
+helps['acr repository purge'] = """
+type: command
+short-summary: Delete or untag images matching filters in an Azure Container Registry.
+long-summary: >
+    Manifests whose tags all match a filter are deleted, and the matching tags of other manifests are untagged.
+    The repositories are listed once, then the manifests of the matching repositories are listed and purged concurrently.
+    Locked manifests are kept.
+examples:
+  - name: Show the images in repositories starting with 'samples/' that are older than 30 days and would be purged.
+    text: az acr repository purge -n MyRegistry --filter 'samples/.*:.*' --ago 30d --dry-run
+  - name: Purge the images tagged 'dev-*' older than a week, and the untagged manifests of 'hello-world'.
+    text: az acr repository purge -n MyRegistry --filter 'hello-world:dev-.*' --ago 7d --untagged --yes
+"""
+
 helps['acr repository show'] = """
 type: command
 short-summary: Get the attributes of a repository or image in an Azure Container Registry.
@@ -813,6 +827,9 @@ examples:
   - name: Show logs for a particular run.
     text: >
         az acr task logs -r MyRegistry --run-id runId
+  - name: Stream logs of several runs at once, prefixed with their run IDs.
+    text: >
+        az acr task logs -r MyRegistry --run-id runId1 runId2 runId3
   - name: Show logs for the last created run in the registry that built the image 'hello-world'.
     text: >
         az acr task logs -r MyRegistry --image hello-world
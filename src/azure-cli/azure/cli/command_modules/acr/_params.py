@@ -137,6 +137,13 @@ def load_arguments(self, _):  # pylint: disable=too-many-statements
     with self.argument_context('acr repository untag') as c:
         c.argument('image', options_list=['--image', '-t'], help="The name of the image. May include a tag in the format 'name:tag'.")
 
+    with self.argument_context('acr repository purge') as c:
+        c.argument('filters', options_list=['--filter'], action='append', help="The repositories and tags to purge in the format 'REPOSITORY_REGEX:TAG_REGEX'. The regular expressions must match the whole name. Multiple filters are supported by passing --filter multiple times.")
+        c.argument('ago', help="Only purge images last updated before this duration ago, like '30d', '12h' or '1d6h30m'. Default to images of any age.")
+        c.argument('untagged', help='Also delete the manifests without tags in the filtered repositories, except the images of manifest lists which are kept.', action='store_true')
+        c.argument('dry_run', help='Show the images that would be purged without purging them.', action='store_true')
+        c.argument('concurrency', type=int, help='The number of concurrent registry requests, up to 32.')
+
     with self.argument_context('acr create') as c:
         c.argument('registry_name', completer=None, validator=None)
         c.argument('deployment_name', validator=None)
@@ -267,6 +274,9 @@ def load_arguments(self, _):  # pylint: disable=too-many-statements
         c.argument('run_status', help='The current status of run.', arg_type=get_enum_type(RunStatus))
         c.argument('top', help='Limit the number of latest runs in the results.')
 
+    with self.argument_context('acr task logs') as c:
+        c.argument('run_id', nargs='+', help='The unique run identifier. Logs of several runs are streamed at once if multiple run identifiers are specified.')
+
     with self.argument_context('acr task update-run') as c:
         c.argument('no_archive', help='Indicates whether the run should be archived.', arg_type=get_three_state_flag())
 
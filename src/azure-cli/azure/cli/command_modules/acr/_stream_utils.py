@@ -2,7 +2,6 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
-from io import BytesIO
 import time
 from random import uniform
 import colorama
@@ -10,14 +9,18 @@ import requests
 from knack.util import CLIError
 from knack.log import get_logger
 from msrestazure.azure_exceptions import CloudError
-from azure.common import AzureHttpError
-from azure.cli.core.profiles import ResourceType, get_sdk
-from ._azure_utils import get_blob_info
+from azure.cli.core.util import should_disable_connection_verify
 
 logger = get_logger(__name__)
 
-DEFAULT_CHUNK_SIZE = 1024 * 4
 DEFAULT_LOG_TIMEOUT_IN_SEC = 60 * 30  # 30 minutes
+LOG_REQUEST_TIMEOUT_IN_SEC = 60
+# Size of the ranges of the log blob read by each request
+LOG_CHUNK_SIZE = 4 * 1024 * 1024
+# Polling interval of the logs, doubled after a number of polls without new logs
+LOG_POLL_MIN_INTERVAL_IN_SEC = 1
+LOG_POLL_MAX_INTERVAL_IN_SEC = 15
+LOG_POLLS_FOR_BACKOFF = 3
 
 
 def stream_logs(cmd, client,
@@ -26,197 +29,235 @@ def stream_logs(cmd, client,
                 resource_group_name,
                 no_format=False,
                 raise_error_on_failure=False):
-    log_file_sas = None
-    artifact = False
-    error_msg = "Could not get logs for ID: {}".format(run_id)
+    stream_logs_of_runs(cmd, client, [run_id], registry_name, resource_group_name,
+                        no_format=no_format, raise_error_on_failure=raise_error_on_failure)
+
+
+def stream_logs_of_runs(cmd, client,  # pylint: disable=unused-argument
+                        run_ids,
+                        registry_name,
+                        resource_group_name,
+                        no_format=False,
+                        raise_error_on_failure=False):
+    """Stream the logs of several runs at once. Lines are prefixed with the run ID if there are several runs."""
+    if not no_format:
+        colorama.init()
+
+    show_run_id = len(run_ids) > 1
+    followers = []
+    with requests.Session() as session:
+        for run_id in run_ids:
+            log_file_sas, artifact = _get_log_sas_url(client, run_id, registry_name, resource_group_name)
+            if artifact:
+                _stream_artifact_logs(log_file_sas, True, run_id if show_run_id else None)
+            else:
+                followers.append(_LogFollower(run_id, log_file_sas, session))
+
+        if not _follow_logs(followers, DEFAULT_LOG_TIMEOUT_IN_SEC, show_run_id):
+            return
+
+    errors = []
+    for follower in followers:
+        if not follower.complete:
+            continue
+        build_status = follower.status.lower()
+        logger.debug("status of run '%s' was: '%s'", follower.run_id, build_status)
+        error = _get_run_failure_message(build_status)
+        if error:
+            errors.append("{}: {}".format(follower.run_id, error) if show_run_id else error)
+
+    if raise_error_on_failure and errors:
+        raise CLIError('\n'.join(errors))
+
 
+def _get_log_sas_url(client, run_id, registry_name, resource_group_name):
+    error_msg = "Could not get logs for ID: {}".format(run_id)
     try:
         response = client.get_log_sas_url(
             resource_group_name=resource_group_name,
             registry_name=registry_name,
             run_id=run_id)
-        if not response.log_artifact_link:
-            log_file_sas = response.log_link
-        else:
-            log_file_sas = response.log_artifact_link
-            artifact = True
     except (AttributeError, CloudError) as e:
         logger.debug("%s Exception: %s", error_msg, e)
         raise CLIError(error_msg)
 
-    if not log_file_sas:
+    if response.log_artifact_link:
+        return response.log_artifact_link, True
+    if not response.log_link:
         logger.debug("%s Empty SAS URL.", error_msg)
         raise CLIError(error_msg)
-
-    if not artifact:
-        account_name, endpoint_suffix, container_name, blob_name, sas_token = get_blob_info(
-            log_file_sas)
-        AppendBlobService = get_sdk(cmd.cli_ctx, ResourceType.DATA_STORAGE, 'blob#AppendBlobService')
-        _stream_logs(no_format,
-                     DEFAULT_CHUNK_SIZE,
-                     DEFAULT_LOG_TIMEOUT_IN_SEC,
-                     AppendBlobService(
-                         account_name=account_name,
-                         sas_token=sas_token,
-                         endpoint_suffix=endpoint_suffix),
-                     container_name,
-                     blob_name,
-                     raise_error_on_failure)
-    else:
-        _stream_artifact_logs(log_file_sas,
-                              no_format)
-
-
-def _stream_logs(no_format,  # pylint: disable=too-many-locals, too-many-statements, too-many-branches
-                 byte_size,
-                 timeout_in_seconds,
-                 blob_service,
-                 container_name,
-                 blob_name,
-                 raise_error_on_failure):
-
-    if not no_format:
-        colorama.init()
-
-    log_exist = False
-    stream = BytesIO()
-    metadata = {}
-    start = 0
-    end = byte_size - 1
-    available = 0
-    sleep_time = 1
-    max_sleep_time = 15
-    num_fails = 0
-    num_fails_for_backoff = 3
-    consecutive_sleep_in_sec = 0
-
-    # Try to get the initial properties so there's no waiting.
-    # If the storage call fails, we'll just sleep and try again after.
-    try:
-        # Need to call "exists" API to prevent storage SDK logging BlobNotFound error
-        log_exist = blob_service.exists(
-            container_name=container_name, blob_name=blob_name)
-
-        if log_exist:
-            props = blob_service.get_blob_properties(
-                container_name=container_name, blob_name=blob_name)
-            metadata = props.metadata
-            available = props.properties.content_length
-        else:
-            # Wait a little bit before checking the existence again
-            time.sleep(1)
-    except (AttributeError, AzureHttpError):
-        pass
-
-    while (_blob_is_not_complete(metadata) or start < available):
-        while start < available:
-            # Success! Reset our polling backoff.
-            sleep_time = 1
-            num_fails = 0
-            consecutive_sleep_in_sec = 0
-
-            try:
-                old_byte_size = len(stream.getvalue())
-                blob_service.get_blob_to_stream(
-                    container_name=container_name,
-                    blob_name=blob_name,
-                    start_range=start,
-                    end_range=end,
-                    stream=stream)
-
-                curr_bytes = stream.getvalue()
-                new_byte_size = len(curr_bytes)
-                amount_read = new_byte_size - old_byte_size
-                start += amount_read
-                end = start + byte_size - 1
-
-                # Only scan what's newly read. If nothing is read, default to 0.
-                min_scan_range = max(new_byte_size - amount_read - 1, 0)
-                for i in range(new_byte_size - 1, min_scan_range, -1):
-                    if curr_bytes[i - 1:i + 1] == b'\r\n':
-                        flush = curr_bytes[:i]  # won't print \n
-                        stream = BytesIO()
-                        stream.write(curr_bytes[i + 1:])
-                        print(flush.decode('utf-8', errors='ignore'))
-                        break
-            except AzureHttpError as ae:
-                if ae.status_code != 404:
-                    raise CLIError(ae)
-            except KeyboardInterrupt:
-                curr_bytes = stream.getvalue()
-                if curr_bytes:
-                    print(curr_bytes.decode('utf-8', errors='ignore'))
-                return
-
+    return response.log_link, False
+
+
+def _get_run_failure_message(build_status):
+    if build_status in ('internalerror', 'failed'):
+        return "Run failed"
+    if build_status == 'timedout':
+        return "Run timed out"
+    if build_status == 'canceled':
+        return "Run was canceled"
+    return None
+
+
+class _LogFollower:
+    """Follow the append blob of the logs of a run.
+    Each poll reads only the bytes appended since the previous one, and is conditional on the ETag of the blob, so
+    that polling an unchanged blob costs a 304 response without content. The bytes are read in bounded ranges, as
+    long as full ranges are returned.
+    """
+
+    def __init__(self, run_id, log_file_sas, session):
+        self.run_id = run_id
+        self.status = None
+        self.last_update_time = time.time()
+        self._url = log_file_sas
+        self._session = session
+        self._etag = None
+        self._offset = 0
+        # Bytes after the last line break read so far
+        self._pending = bytearray()
+
+    @property
+    def complete(self):
+        return self.status is not None
+
+    def poll(self):
+        """Read the logs appended since the last poll.
+        :return: The new complete lines, separated by CRLF, or None if there are none
+        """
+        content = bytearray()
+        # Only the first range is conditional, as the ETag is updated by each range read
+        conditional = True
+        more = True
+        while more:
+            chunk, more = self._read_range(conditional)
+            content += chunk
+            conditional = False
+        if content:
+            self.last_update_time = time.time()
+        return self._read_lines(content)
+
+    def _read_range(self, conditional):
+        """Read the next range of the blob.
+        :return: The content of the range, and whether there may be more content after it
+        """
+        headers = {'Range': 'bytes={}-{}'.format(self._offset, self._offset + LOG_CHUNK_SIZE - 1)}
+        if conditional and self._etag:
+            headers['If-None-Match'] = self._etag
+        response = self._request('get', headers)
+        if response.status_code in (304, 404):
+            return b'', False
+        if response.status_code == 416:
+            # There is no new content, but the blob changed, e.g. the run completed
+            response = self._request('head', {})
+            if response.status_code != 404:
+                self._update_properties(response)
+            return b'', False
+        self._update_properties(response)
+        content = response.content
+        if response.status_code == 200:
+            # The whole blob was returned instead of the requested range
+            content = content[self._offset:]
+        self._offset += len(content)
+        return content, response.status_code == 206 and len(content) == LOG_CHUNK_SIZE
+
+    def flush(self):
+        """Get the remaining content, which doesn't end with a line break."""
+        remaining, self._pending = bytes(self._pending), bytearray()
+        return remaining.decode('utf-8', errors='ignore') if remaining else None
+
+    def _request(self, method, headers):
         try:
-            if log_exist:
-                props = blob_service.get_blob_properties(
-                    container_name=container_name, blob_name=blob_name)
-                metadata = props.metadata
-                available = props.properties.content_length
-            else:
-                log_exist = blob_service.exists(
-                    container_name=container_name, blob_name=blob_name)
-        except AzureHttpError as ae:
-            if ae.status_code != 404:
-                raise CLIError(ae)
-        except KeyboardInterrupt:
-            if curr_bytes:
-                print(curr_bytes.decode('utf-8', errors='ignore'))
-            return
-        except Exception as err:
-            raise CLIError(err)
-
-        if consecutive_sleep_in_sec > timeout_in_seconds:
-            # Flush anything remaining in the buffer - this would be the case
-            # if the file has expired and we weren't able to detect any \r\n
-            curr_bytes = stream.getvalue()
-            if curr_bytes:
-                print(curr_bytes.decode('utf-8', errors='ignore'))
-
-            logger.warning("Failed to find any new logs in %d seconds. Client will stop polling for additional logs.",
-                           consecutive_sleep_in_sec)
-            return
+            response = self._session.request(method, self._url, headers=headers, timeout=LOG_REQUEST_TIMEOUT_IN_SEC,
+                                             verify=(not should_disable_connection_verify()))
+        except requests.RequestException as e:
+            raise CLIError(e)
+        if response.status_code >= 400 and response.status_code not in (404, 416):
+            raise CLIError("Failed to get logs of run '{}'. Status code: {}".format(self.run_id,
+                                                                                    response.status_code))
+        return response
+
+    def _update_properties(self, response):
+        self._etag = response.headers.get('ETag')
+        self.status = response.headers.get('x-ms-meta-complete')
+
+    def _read_lines(self, content):
+        # Only scan the new content for the last line break, which may start with the last pending byte
+        scan_start = max(len(self._pending) - 1, 0)
+        self._pending += content
+        line_break = self._pending.rfind(b'\r\n', scan_start)
+        if line_break < 0:
+            return None
+        lines = bytes(self._pending[:line_break])
+        del self._pending[:line_break + 2]
+        return lines.decode('utf-8', errors='ignore')
+
+
+def _print_logs(text, run_id=None):
+    if run_id:
+        text = '\n'.join('{}: {}'.format(run_id, line) for line in text.split('\r\n'))
+    print(text)
+
+
+def _follow_logs(followers, timeout_in_seconds, show_run_id):
+    """Poll the logs of the runs until they complete.
+    :return: False if interrupted by the user
+    """
+    active = list(followers)
+    poll_interval = LOG_POLL_MIN_INTERVAL_IN_SEC
+    num_idle_polls = 0
+
+    def _flush(follower):
+        remaining = follower.flush()
+        if remaining:
+            _print_logs(remaining, follower.run_id if show_run_id else None)
 
-        # If no new data available but not complete, sleep before trying to process additional data.
-        if (_blob_is_not_complete(metadata) and start >= available):
-            num_fails += 1
-
-            logger.debug(
-                "Failed to find new content %d times in a row", num_fails)
-            if num_fails >= num_fails_for_backoff:
-                num_fails = 0
-                sleep_time = min(sleep_time * 2, max_sleep_time)
-                logger.debug("Resetting failure count to %d", num_fails)
-
-            rnd = uniform(1, 2)  # 1.0 <= x < 2.0
-            total_sleep_time = sleep_time + rnd
-            consecutive_sleep_in_sec += total_sleep_time
-            logger.debug("Base sleep time: %d, random delay: %d, total: %d, consecutive: %d",
-                         sleep_time, rnd, total_sleep_time, consecutive_sleep_in_sec)
-            time.sleep(total_sleep_time)
-
-    # One final check to see if there's anything in the buffer to flush
-    # E.g., metadata has been set and start == available, but the log file
-    # didn't end in \r\n, so we were unable to flush out the final contents.
-    curr_bytes = stream.getvalue()
-    if curr_bytes:
-        print(curr_bytes.decode('utf-8', errors='ignore'))
-
-    build_status = _get_run_status(metadata).lower()
-    logger.debug("status was: '%s'", build_status)
-
-    if raise_error_on_failure:
-        if build_status in ('internalerror', 'failed'):
-            raise CLIError("Run failed")
-        if build_status == 'timedout':
-            raise CLIError("Run timed out")
-        if build_status == 'canceled':
-            raise CLIError("Run was canceled")
+    try:
+        while active:
+            has_new_logs = False
+            for follower in list(active):
+                text = follower.poll()
+                if text is not None:
+                    has_new_logs = True
+                    _print_logs(text, follower.run_id if show_run_id else None)
+                if follower.complete:
+                    _flush(follower)
+                    active.remove(follower)
+                elif time.time() - follower.last_update_time > timeout_in_seconds:
+                    # Flush anything remaining in the buffer - this would be the case
+                    # if the file has expired and we weren't able to detect any \r\n
+                    _flush(follower)
+                    active.remove(follower)
+                    logger.warning("Failed to find any new logs%s in %d seconds. "
+                                   "Client will stop polling for additional logs.",
+                                   " of run '{}'".format(follower.run_id) if show_run_id else "",
+                                   timeout_in_seconds)
+
+            if has_new_logs:
+                # Success! Reset our polling backoff.
+                poll_interval = LOG_POLL_MIN_INTERVAL_IN_SEC
+                num_idle_polls = 0
+                continue
+            if not active:
+                break
+
+            # If no new data available but not complete, sleep before trying to process additional data.
+            num_idle_polls += 1
+            logger.debug("Failed to find new content %d times in a row", num_idle_polls)
+            if num_idle_polls >= LOG_POLLS_FOR_BACKOFF:
+                num_idle_polls = 0
+                poll_interval = min(poll_interval * 2, LOG_POLL_MAX_INTERVAL_IN_SEC)
+            time.sleep(poll_interval + uniform(1, 2))
+    except KeyboardInterrupt:
+        for follower in active:
+            _flush(follower)
+        return False
+    return True
 
 
 def _stream_artifact_logs(log_file_sas,
-                          no_format):
+                          no_format,
+                          run_id=None):
 
     if not no_format:
         colorama.init()
@@ -230,22 +271,4 @@ def _stream_artifact_logs(log_file_sas,
         raise CLIError(err)
 
     for line in response.iter_lines():
-        print(line.decode('utf-8', errors='ignore'))
-
-
-def _blob_is_not_complete(metadata):
-    if not metadata:
-        return True
-    for key in metadata:
-        if key.lower() == 'complete':
-            return False
-    return True
-
-
-def _get_run_status(metadata):
-    if metadata is None:
-        return 'inprogress'
-    for key in metadata:
-        if key.lower() == 'complete':
-            return metadata[key]
-    return 'inprogress'
+        _print_logs(line.decode('utf-8', errors='ignore'), run_id)
@@ -4,6 +4,7 @@
 # --------------------------------------------------------------------------------------------
 
 
+import hashlib
 import uuid
 import tempfile
 
@@ -66,8 +67,10 @@ def acr_build(cmd,  # pylint: disable=too-many-locals
             # NOTE: os.path.basename is unable to parse "\" in the file path
             original_docker_file_name = os.path.basename(
                 docker_file_path.replace("\\", "/"))
-            docker_file_in_tar = '{}_{}'.format(
-                uuid.uuid4().hex, original_docker_file_name)
+            # Name the docker file after its content, so that identical contexts produce identical archives
+            with open(docker_file_path, 'rb') as f:
+                docker_file_hash = hashlib.sha256(f.read()).hexdigest()[:32]
+            docker_file_in_tar = '{}_{}'.format(docker_file_hash, original_docker_file_name)
 
             source_location = upload_source_code(
                 cmd, client_registries, registry_name, resource_group_name,
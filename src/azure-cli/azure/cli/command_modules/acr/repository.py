@@ -16,7 +16,9 @@ from ._docker_utils import (
     request_data_from_registry,
     get_access_credentials,
     RegistryException,
-    RepoAccessTokenPermission
+    RepoAccessTokenPermission,
+    EMPTY_GUID,
+    MAX_REGISTRY_CONNECTIONS
 )
 
 logger = get_logger(__name__)
@@ -27,6 +29,15 @@ ORDERBY_PARAMS = {
     'time_desc': 'timedesc'
 }
 DEFAULT_PAGINATION = 100
+# Default number of concurrent registry requests of `acr repository purge`
+DEFAULT_PURGE_CONCURRENCY = 10
+# Attempts of each registry request of `acr repository purge`, as large registries may throttle bulk operations
+PURGE_RETRY_TIMES = 6
+# Units of the duration of --ago, like '2d3h6m'
+AGO_UNITS = {'d': 'days', 'h': 'hours', 'm': 'minutes', 's': 'seconds'}
+# Media types of the manifests which reference other manifests, like the platform images of a multi-arch image
+MANIFEST_LIST_MEDIA_TYPES = ['application/vnd.docker.distribution.manifest.list.v2+json',
+                             'application/vnd.oci.image.index.v1+json']
 
 
 def _get_repository_path(repository=None):
@@ -74,7 +85,8 @@ def _obtain_data_from_registry(login_server,
                                password,
                                result_index,
                                top=None,
-                               orderby=None):
+                               orderby=None,
+                               retry_times=3):
     result_list = []
     execute_next_http_call = True
 
@@ -98,7 +110,8 @@ def _obtain_data_from_registry(login_server,
             username=username,
             password=password,
             result_index=result_index,
-            params=params)
+            params=params,
+            retry_times=retry_times)
 
         if result:
             result_list += result
@@ -424,6 +437,222 @@ def acr_repository_delete(cmd,
         password=password)[0]
 
 
+def acr_repository_purge(cmd,  # pylint: disable=too-many-locals
+                         registry_name,
+                         filters,
+                         ago=None,
+                         untagged=False,
+                         dry_run=False,
+                         concurrency=DEFAULT_PURGE_CONCURRENCY,
+                         resource_group_name=None,  # pylint: disable=unused-argument
+                         tenant_suffix=None,
+                         username=None,
+                         password=None,
+                         yes=False):
+    from concurrent.futures import ThreadPoolExecutor
+    repository_filters = _parse_purge_filters(filters)
+    cutoff = _get_purge_cutoff(ago)
+    concurrency = max(1, min(concurrency, MAX_REGISTRY_CONNECTIONS))
+
+    login_server, catalog_username, catalog_password = get_access_credentials(
+        cmd=cmd,
+        registry_name=registry_name,
+        tenant_suffix=tenant_suffix,
+        username=username,
+        password=password)
+
+    repositories = [repository for repository in _obtain_data_from_registry(
+        login_server=login_server,
+        path='/v2/_catalog',
+        username=catalog_username,
+        password=catalog_password,
+        result_index='repositories',
+        retry_times=PURGE_RETRY_TIMES) if any(f[0].fullmatch(repository) for f in repository_filters)]
+
+    permission = RepoAccessTokenPermission.METADATA_READ.value if dry_run \
+        else RepoAccessTokenPermission.DELETE_META_READ.value
+
+    def _find_purge_operations(repository):
+        if catalog_username == EMPTY_GUID:
+            _, repo_username, repo_password = get_access_credentials(
+                cmd=cmd,
+                registry_name=registry_name,
+                tenant_suffix=tenant_suffix,
+                username=username,
+                password=password,
+                repository=repository,
+                permission=permission)
+        else:
+            # Basic auth credentials are valid for all the repositories
+            repo_username, repo_password = catalog_username, catalog_password
+
+        try:
+            manifests = _obtain_data_from_registry(
+                login_server=login_server,
+                path=_get_manifest_path(repository),
+                username=repo_username,
+                password=repo_password,
+                result_index='manifests',
+                retry_times=PURGE_RETRY_TIMES)
+        except RegistryException as e:
+            if e.status_code != 404:
+                raise
+            logger.debug("Repository '%s' was deleted while being listed.", repository)
+            manifests = []
+
+        # Untagged manifests may still be referenced by manifest lists, which are only read when they are purged
+        manifest_references = {
+            manifest['digest']: _get_referenced_manifests(login_server, repository, manifest['digest'],
+                                                          repo_username, repo_password)
+            for manifest in manifests if manifest.get('mediaType') in MANIFEST_LIST_MEDIA_TYPES} if untagged else {}
+
+        tag_patterns = [f[1] for f in repository_filters if f[0].fullmatch(repository)]
+        return [(repository, path, image, operation, repo_username, repo_password) for path, image, operation in
+                _get_purge_operations(repository, manifests, tag_patterns, cutoff, untagged, manifest_references)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        operations = [operation for repository_operations in executor.map(_find_purge_operations, repositories)
+                      for operation in repository_operations]
+
+    result = [{'image': image, 'operation': operation} for _, _, image, operation, _, _ in operations]
+    if dry_run or not operations:
+        return result
+
+    deletions = sum(1 for item in result if item['operation'] == 'delete')
+    user_confirmation("This operation will delete {} manifests and untag {} images in {} repositories.\n"
+                      "Are you sure you want to continue?".format(
+                          deletions, len(result) - deletions, len({op[0] for op in operations})), yes)
+
+    def _run_purge_operation(operation):
+        _, path, image, _, repo_username, repo_password = operation
+        try:
+            request_data_from_registry(
+                http_method='delete',
+                login_server=login_server,
+                path=path,
+                username=repo_username,
+                password=repo_password,
+                retry_times=PURGE_RETRY_TIMES)
+        except RegistryException as e:
+            if e.status_code != 404:
+                return '{}: {}'.format(image, e)
+        except CLIError as e:
+            return '{}: {}'.format(image, e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        errors = [error for error in executor.map(_run_purge_operation, operations) if error]
+
+    if errors:
+        raise CLIError("Failed to purge {} of {} images:\n{}".format(len(errors), len(operations), '\n'.join(errors)))
+    return result
+
+
+def _parse_purge_filters(filters):
+    """Parse filters in the format 'REPOSITORY_REGEX:TAG_REGEX' into compiled (repository, tag) patterns."""
+    import re
+    repository_filters = []
+    for item in filters or []:
+        repository_pattern, separator, tag_pattern = item.partition(':')
+        if not separator or not repository_pattern or not tag_pattern:
+            raise CLIError("Invalid filter '{}'. The format is 'REPOSITORY_REGEX:TAG_REGEX'.".format(item))
+        try:
+            repository_filters.append((re.compile(repository_pattern), re.compile(tag_pattern)))
+        except re.error as e:
+            raise CLIError("Invalid regular expression in filter '{}': {}".format(item, e))
+    if not repository_filters:
+        raise CLIError('Usage error: --filter REPOSITORY_REGEX:TAG_REGEX is required.')
+    return repository_filters
+
+
+def _get_purge_cutoff(ago):
+    """Get the UTC time before which images are purged, or None to purge images of any age."""
+    import re
+    from datetime import datetime, timedelta
+    if not ago:
+        return None
+    match = re.fullmatch(r'(\d+d)?(\d+h)?(\d+m)?(\d+s)?', ago)
+    if not match or not any(match.groups()):
+        raise CLIError("Invalid duration '{}'. Use a duration like '30d', '12h' or '1d6h30m'.".format(ago))
+    duration = timedelta(**{AGO_UNITS[group[-1]]: int(group[:-1]) for group in match.groups() if group})
+    return datetime.utcnow() - duration
+
+
+def _get_referenced_manifests(login_server, repository, digest, username, password):
+    """Get the digests of the manifests which a manifest list or an OCI index references."""
+    try:
+        manifest_list = request_data_from_registry(
+            http_method='get',
+            login_server=login_server,
+            path='/v2/{}/manifests/{}'.format(repository, digest),
+            username=username,
+            password=password,
+            retry_times=PURGE_RETRY_TIMES,
+            headers={'Accept': ', '.join(MANIFEST_LIST_MEDIA_TYPES)})[0]
+    except RegistryException as e:
+        if e.status_code != 404:
+            raise
+        logger.debug("Manifest '%s@%s' was deleted while being listed.", repository, digest)
+        return []
+    return [m['digest'] for m in manifest_list.get('manifests') or []]
+
+
+def _get_purge_operations(repository, manifests, tag_patterns, cutoff, untagged, manifest_references=None):
+    """Decide how to purge the manifests of a repository.
+    A manifest is deleted if all its tags match the tag patterns, or if it is untagged and `untagged` is True.
+    Otherwise the matching tags are untagged. Manifests updated after `cutoff` or locked are kept. Untagged
+    manifests referenced by a manifest list which is kept are kept too, as they are images of the list.
+    :param dict manifest_references: The digests of the manifests referenced by each manifest list
+    :return: A list of (path, image, operation) tuples, where operation is 'delete' or 'untag'
+    """
+    manifest_references = manifest_references or {}
+    operations = []
+    deleted = set()
+    untagged_deletions = {}
+    for manifest in manifests:
+        digest = manifest['digest']
+        if cutoff and _get_last_update_time(manifest) > cutoff:
+            continue
+        attributes = manifest.get('changeableAttributes') or {}
+        if attributes.get('deleteEnabled') is False or attributes.get('writeEnabled') is False:
+            logger.info("Skipping locked manifest '%s@%s'.", repository, digest)
+            continue
+        tags = manifest.get('tags') or []
+        matched_tags = [tag for tag in tags if any(pattern.fullmatch(tag) for pattern in tag_patterns)]
+        if (tags and len(matched_tags) == len(tags)) or (not tags and untagged):
+            operation = ('/v2/{}/manifests/{}'.format(repository, digest), '{}@{}'.format(repository, digest), 'delete')
+            operations.append(operation)
+            deleted.add(digest)
+            if not tags:
+                untagged_deletions[digest] = operation
+        else:
+            operations.extend((_get_tag_path(repository, tag), '{}:{}'.format(repository, tag), 'untag')
+                              for tag in matched_tags)
+
+    # Keep the manifests which the kept manifest lists reference, and those which they reference in turn
+    pending = [digest for digest in manifest_references if digest not in deleted]
+    referenced = set()
+    while pending:
+        for digest in manifest_references.get(pending.pop(), []):
+            if digest not in referenced:
+                referenced.add(digest)
+                pending.append(digest)
+    for digest in referenced.intersection(untagged_deletions):
+        logger.info("Skipping manifest '%s@%s' referenced by a manifest list.", repository, digest)
+        operations.remove(untagged_deletions[digest])
+    return operations
+
+
+def _get_last_update_time(manifest):
+    from datetime import datetime
+    try:
+        # Timestamps have up to 7 fractional digits, which strptime doesn't support
+        return datetime.strptime(manifest['lastUpdateTime'][:19], '%Y-%m-%dT%H:%M:%S')
+    except (KeyError, ValueError):
+        # Keep the manifest if its age is unknown
+        return datetime.max
+
+
 def _validate_parameters(repository, image):
     if bool(repository) == bool(image):
         raise CLIError('Usage error: --image IMAGE | --repository REPOSITORY')
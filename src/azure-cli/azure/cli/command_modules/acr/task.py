@@ -21,7 +21,7 @@ from ._utils import (
     get_task_id_from_task_name,
     prepare_source_location,
 )
-from ._stream_utils import stream_logs
+from ._stream_utils import stream_logs, stream_logs_of_runs
 from ._constants import (
     ACR_NULL_CONTEXT,
     ACR_TASK_QUICKTASK,
@@ -982,6 +982,11 @@ def acr_task_logs(cmd,
     _, resource_group_name = validate_managed_registry(
         cmd, registry_name, resource_group_name, TASK_NOT_SUPPORTED)
 
+    if isinstance(run_id, list):
+        if len(run_id) > 1:
+            return stream_logs_of_runs(cmd, client, run_id, registry_name, resource_group_name)
+        run_id = run_id[0]
+
     if not run_id:
         # show logs for the last run
         paged_runs = acr_task_list_runs(cmd,
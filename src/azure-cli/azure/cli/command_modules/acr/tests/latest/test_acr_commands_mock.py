@@ -21,7 +21,8 @@ from azure.cli.command_modules.acr.repository import (
     acr_repository_show,
     acr_repository_update,
     acr_repository_delete,
-    acr_repository_untag
+    acr_repository_untag,
+    acr_repository_purge
 )
 from azure.cli.command_modules.acr.helm import (
     acr_helm_list,
@@ -38,7 +39,10 @@ from azure.cli.command_modules.acr._docker_utils import (
     EMPTY_GUID
 )
 from azure.cli.command_modules.acr._docker_utils import ResourceNotFound
+from azure.cli.command_modules.acr._archive_utils import upload_source_code, _pack_source_code
+from azure.cli.command_modules.acr._stream_utils import stream_logs, stream_logs_of_runs
 from azure.cli.core.mock import DummyCli
+from knack.util import CLIError
 
 
 TEST_TENANT = 'testtenant'
@@ -52,7 +56,7 @@ TEST_REPOSITORY = 'testrepository'
 class AcrMockCommandsTests(unittest.TestCase):
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_list(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -93,7 +97,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show_tags(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -149,7 +153,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show_manifests(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -200,7 +204,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -255,7 +259,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_show(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -320,7 +324,7 @@ class AcrMockCommandsTests(unittest.TestCase):
 
     @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
     @mock.patch('azure.cli.command_modules.acr.repository._get_manifest_digest', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_repository_delete(self, mock_requests_delete, mock_get_manifest_digest, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -389,8 +393,8 @@ class AcrMockCommandsTests(unittest.TestCase):
 
     @mock.patch('azure.cli.core._profile.Profile.get_subscription_id', autospec=True)
     @mock.patch('azure.cli.command_modules.acr._docker_utils.get_registry_by_name', autospec=True)
-    @mock.patch('requests.post', autospec=True)
-    @mock.patch('requests.get', autospec=True)
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
     @mock.patch('azure.cli.core._profile.Profile.get_raw_token', autospec=True)
     def test_get_docker_credentials(self, mock_get_raw_token, mock_requests_get, mock_requests_post,
                                     mock_get_registry_by_name, mock_get_subscription):
@@ -501,20 +505,430 @@ class AcrMockCommandsTests(unittest.TestCase):
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
             verify=mock.ANY)
 
-    def _validate_access_token_request(self, mock_requests_get, mock_requests_post, login_server, scope):
+    def _validate_access_token_request(self, mock_requests_get, mock_requests_post, login_server, scope,
+                                       refresh_token=TEST_ACR_REFRESH_TOKEN):
         mock_requests_post.assert_called_with(
             'https://{}/oauth2/token'.format(login_server),
             urlencode({
                 'grant_type': 'refresh_token',
                 'service': login_server,
                 'scope': scope,
-                'refresh_token': TEST_ACR_REFRESH_TOKEN
+                'refresh_token': refresh_token
             }),
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
             verify=mock.ANY)
 
+    @mock.patch('azure.cli.core._profile.Profile.get_subscription', autospec=True)
+    @mock.patch('azure.cli.core._profile.Profile.get_subscription_id', autospec=True)
+    @mock.patch('azure.cli.command_modules.acr._docker_utils.get_registry_by_name', autospec=True)
+    @mock.patch('requests.Session.post')
+    @mock.patch('requests.Session.get')
+    @mock.patch('azure.cli.core._profile.Profile.get_raw_token', autospec=True)
+    def test_get_docker_credentials_from_token_cache(self, mock_get_raw_token, mock_requests_get, mock_requests_post,
+                                                     mock_get_registry_by_name, mock_get_subscription_id,
+                                                     mock_get_subscription):
+        import base64
+        import os
+        import tempfile
+        import time
+        from azure.cli.command_modules.acr import _docker_utils
+
+        def _jwt(name, expires_in):
+            payload = base64.urlsafe_b64encode(json.dumps({'exp': int(time.time()) + expires_in}).encode())
+            return 'header.{}.{}'.format(payload.decode().rstrip('='), name)
+
+        cmd = self._setup_cmd()
+        login_server = 'testregistry.azurecr.io'
+        registry = Registry(location='westus', sku=Sku(name='Standard'))
+        registry.login_server = login_server
+        mock_get_registry_by_name.return_value = registry, None
+        mock_get_subscription_id.return_value = TEST_SUBSCRIPTION
+        mock_get_subscription.return_value = {'id': TEST_SUBSCRIPTION, 'user': {'name': 'testuser'}}
+        self._setup_mock_token_requests(mock_get_raw_token, mock_requests_get, mock_requests_post, login_server)
+        refresh_token, access_token = _jwt('refresh', 3600), _jwt('access', 3600)
+        mock_requests_post.return_value.content = json.dumps({
+            'refresh_token': refresh_token, 'access_token': access_token}).encode()
+
+        with tempfile.TemporaryDirectory() as config_dir, \
+                mock.patch.dict('azure.cli.command_modules.acr._docker_utils._refresh_tokens', clear=True):
+            cmd.cli_ctx.config.config_dir = config_dir
+            pull = RepoAccessTokenPermission.METADATA_READ.value
+            self.assertEqual(get_access_credentials(cmd, 'testregistry', repository=TEST_REPOSITORY, permission=pull),
+                             (login_server, EMPTY_GUID, access_token))
+            self.assertEqual(mock_requests_post.call_count, 2)
+
+            # The access token of the same scope is served from the cache
+            mock_requests_get.reset_mock()
+            mock_requests_post.reset_mock()
+            mock_get_registry_by_name.reset_mock()
+            self.assertEqual(get_access_credentials(cmd, 'testregistry', repository=TEST_REPOSITORY, permission=pull),
+                             (login_server, EMPTY_GUID, access_token))
+            mock_requests_get.assert_not_called()
+            mock_requests_post.assert_not_called()
+            mock_get_registry_by_name.assert_not_called()
+
+            # Refresh tokens are handed out fresh, and are not written to the cache file
+            self.assertEqual(get_login_credentials(cmd, 'testregistry'), (login_server, EMPTY_GUID, refresh_token))
+            self.assertEqual(mock_requests_post.call_count, 1)
+            with open(os.path.join(config_dir, 'acrTokens.json')) as f:
+                self.assertNotIn(refresh_token, f.read())
+            mock_requests_get.reset_mock()
+            mock_requests_post.reset_mock()
+            mock_get_registry_by_name.reset_mock()
+
+            # The cached refresh token is exchanged for the access token of another scope
+            get_access_credentials(cmd, 'testregistry')
+            mock_requests_get.assert_not_called()
+            self._validate_access_token_request(mock_requests_get, mock_requests_post, login_server,
+                                                'registry:catalog:*', refresh_token=refresh_token)
+            mock_get_registry_by_name.assert_not_called()
+
+            # Access tokens about to expire are obtained again
+            mock_requests_post.return_value.content = json.dumps({'access_token': _jwt('access', 60)}).encode()
+            for _ in range(2):
+                mock_requests_post.reset_mock()
+                get_access_credentials(cmd, 'testregistry', repository='otherrepository', permission=pull)
+                self.assertEqual(mock_requests_post.call_count, 1)
+
+            # Another command reads the access tokens from the file, but gets a new refresh token for other scopes
+            _docker_utils._refresh_tokens.clear()
+            _docker_utils._token_cache.filename = None
+            mock_requests_post.reset_mock()
+            self.assertEqual(get_access_credentials(cmd, 'testregistry', repository=TEST_REPOSITORY, permission=pull),
+                             (login_server, EMPTY_GUID, access_token))
+            mock_requests_post.assert_not_called()
+            mock_requests_post.return_value.content = json.dumps({
+                'refresh_token': refresh_token, 'access_token': access_token}).encode()
+            get_access_credentials(cmd, 'testregistry', repository='thirdrepository', permission=pull)
+            self.assertEqual(mock_requests_post.call_count, 2)
+
+            # Nothing is cached for another account
+            mock_get_subscription.return_value = {'id': TEST_SUBSCRIPTION, 'user': {'name': 'otheruser'}}
+            mock_requests_post.reset_mock()
+            get_access_credentials(cmd, 'testregistry', repository=TEST_REPOSITORY, permission=pull)
+            self.assertEqual(mock_requests_post.call_count, 2)
+
+    @mock.patch('time.sleep')
+    @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
+    @mock.patch('requests.Session.request')
+    def test_repository_purge(self, mock_requests, mock_get_access_credentials, mock_sleep):
+        cmd = self._setup_cmd()
+        mock_get_access_credentials.return_value = 'testregistry.azurecr.io', 'username', 'password'
+        manifests = {
+            'hello-world': [
+                {'digest': 'sha256:old', 'tags': ['dev-1', 'dev-2'], 'lastUpdateTime': '2018-01-01T00:00:00.1234567Z'},
+                {'digest': 'sha256:mixed', 'tags': ['dev-3', 'v1'], 'lastUpdateTime': '2018-01-01T00:00:00Z'},
+                {'digest': 'sha256:untagged', 'lastUpdateTime': '2018-01-01T00:00:00Z'},
+                {'digest': 'sha256:locked', 'tags': ['dev-4'], 'lastUpdateTime': '2018-01-01T00:00:00Z',
+                 'changeableAttributes': {'deleteEnabled': False}},
+                {'digest': 'sha256:new', 'tags': ['dev-5'], 'lastUpdateTime': '2999-01-01T00:00:00Z'}
+            ],
+            'samples/hello-world': [
+                {'digest': 'sha256:other', 'tags': ['dev-6'], 'lastUpdateTime': '2018-01-01T00:00:00Z'}
+            ]
+        }
+        throttled = []
+
+        def _request(method, url, **kwargs):
+            response = mock.MagicMock()
+            response.headers = {}
+            response.status_code = 200
+            path = url[len('https://testregistry.azurecr.io'):]
+            if path == '/v2/_catalog':
+                response.content = json.dumps({'repositories': ['hello-world', 'samples/hello-world']}).encode()
+            elif path.endswith('/_manifests'):
+                repository = path[len('/acr/v1/'):-len('/_manifests')]
+                response.content = json.dumps({'manifests': manifests[repository]}).encode()
+            elif method == 'delete' and not throttled:
+                # Throttle the first deletion
+                throttled.append(path)
+                response.status_code = 429
+                response.headers = {'Retry-After': '7'}
+            else:
+                self.assertEqual(method, 'delete')
+                response.status_code = 202
+                response.content = b''
+            response.json.side_effect = lambda: json.loads(response.content.decode())
+            return response
+
+        mock_requests.side_effect = _request
+
+        expected = [
+            {'image': 'hello-world@sha256:old', 'operation': 'delete'},
+            {'image': 'hello-world:dev-3', 'operation': 'untag'},
+            {'image': 'hello-world@sha256:untagged', 'operation': 'delete'}
+        ]
+        self.assertEqual(acr_repository_purge(cmd, 'testregistry', ['hello-world:dev-.*'], ago='30d',
+                                              untagged=True, dry_run=True), expected)
+        self.assertFalse([c for c in mock_requests.call_args_list if c[1]['method'] == 'delete'])
+
+        self.assertEqual(acr_repository_purge(cmd, 'testregistry', ['hello-world:dev-.*'], ago='30d',
+                                              untagged=True, yes=True), expected)
+        deleted = sorted(c[1]['url'] for c in mock_requests.call_args_list if c[1]['method'] == 'delete')
+        # The throttled deletion is retried
+        self.assertEqual(deleted, sorted([
+            'https://testregistry.azurecr.io/acr/v1/hello-world/_tags/dev-3',
+            'https://testregistry.azurecr.io/v2/hello-world/manifests/sha256:old',
+            'https://testregistry.azurecr.io/v2/hello-world/manifests/sha256:untagged',
+            'https://testregistry.azurecr.io{}'.format(throttled[0])
+        ]))
+        mock_sleep.assert_called_once_with(7)
+
+        with self.assertRaises(CLIError):
+            acr_repository_purge(cmd, 'testregistry', ['hello-world'])
+        with self.assertRaises(CLIError):
+            acr_repository_purge(cmd, 'testregistry', ['hello-world:.*'], ago='1y')
+
+    @mock.patch('azure.cli.command_modules.acr.repository.get_access_credentials', autospec=True)
+    @mock.patch('requests.Session.request')
+    def test_repository_purge_keeps_manifest_list_images(self, mock_requests, mock_get_access_credentials):
+        cmd = self._setup_cmd()
+        mock_get_access_credentials.return_value = 'testregistry.azurecr.io', 'username', 'password'
+        index_type = 'application/vnd.oci.image.index.v1+json'
+        image_type = 'application/vnd.oci.image.manifest.v1+json'
+        manifests = [
+            {'digest': 'sha256:index', 'tags': ['v1'], 'mediaType': index_type},
+            {'digest': 'sha256:amd64', 'mediaType': image_type},
+            {'digest': 'sha256:arm64', 'mediaType': image_type},
+            {'digest': 'sha256:nested', 'mediaType': index_type},
+            {'digest': 'sha256:nested-child', 'mediaType': image_type},
+            {'digest': 'sha256:old-index', 'tags': ['dev-1'], 'mediaType': index_type},
+            {'digest': 'sha256:old-amd64', 'mediaType': image_type},
+            {'digest': 'sha256:orphan', 'mediaType': image_type}
+        ]
+        references = {
+            'sha256:index': ['sha256:amd64', 'sha256:arm64', 'sha256:nested'],
+            'sha256:nested': ['sha256:nested-child'],
+            'sha256:old-index': ['sha256:old-amd64']
+        }
+        for manifest in manifests:
+            manifest['lastUpdateTime'] = '2018-01-01T00:00:00Z'
+
+        def _request(method, url, **kwargs):
+            response = mock.MagicMock()
+            response.headers = {}
+            response.status_code = 200
+            path = url[len('https://testregistry.azurecr.io'):]
+            if path == '/v2/_catalog':
+                response.content = json.dumps({'repositories': ['multi-arch']}).encode()
+            elif path == '/acr/v1/multi-arch/_manifests':
+                response.content = json.dumps({'manifests': manifests}).encode()
+            else:
+                digest = path[len('/v2/multi-arch/manifests/'):]
+                self.assertEqual(method, 'get')
+                self.assertIn(index_type, kwargs['headers']['Accept'])
+                response.content = json.dumps({'mediaType': index_type, 'manifests': [
+                    {'digest': child, 'mediaType': image_type} for child in references[digest]]}).encode()
+            response.json.side_effect = lambda: json.loads(response.content.decode())
+            return response
+
+        mock_requests.side_effect = _request
+
+        # The images of the kept index are kept, those of the deleted index are deleted along with it
+        self.assertEqual(acr_repository_purge(cmd, 'testregistry', ['multi-arch:dev-.*'], untagged=True,
+                                              dry_run=True), [
+            {'image': 'multi-arch@sha256:old-index', 'operation': 'delete'},
+            {'image': 'multi-arch@sha256:old-amd64', 'operation': 'delete'},
+            {'image': 'multi-arch@sha256:orphan', 'operation': 'delete'}
+        ])
+        fetched = sorted(c[1]['url'] for c in mock_requests.call_args_list if '/v2/multi-arch/' in c[1]['url'])
+        self.assertEqual(fetched, ['https://testregistry.azurecr.io/v2/multi-arch/manifests/sha256:{}'.format(d)
+                                   for d in ['index', 'nested', 'old-index']])
+
+        # Manifest lists are only read when untagged manifests are purged
+        mock_requests.reset_mock()
+        acr_repository_purge(cmd, 'testregistry', ['multi-arch:dev-.*'], dry_run=True)
+        self.assertFalse([c for c in mock_requests.call_args_list if '/v2/multi-arch/' in c[1]['url']])
+
+    def test_pack_source_code(self):
+        import os
+        import tarfile
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_location = os.path.join(temp_dir, 'src')
+            files = {
+                'Dockerfile': b'FROM scratch',
+                '.dockerignore': b'node_modules\nlogs\n!logs/keep.log\n',
+                'app.bin': os.urandom(3 * 1024 * 1024),
+                'node_modules/a/b.js': b'b',
+                'logs/keep.log': b'keep',
+                'logs/skip.log': b'skip',
+                '.git/config': b'config'
+            }
+            for name, content in files.items():
+                path = os.path.join(source_location, *name.split('/'))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+
+            hashes = set()
+            for pack_workers in [1, 3]:
+                tar_file_path = os.path.join(temp_dir, 'archive{}.tar.gz'.format(pack_workers))
+                with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+                    hashes.add(_pack_source_code(source_location, tar_file_path,
+                                                 os.path.join(source_location, 'Dockerfile'), 'abc_Dockerfile',
+                                                 pack_workers=pack_workers))
+                # Ignored directories without exceptions are not walked
+                listed = {os.path.relpath(c[0][0], source_location) for c in mock_listdir.call_args_list}
+                self.assertEqual(listed, {'.', 'logs'})
+
+                with tarfile.open(tar_file_path, 'r:gz') as tar:
+                    self.assertEqual(sorted(tar.getnames()),
+                                     ['', '.dockerignore', 'Dockerfile', 'abc_Dockerfile', 'app.bin', 'logs/keep.log'])
+                    self.assertEqual(tar.extractfile('app.bin').read(), files['app.bin'])
+            # The content hash doesn't depend on the compression
+            self.assertEqual(len(hashes), 1)
+
+    def test_pack_source_code_prunes_like_unpruned_walk(self):
+        import os
+        import tarfile
+        import tempfile
+        from azure.cli.command_modules.acr import _archive_utils
+
+        archive_file_recursively = _archive_utils._archive_file_recursively
+
+        def _archive_without_pruning(*args, **kwargs):
+            kwargs['prune_check'] = None
+            return archive_file_recursively(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_location = os.path.join(temp_dir, 'src')
+            for name in ['Dockerfile', 'top.txt', 'keep/main.py', 'keep/sub/x.txt', 'other/a.txt', 'other/b/c.txt']:
+                path = os.path.join(source_location, *name.split('/'))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(name.encode())
+
+            # Allow lists, which ignore everything and include some paths again
+            packed = {}
+            for dockerignore in ['*\n!keep\n', '*\n!keep/main.py\n', '**\n!keep\n', '*\n!/keep\n',
+                                 'keep\n!keep/sub\n', 'k*\n!keep/*.py\n', 'keep\nother\n!other/a.txt\n',
+                                 '*\n!*/b\n', '*\n!**/c.txt\n']:
+                with open(os.path.join(source_location, '.dockerignore'), 'w') as f:
+                    f.write(dockerignore)
+                names = []
+                for archive_file in [archive_file_recursively, _archive_without_pruning]:
+                    tar_file_path = os.path.join(temp_dir, 'archive.tar.gz')
+                    with mock.patch('azure.cli.command_modules.acr._archive_utils._archive_file_recursively',
+                                    archive_file):
+                        _pack_source_code(source_location, tar_file_path, '', None)
+                    with tarfile.open(tar_file_path, 'r:gz') as tar:
+                        names.append(sorted(tar.getnames()))
+                self.assertEqual(names[0], names[1], dockerignore)
+                packed[dockerignore] = names[0]
+            self.assertEqual(packed['*\n!keep\n'], ['keep', 'keep/main.py', 'keep/sub', 'keep/sub/x.txt'])
+
+    @mock.patch('azure.cli.command_modules.acr._archive_utils.get_subscription_id', autospec=True)
+    @mock.patch('azure.cli.command_modules.acr._archive_utils.get_sdk', autospec=True)
+    def test_upload_source_code_skips_identical_context(self, mock_get_sdk, mock_get_subscription_id):
+        import os
+        import tempfile
+
+        cmd = self._setup_cmd()
+        mock_get_subscription_id.return_value = TEST_SUBSCRIPTION
+        client = mock.MagicMock()
+        client.get_build_source_upload_url.return_value.upload_url = \
+            'https://account.blob.core.windows.net/container/source.tar.gz?sv=sas'
+        client.get_build_source_upload_url.return_value.relative_path = 'source/source.tar.gz'
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cmd.cli_ctx.config.config_dir = temp_dir
+            source_location = os.path.join(temp_dir, 'src')
+            os.makedirs(source_location)
+            with open(os.path.join(source_location, 'run.yaml'), 'w') as f:
+                f.write('steps: []')
+            tar_file_path = os.path.join(temp_dir, 'archive.tar.gz')
+
+            for _ in range(2):
+                self.assertEqual(upload_source_code(cmd, client, 'testregistry', 'testrg', source_location,
+                                                    tar_file_path, '', ''), 'source/source.tar.gz')
+            client.get_build_source_upload_url.assert_called_once_with('testrg', 'testregistry')
+            self.assertEqual(mock_get_sdk.return_value.return_value.create_blob_from_path.call_count, 1)
+
+            # A modified context is uploaded again
+            with open(os.path.join(source_location, 'run.yaml'), 'w') as f:
+                f.write('steps: [1]')
+            upload_source_code(cmd, client, 'testregistry', 'testrg', source_location, tar_file_path, '', '')
+            self.assertEqual(client.get_build_source_upload_url.call_count, 2)
+
+    @mock.patch('time.sleep')
+    @mock.patch('requests.Session.request')
+    def test_stream_logs(self, mock_requests, mock_sleep):
+        cmd = self._setup_cmd()
+        client = mock.MagicMock()
+        client.get_log_sas_url.side_effect = lambda resource_group_name, registry_name, run_id: mock.MagicMock(
+            log_artifact_link=None, log_link='https://account.blob.core.windows.net/logs/{}.log?sv=sas'.format(run_id))
+
+        # The content appended to the blob of each run before each poll, and the final status
+        appends = {
+            'run1': [None, b'step 1\r\nst', None, None, b'ep 2 \xe2\x9c', b'\x93\r\ndone', 'Succeeded'],
+            'run2': [b'hello\r\n', None, 'Failed']
+        }
+        blobs = {}
+        status_codes = []
+
+        def _request(method, url, headers, **kwargs):
+            run_id = url.split('/')[-1].split('.')[0]
+            blob = blobs.setdefault(run_id, {'content': b'', 'etag': 0, 'status': None})
+            if method == 'get' and appends[run_id]:
+                append = appends[run_id].pop(0)
+                if isinstance(append, str):
+                    blob['status'] = append
+                    blob['etag'] += 1
+                elif append:
+                    blob['content'] += append
+                    blob['etag'] += 1
+            response = mock.MagicMock()
+            response.headers = {'ETag': str(blob['etag'])}
+            if blob['status']:
+                response.headers['x-ms-meta-complete'] = blob['status']
+            offset, end = (int(i) for i in headers['Range'][len('bytes='):].split('-')) if method == 'get' else (0, 0)
+            if method == 'head':
+                response.status_code = 200
+            elif headers.get('If-None-Match') == str(blob['etag']):
+                response.status_code = 304
+            elif offset >= len(blob['content']):
+                response.status_code = 416
+            else:
+                response.status_code = 206
+                response.content = blob['content'][offset:end + 1]
+            status_codes.append(response.status_code)
+            return response
+
+        mock_requests.side_effect = _request
+
+        with mock.patch('builtins.print') as mock_print:
+            stream_logs(cmd, client, 'run1', 'testregistry', 'testrg', no_format=True, raise_error_on_failure=True)
+        self.assertEqual([c[0][0] for c in mock_print.call_args_list], ['step 1', 'step 2 \u2713', 'done'])
+        # Polls of unchanged blobs are conditional and don't read content
+        self.assertEqual(status_codes, [416, 200, 206, 304, 304, 206, 206, 416, 200])
+        self.assertTrue(all('If-None-Match' in c[1]['headers'] for c in mock_requests.call_args_list[1:]
+                            if c[0][0] == 'get'))
+
+        appends['run1'] = [b'again\r\n', 'Failed']
+        blobs.clear()
+        with mock.patch('builtins.print') as mock_print:
+            with self.assertRaisesRegex(CLIError, 'run2: Run failed'):
+                stream_logs_of_runs(cmd, client, ['run1', 'run2'], 'testregistry', 'testrg', no_format=True,
+                                    raise_error_on_failure=True)
+        self.assertEqual(sorted(c[0][0] for c in mock_print.call_args_list), ['run1: again', 'run2: hello'])
+
+        # The logs are read in bounded ranges, until a range isn't full
+        appends['run1'] = [b'step 1\r\nstep 2\r\n', 'Succeeded']
+        blobs.clear()
+        del status_codes[:]
+        mock_requests.reset_mock()
+        with mock.patch('azure.cli.command_modules.acr._stream_utils.LOG_CHUNK_SIZE', 4), \
+                mock.patch('builtins.print') as mock_print:
+            stream_logs(cmd, client, 'run1', 'testregistry', 'testrg', no_format=True, raise_error_on_failure=True)
+        self.assertEqual([c[0][0] for c in mock_print.call_args_list], ['step 1\r\nstep 2'])
+        self.assertEqual(status_codes, [206, 206, 206, 206, 416, 200])
+        self.assertEqual([c[1]['headers']['Range'] for c in mock_requests.call_args_list if c[0][0] == 'get'],
+                         ['bytes=0-3', 'bytes=4-7', 'bytes=8-11', 'bytes=12-15', 'bytes=16-19'])
+
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_list(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -552,7 +966,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_show(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -597,7 +1011,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_delete(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -631,7 +1045,7 @@ class AcrMockCommandsTests(unittest.TestCase):
             verify=mock.ANY)
 
     @mock.patch('azure.cli.command_modules.acr.helm.get_access_credentials', autospec=True)
-    @mock.patch('requests.request', autospec=True)
+    @mock.patch('requests.Session.request')
     def test_helm_push(self, mock_requests_get, mock_get_access_credentials):
         cmd = self._setup_cmd()
 
@@ -37,6 +37,11 @@ FUNCTIONS_NO_V2_REGIONS = {
     "USSec West",
     "USSec East"
 }
+ZIP_DEPLOY_UPLOAD_ATTEMPTS = 3
+ZIP_DEPLOY_TRANSIENT_STATUS_CODES = [408, 429, 502, 503, 504]
+DEPLOYMENT_STATUS_TIMEOUT = 900  # seconds
+DEPLOYMENT_STATUS_MIN_POLL_INTERVAL = 1  # seconds
+DEPLOYMENT_STATUS_MAX_POLL_INTERVAL = 10  # seconds
 GITHUB_OAUTH_CLIENT_ID = "8d8e1f6000648c575489"
 GITHUB_OAUTH_SCOPES = [
     "admin:repo_hook",
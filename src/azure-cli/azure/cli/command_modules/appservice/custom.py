@@ -62,7 +62,9 @@ from ._create_util import (zip_contents_from_dir, get_runtime_version_details, c
 from ._constants import (FUNCTIONS_STACKS_API_JSON_PATHS, FUNCTIONS_STACKS_API_KEYS,
                          FUNCTIONS_LINUX_RUNTIME_VERSION_REGEX, FUNCTIONS_WINDOWS_RUNTIME_VERSION_REGEX,
                          NODE_EXACT_VERSION_DEFAULT, RUNTIME_STACKS, FUNCTIONS_NO_V2_REGIONS, PUBLIC_CLOUD,
-                         LINUX_GITHUB_ACTIONS_WORKFLOW_TEMPLATE_PATH, WINDOWS_GITHUB_ACTIONS_WORKFLOW_TEMPLATE_PATH)
+                         LINUX_GITHUB_ACTIONS_WORKFLOW_TEMPLATE_PATH, WINDOWS_GITHUB_ACTIONS_WORKFLOW_TEMPLATE_PATH,
+                         ZIP_DEPLOY_UPLOAD_ATTEMPTS, ZIP_DEPLOY_TRANSIENT_STATUS_CODES, DEPLOYMENT_STATUS_TIMEOUT,
+                         DEPLOYMENT_STATUS_MIN_POLL_INTERVAL, DEPLOYMENT_STATUS_MAX_POLL_INTERVAL)
 from ._github_oauth import (get_github_access_token)
 
 logger = get_logger(__name__)
@@ -424,25 +426,86 @@ def enable_zip_deploy(cmd, resource_group_name, name, src, timeout=None, slot=No
     import requests
     import os
     from azure.cli.core.util import should_disable_connection_verify
-    # Read file content
-    with open(os.path.realpath(os.path.expanduser(src)), 'rb') as fs:
-        zip_content = fs.read()
+    # The upload and the status checks share the connection to the scm site
+    with requests.Session() as session:
+        session.verify = not should_disable_connection_verify()
         logger.warning("Starting zip deployment. This operation can take a while to complete ...")
-        res = requests.post(zip_url, data=zip_content, headers=headers, verify=not should_disable_connection_verify())
+        res, retried = _upload_zip_deployment(cmd, session, zip_url, os.path.realpath(os.path.expanduser(src)),
+                                              headers)
         logger.warning("Deployment endpoint responded with status code %d", res.status_code)
 
-    # check if there's an ongoing process
-    if res.status_code == 409:
-        raise CLIError("There may be an ongoing deployment or your app setting has WEBSITE_RUN_FROM_PACKAGE. "
-                       "Please track your deployment in {} and ensure the WEBSITE_RUN_FROM_PACKAGE app setting "
-                       "is removed.".format(deployment_status_url))
-
-    # check the status of async deployment
-    response = _check_zip_deployment_status(cmd, resource_group_name, name, deployment_status_url,
-                                            authorization, timeout)
+        # check if there's an ongoing process. After a retry, it may be the deployment started by a failed attempt,
+        # which was received in full.
+        if res.status_code == 409 and retried:
+            logger.warning("A deployment is already in progress, possibly started by the previous attempt. "
+                           "Checking its status ...")
+        elif res.status_code == 409:
+            raise CLIError("There may be an ongoing deployment or your app setting has WEBSITE_RUN_FROM_PACKAGE. "
+                           "Please track your deployment in {} and ensure the WEBSITE_RUN_FROM_PACKAGE app setting "
+                           "is removed.".format(deployment_status_url))
+
+        # check the status of async deployment
+        response = _check_zip_deployment_status(cmd, resource_group_name, name, deployment_status_url,
+                                                authorization, timeout, session=session)
     return response
 
 
+def _upload_zip_deployment(cmd, session, zip_url, src, headers):
+    """
+    Stream the zip file to the zipdeploy endpoint, reporting the progress of the upload. As the endpoint can't resume
+    a partial upload, the upload is started over on connection errors and transient server errors.
+    :return: The response, and whether the upload was retried
+    """
+    import os
+    import requests
+    total = os.path.getsize(src)
+    progress_hook = cmd.cli_ctx.get_progress_controller(det=True)
+    attempt = 0
+    while True:
+        attempt += 1
+        error = None
+        with open(src, 'rb') as fs:
+            try:
+                res = session.post(zip_url, data=_UploadProgressReader(fs, total, progress_hook), headers=headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as ex:
+                if attempt == ZIP_DEPLOY_UPLOAD_ATTEMPTS:
+                    raise
+                error = str(ex)
+            finally:
+                progress_hook.end()
+        if error is None:
+            if res.status_code not in ZIP_DEPLOY_TRANSIENT_STATUS_CODES or attempt == ZIP_DEPLOY_UPLOAD_ATTEMPTS:
+                return res, attempt > 1
+            error = 'status code {}'.format(res.status_code)
+        delay = 2 ** attempt
+        logger.warning("Zip deployment upload failed with %s. Retrying in %d seconds ...", error, delay)
+        time.sleep(delay)
+
+
+class _UploadProgressReader:
+    """Wrap a file to report the progress as requests reads it for an upload."""
+
+    def __init__(self, stream, total, progress_hook):
+        self._stream = stream
+        self._total = total
+        self._progress_hook = progress_hook
+        self._read = 0
+        self._reported = 0
+
+    def __len__(self):
+        return self._total
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._read = min(self._read + len(data), self._total)
+        # The file is read in small blocks, so only update the view once per percent
+        if self._read - self._reported >= self._total / 100 or (data and self._read == self._total):
+            self._reported = self._read
+            self._progress_hook.add(message='Uploading', value=self._read, total_val=self._total)
+        return data
+
+
 def add_remote_build_app_settings(cmd, resource_group_name, name, slot):
     settings = get_app_settings(cmd, resource_group_name, name, slot)
     scm_do_build_during_deployment = None
@@ -3202,22 +3265,25 @@ def list_locations(cmd, sku, linux_workers_enabled=None):
     return [geo_region for geo_region in web_client_geo_regions if geo_region.name in providers_client_locations_list]
 
 
-def _check_zip_deployment_status(cmd, rg_name, name, deployment_status_url, authorization, timeout=None):
+def _check_zip_deployment_status(cmd, rg_name, name, deployment_status_url, authorization, timeout=None,
+                                 session=None):
     import requests
     from azure.cli.core.util import should_disable_connection_verify
-    total_trials = (int(timeout) // 2) if timeout else 450
-    num_trials = 0
-    while num_trials < total_trials:
-        time.sleep(2)
-        response = requests.get(deployment_status_url, headers=authorization,
-                                verify=not should_disable_connection_verify())
+    session = session or requests
+    deadline = time.time() + (int(timeout) if timeout else DEPLOYMENT_STATUS_TIMEOUT)
+    # Check quick deployments soon, and back off for long running ones
+    delay = DEPLOYMENT_STATUS_MIN_POLL_INTERVAL
+    res_dict = {}
+    while time.time() < deadline:
+        time.sleep(min(delay, max(deadline - time.time(), 0)))
+        delay = min(delay * 2, DEPLOYMENT_STATUS_MAX_POLL_INTERVAL)
+        response = session.get(deployment_status_url, headers=authorization,
+                               verify=not should_disable_connection_verify())
         try:
             res_dict = response.json()
         except json.decoder.JSONDecodeError:
             logger.warning("Deployment status endpoint %s returns malformed data. Retrying...", deployment_status_url)
             res_dict = {}
-        finally:
-            num_trials = num_trials + 1
 
         if res_dict.get('status', 0) == 3:
             _configure_default_logging(cmd, rg_name, name)
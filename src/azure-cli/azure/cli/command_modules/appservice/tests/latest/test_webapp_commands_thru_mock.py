@@ -26,7 +26,10 @@ from azure.cli.command_modules.appservice.custom import (set_deployment_user,
                                                          restore_deleted_webapp,
                                                          list_snapshots,
                                                          restore_snapshot,
-                                                         create_managed_ssl_cert)
+                                                         create_managed_ssl_cert,
+                                                         enable_zip_deploy)
+
+from azure.cli.command_modules.appservice._create_util import zip_contents_from_dir
 
 # pylint: disable=line-too-long
 from azure.cli.core.profiles import ResourceType
@@ -392,6 +395,90 @@ class TestWebappMocked(unittest.TestCase):
         client.certificates.create_or_update.assert_called_once_with(name=host_name, resource_group_name=rg_name,
                                                                      certificate_envelope=cert_def)
 
+    @mock.patch('azure.cli.command_modules.appservice.custom.time.sleep', autospec=True)
+    @mock.patch('azure.cli.command_modules.appservice.custom._get_scm_url', autospec=True)
+    @mock.patch('azure.cli.command_modules.appservice.custom._get_site_credential', autospec=True)
+    def test_enable_zip_deploy_streams_and_retries(self, site_credential_mock, scm_url_mock, sleep_mock):
+        import os
+        import tempfile
+        import requests
+        site_credential_mock.return_value = ('user', 'password')
+        scm_url_mock.return_value = 'https://myapp.scm.azurewebsites.net'
+        content = os.urandom(300 * 1024)
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        uploads = []
+
+        def _post(_, url, data=None, headers=None):
+            self.assertEqual(url, 'https://myapp.scm.azurewebsites.net/api/zipdeploy?isAsync=true')
+            self.assertEqual(len(data), len(content))
+            # The file is streamed in blocks instead of being read at once
+            uploads.append(data.read(8192))
+            if len(uploads) == 1:
+                raise requests.exceptions.ConnectionError('Connection reset')
+            while uploads[-1]:
+                uploads.append(data.read(8192))
+            return FakedResponse(202)
+
+        status_response = mock.MagicMock()
+        status_response.json.side_effect = [{'status': 1}, {'status': 1}, {'status': 4}]
+        with mock.patch('requests.Session.post', autospec=True, side_effect=_post) as post_mock, \
+                mock.patch('requests.Session.get', autospec=True, return_value=status_response) as get_mock:
+            result = enable_zip_deploy(_get_test_cmd(), 'rg', 'myapp', f.name)
+
+        self.assertEqual(result, {'status': 4})
+        # The upload is started over after the connection error
+        self.assertEqual(post_mock.call_count, 2)
+        self.assertEqual(b''.join(uploads[1:]), content)
+        self.assertEqual(get_mock.call_count, 3)
+        # The status is polled with a backoff
+        self.assertEqual([c[0][0] for c in sleep_mock.call_args_list], [2, 1, 2, 4])
+
+        # A conflict after a retry is the deployment started by the failed attempt, whose status is checked
+        status_response.json.side_effect = [{'status': 4}]
+        with mock.patch('requests.Session.post', autospec=True,
+                        side_effect=[requests.exceptions.ConnectionError('Connection reset'), FakedResponse(409)]), \
+                mock.patch('requests.Session.get', autospec=True, return_value=status_response):
+            self.assertEqual(enable_zip_deploy(_get_test_cmd(), 'rg', 'myapp', f.name), {'status': 4})
+
+        # Without a retry, a conflict is another deployment
+        with mock.patch('requests.Session.post', autospec=True, return_value=FakedResponse(409)) as post_mock, \
+                self.assertRaises(CLIError):
+            enable_zip_deploy(_get_test_cmd(), 'rg', 'myapp', f.name)
+        self.assertEqual(post_mock.call_count, 1)
+
+        # Server errors aren't retried, as the deployment may have started
+        status_response.json.side_effect = [{'status': 4}]
+        with mock.patch('requests.Session.post', autospec=True, return_value=FakedResponse(500)) as post_mock, \
+                mock.patch('requests.Session.get', autospec=True, return_value=status_response):
+            self.assertEqual(enable_zip_deploy(_get_test_cmd(), 'rg', 'myapp', f.name), {'status': 4})
+        self.assertEqual(post_mock.call_count, 1)
+
+    def test_zip_contents_from_dir(self):
+        import os
+        import shutil
+        import tempfile
+        import zipfile
+        src_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, src_dir)
+        files = {'app.js': b'console.log("hello");' * 1000, 'package.json': b'{}',
+                 os.path.join('lib', 'util.js'): os.urandom(100000), os.path.join('lib', 'empty.js'): b''}
+        files.update({os.path.join('lib', 'file{}.js'.format(i)): str(i).encode() for i in range(100)})
+        for name, content in dict(files, **{os.path.join('node_modules', 'dep.js'): b'dep'}).items():
+            os.makedirs(os.path.dirname(os.path.join(src_dir, name)), exist_ok=True)
+            with open(os.path.join(src_dir, name), 'wb') as f:
+                f.write(content)
+
+        zip_path = zip_contents_from_dir(src_dir, 'node')
+        self.addCleanup(os.remove, zip_path)
+        with zipfile.ZipFile(zip_path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertTrue(all(i.compress_type == zipfile.ZIP_DEFLATED for i in zf.infolist()))
+            # node_modules is skipped
+            self.assertEqual({i.filename: zf.read(i) for i in zf.infolist()},
+                             {name.replace(os.path.sep, '/'): content for name, content in files.items()})
+
 
 class FakedResponse(object):  # pylint: disable=too-few-public-methods
     def __init__(self, status_code):
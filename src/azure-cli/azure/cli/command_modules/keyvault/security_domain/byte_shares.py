@@ -20,7 +20,7 @@ class Share:
         return Share(x, v)
 
     def to_uint16(self):
-        return (self.x << 8) | self.v
+        return (self.x << 9) | self.v
 
 
 class ByteShares:
@@ -48,22 +48,49 @@ class ByteShares:
         return Share(x, v)
 
     @staticmethod
-    def get_secret(shares, required):
-        secret = 0
-        for i in range(required):
+    def get_lagrange_coefficients(xs):
+        """Get the coefficients of the share values that interpolate the polynomial at 0, from the x of the shares."""
+        coefficients = []
+        for i, xi in enumerate(xs):
             numerator = denominator = 1
-            si = Share.from_uint16(shares[i])
-            for j in range(required):
+            for j, xj in enumerate(xs):
                 if i == j:
                     continue
-                sj = Share.from_uint16(shares[j])
-                numerator = ModMath.multiply(numerator, sj.x)
-                diff = ModMath.subtract(sj.x, si.x)
+                numerator = ModMath.multiply(numerator, xj)
+                diff = ModMath.subtract(xj, xi)
                 denominator = ModMath.multiply(diff, denominator)
+            coefficients.append(ModMath.multiply(numerator, ModMath.INVERSES[denominator]))
+        return coefficients
 
-            invert = ModMath.invert(denominator)
-            ci = ModMath.multiply(numerator, invert)
+    @staticmethod
+    def get_secret(shares, required):
+        shares = [Share.from_uint16(shares[i]) for i in range(required)]
+        coefficients = ByteShares.get_lagrange_coefficients([s.x for s in shares])
+        secret = 0
+        for ci, si in zip(coefficients, shares):
             tmp = ModMath.multiply(ci, si.v)
             secret = ModMath.add(secret, tmp)
 
         return secret
+
+    @staticmethod
+    def get_secrets(share_arrays, required):
+        """Recombine the secret bytes at all the positions of the share arrays at once.
+        Each share array must use the same x at all positions, and the values must be in GF(257).
+        :return: The list of secret bytes, or None if the shares don't meet these conditions
+        """
+        columns = [share_arrays[i] for i in range(required)]
+        if not columns[0]:
+            return []
+        coefficients = ByteShares.get_lagrange_coefficients([column[0] >> 9 for column in columns])
+        products = []
+        for ci, column in zip(coefficients, columns):
+            # Map the share words of the expected x to the products of their value and the coefficient
+            x = column[0] >> 9
+            table = {(x << 9) | v: ModMath.multiply(ci, v) for v in range(257)}
+            column_products = list(map(table.get, column))
+            if None in column_products:
+                return None
+            products.append(column_products)
+        reduce_table = [t % 257 for t in range(256 * required + 1)]
+        return list(map(reduce_table.__getitem__, map(sum, zip(*products))))
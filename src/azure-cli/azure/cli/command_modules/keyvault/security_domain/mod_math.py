@@ -36,3 +36,7 @@ class ModMath:
     @staticmethod
     def get_random():
         return ModMath.reduce(secrets.randbits(16))
+
+
+# Inverses of all the elements of GF(257), with 0 mapped to 0 as `ModMath.invert` does
+ModMath.INVERSES = [ModMath.invert(x) for x in range(257)]
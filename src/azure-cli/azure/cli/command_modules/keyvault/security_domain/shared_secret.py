@@ -24,27 +24,17 @@ class SharedSecret:
 
         self.shares = shares
         self.required = required
-        self.byte_shares = ByteShares(required, 0)
 
     def make_byte_shares(self, b):
-        share_array = []
-        self.byte_shares.set_secret_byte(b)
-
-        for x in range(1, self.shares + 1):
-            s = self.byte_shares.make_share(x)
-            share_array.append(s.to_uint16())
-
-        return share_array
+        # Each byte is split with its own random polynomial, so that the shares of a byte reveal nothing of another
+        byte_shares = ByteShares(self.required, b)
+        return [byte_shares.make_share(x).to_uint16() for x in range(1, self.shares + 1)]
 
     def make_shares(self, plaintext):
-        share_arrays = []
-        for i, p in enumerate(plaintext):
-            share_array = self.make_byte_shares(p)
-            for sa in share_array:
-                if i == 0:
-                    share_arrays.append(array.array('H'))
-                current_share_array = sa
-                current_share_array.append(sa)
+        share_arrays = [array.array('H') for _ in range(self.shares)]
+        for b in plaintext:
+            for share_array, share in zip(share_arrays, self.make_byte_shares(b)):
+                share_array.append(share)
         return share_arrays
 
     @staticmethod
@@ -58,9 +48,13 @@ class SharedSecret:
         if len(share_arrays) < required:
             raise CLIError('Insufficient shares.')
 
-        plaintext = bytearray()
         plaintext_len = len(share_arrays[0])
+        if all(len(share_arrays[i]) == plaintext_len for i in range(required)):
+            secret = ByteShares.get_secrets(share_arrays, required)
+            if secret is not None:
+                return bytearray(secret)
 
+        plaintext = bytearray()
         for j in range(plaintext_len):
             sv = array.array('H')
             for i in range(required):
@@ -0,0 +1,104 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import array
+import os
+import random
+import unittest
+
+from azure.cli.command_modules.keyvault.security_domain.byte_shares import ByteShares
+from azure.cli.command_modules.keyvault.security_domain.mod_math import ModMath
+from azure.cli.command_modules.keyvault.security_domain.shared_secret import SharedSecret
+
+
+def _reference_get_secret(shares, required):
+    # Byte at a time recombination, as originally implemented
+    secret = 0
+    for i in range(required):
+        numerator = denominator = 1
+        xi, vi = shares[i] >> 9, shares[i] & 0x1ff
+        for j in range(required):
+            if i == j:
+                continue
+            xj = shares[j] >> 9
+            numerator = ModMath.multiply(numerator, xj)
+            denominator = ModMath.multiply(ModMath.subtract(xj, xi), denominator)
+        ci = ModMath.multiply(numerator, ModMath.invert(denominator))
+        secret = ModMath.add(secret, ModMath.multiply(ci, vi))
+    return secret
+
+
+def _reference_get_plaintext(share_arrays, required):
+    return [_reference_get_secret([share_arrays[i][j] for i in range(required)], required)
+            for j in range(len(share_arrays[0]))]
+
+
+class TestSecurityDomainSharedSecret(unittest.TestCase):
+
+    def _make_share_arrays(self, secret, shares, required):
+        # Shares in the format of the service, with x in the upper 7 bits
+        byte_shares = ByteShares(required, 0)
+        share_arrays = []
+        for x in range(1, shares + 1):
+            share_array = array.array('H')
+            for b in secret:
+                byte_shares.set_secret_byte(b)
+                share_array.append((x << 9) | byte_shares.make_share(x).v)
+            share_arrays.append(share_array)
+        return share_arrays
+
+    def test_mod_math_inverses(self):
+        self.assertEqual(ModMath.INVERSES, [ModMath.invert(x) for x in range(257)])
+        for x in range(1, 257):
+            self.assertEqual(ModMath.multiply(x, ModMath.INVERSES[x]), 1)
+
+    def test_get_plaintext_is_equivalent(self):
+        rnd = random.Random(0)
+        for shares, required in [(3, 2), (5, 3), (10, 10), (126, 7)]:
+            secret = os.urandom(64)
+            share_arrays = self._make_share_arrays(secret, shares, required)
+            for _ in range(3):
+                subset = rnd.sample(share_arrays, required)
+                plaintext = SharedSecret.get_plaintext(subset, required)
+                self.assertEqual(plaintext, bytearray(secret))
+                self.assertEqual(list(plaintext), _reference_get_plaintext(subset, required))
+
+        # Shares with values outside GF(257), with different x at some positions or with duplicate x
+        share_arrays = self._make_share_arrays(os.urandom(32), 4, 3)
+        for corrupt in [lambda a: a.__setitem__(5, (a[5] & 0xfe00) | 0x1ff),
+                        lambda a: a.__setitem__(7, a[7] ^ 0x200),
+                        lambda a: a.__setitem__(slice(None), array.array('H', [w ^ 0x600 for w in a]))]:
+            subset = [array.array('H', a) for a in share_arrays[:3]]
+            corrupt(subset[1])
+            expected = _reference_get_plaintext(subset, 3)
+            if all(0 <= b < 256 for b in expected):
+                self.assertEqual(list(SharedSecret.get_plaintext(subset, 3)), expected)
+            else:
+                with self.assertRaises(ValueError):
+                    SharedSecret.get_plaintext(subset, 3)
+
+    def test_make_shares_round_trip(self):
+        rnd = random.Random(0)
+        for shares, required in [(3, 2), (8, 3), (10, 10), (126, 7)]:
+            secret = os.urandom(48)
+            share_arrays = SharedSecret(shares=shares, required=required).make_shares(secret)
+            self.assertEqual(len(share_arrays), shares)
+            for x, share_array in enumerate(share_arrays, 1):
+                self.assertEqual(len(share_array), len(secret))
+                self.assertTrue(all(w >> 9 == x for w in share_array))
+            for _ in range(3):
+                subset = rnd.sample(share_arrays, required)
+                self.assertEqual(SharedSecret.get_plaintext(subset, required), bytearray(secret))
+                self.assertEqual(list(SharedSecret.get_plaintext(subset, required)),
+                                 _reference_get_plaintext(subset, required))
+
+        # Each byte has its own polynomial, so that equal bytes don't have equal shares
+        share_arrays = SharedSecret(shares=3, required=2).make_shares(bytes(48))
+        self.assertGreater(len(set(share_arrays[0])), 1)
+        self.assertEqual(SharedSecret.get_plaintext(share_arrays[1:], 2), bytearray(48))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,8 @@ import platform
 import re
 import ssl
 import sys
+import threading
+import time
 import uuid
 import base64
 
@@ -24,6 +26,7 @@ from msrestazure.tools import is_valid_resource_id, parse_resource_id
 
 from azure.mgmt.resource.resources.models import GenericResource, DeploymentMode
 
+from azure.cli.core._session import Session
 from azure.cli.core.azclierror import ArgumentUsageError, InvalidArgumentValueError, RequiredArgumentMissingError
 from azure.cli.core.parser import IncorrectUsageError
 from azure.cli.core.util import get_file_json, read_file_content, shell_safe_json_parse, sdk_no_wait
@@ -59,6 +62,36 @@ from ._bicep import (
 
 logger = get_logger(__name__)
 
+# The maximum number of resources which generic resource commands given multiple --ids operate on at the same time
+MAX_CONCURRENT_RESOURCE_OPERATIONS = 10
+
+# Resource types which usually reference resources of the listed types. When deleted together, resources of the key
+# type are deleted first, as the referenced resources can't be deleted while they are still in use.
+_DELETE_BEFORE = {
+    'microsoft.compute/virtualmachines': ['microsoft.network/networkinterfaces', 'microsoft.compute/disks',
+                                          'microsoft.compute/availabilitysets',
+                                          'microsoft.compute/proximityplacementgroups'],
+    'microsoft.compute/virtualmachinescalesets': ['microsoft.network/loadbalancers',
+                                                  'microsoft.network/applicationgateways',
+                                                  'microsoft.network/virtualnetworks',
+                                                  'microsoft.network/networksecuritygroups',
+                                                  'microsoft.compute/proximityplacementgroups'],
+    'microsoft.network/networkinterfaces': ['microsoft.network/virtualnetworks', 'microsoft.network/publicipaddresses',
+                                            'microsoft.network/networksecuritygroups',
+                                            'microsoft.network/applicationsecuritygroups',
+                                            'microsoft.network/loadbalancers', 'microsoft.network/applicationgateways'],
+    'microsoft.network/loadbalancers': ['microsoft.network/virtualnetworks', 'microsoft.network/publicipaddresses'],
+    'microsoft.network/applicationgateways': ['microsoft.network/virtualnetworks',
+                                              'microsoft.network/publicipaddresses'],
+    'microsoft.network/virtualnetworkgateways': ['microsoft.network/virtualnetworks',
+                                                 'microsoft.network/publicipaddresses'],
+    'microsoft.network/bastionhosts': ['microsoft.network/virtualnetworks', 'microsoft.network/publicipaddresses'],
+    'microsoft.network/privateendpoints': ['microsoft.network/virtualnetworks'],
+    'microsoft.network/virtualnetworks': ['microsoft.network/networksecuritygroups', 'microsoft.network/routetables',
+                                          'microsoft.network/natgateways'],
+    'microsoft.network/natgateways': ['microsoft.network/publicipaddresses'],
+}
+
 RPAAS_APIS = {'microsoft.datadog': '/subscriptions/{subscriptionId}/providers/Microsoft.Datadog/agreements/default?api-version=2020-02-01-preview',
               'microsoft.confluent': '/subscriptions/{subscriptionId}/providers/Microsoft.Confluent/agreements/default?api-version=2020-03-01-preview'}
 
@@ -1102,7 +1135,8 @@ def _list_resources_odata_filter_builder(resource_group_name=None, resource_prov
 
 def _get_auth_provider_latest_api_version(cli_ctx):
     rcf = _resource_client_factory(cli_ctx)
-    api_version = _ResourceUtils.resolve_api_version(rcf, 'Microsoft.Authorization', None, 'providerOperations')
+    api_version = _ResourceUtils.resolve_api_version(rcf, 'Microsoft.Authorization', None, 'providerOperations',
+                                                     cli_ctx=cli_ctx)
     return api_version
 
 
@@ -1715,6 +1749,34 @@ def _single_or_collection(obj, default=None):
     return obj
 
 
+def _run_for_parsed_ids(parsed_ids, func, action):
+    """
+    Call func for each of the parsed ids, with up to MAX_CONCURRENT_RESOURCE_OPERATIONS calls in flight.
+    Return the results in the order of the ids. If any call fails, raise an error which lists each failed id.
+    """
+    parsed_ids = list(parsed_ids)
+    if len(parsed_ids) == 1:
+        return [func(parsed_ids[0])]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RESOURCE_OPERATIONS) as executor:
+        futures = [executor.submit(func, id_dict) for id_dict in parsed_ids]
+
+    results = []
+    error_msg_builder = []
+    for id_dict, future in zip(parsed_ids, futures):
+        try:
+            results.append(future.result())
+        except Exception as ex:  # pylint: disable=broad-except
+            resource_id = id_dict.get('resource_id') or _build_resource_id(**id_dict)
+            error_msg_builder.append('{}: {}'.format(resource_id, ex))
+    if error_msg_builder:
+        error_msg_builder.insert(0, '{} of {} resources failed to be {}:'.format(
+            len(error_msg_builder), len(parsed_ids), action))
+        raise CLIError(os.linesep.join(error_msg_builder))
+    return results
+
+
 def show_resource(cmd, resource_ids=None, resource_group_name=None,
                   resource_provider_namespace=None, parent_resource_path=None, resource_type=None,
                   resource_name=None, api_version=None, include_response_body=False, latest_include_preview=False):
@@ -1725,9 +1787,11 @@ def show_resource(cmd, resource_ids=None, resource_group_name=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview).get_resource(
-            include_response_body) for id_dict in parsed_ids])
+    def _show(id_dict):
+        rsrc_utils = _get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview)
+        return rsrc_utils.get_resource(include_response_body)
+
+    return _single_or_collection(_run_for_parsed_ids(parsed_ids, _show, 'shown'))
 
 
 # pylint: disable=unused-argument
@@ -1737,7 +1801,9 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
     """
     Deletes the given resource(s).
     This function allows deletion of ids with dependencies on one another.
-    This is done with multiple passes through the given ids.
+    Child resources and resources which reference others (e.g. a VM referencing its NICs and disks) are deleted
+    first, independent resources are deleted concurrently, and a failed deletion is retried after another resource
+    has been deleted.
     """
     parsed_ids = _get_parsed_resource_ids(resource_ids) or [_create_parsed_id(cmd.cli_ctx,
                                                                               resource_group_name,
@@ -1748,34 +1814,11 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
     to_be_deleted = [(_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview), id_dict)
                      for id_dict in parsed_ids]
 
-    results = []
-    from azure.core.exceptions import HttpResponseError
-    while to_be_deleted:
-        logger.debug("Start new loop to delete resources.")
-        operations = []
-        failed_to_delete = []
-        for rsrc_utils, id_dict in to_be_deleted:
-            try:
-                operations.append(rsrc_utils.delete())
-                resource = _build_resource_id(**id_dict) or resource_name
-                logger.debug("deleting %s", resource)
-            except HttpResponseError as e:
-                # request to delete failed, add parsed id dict back to queue
-                id_dict['exception'] = str(e)
-                failed_to_delete.append((rsrc_utils, id_dict))
-        to_be_deleted = failed_to_delete
-
-        # stop deleting if none deletable
-        if not operations:
-            break
-
-        # all operations return result before next pass
-        for operation in operations:
-            results.append(operation.result())
+    results, failed_to_delete = _delete_in_dependency_order(to_be_deleted)
 
-    if to_be_deleted:
+    if failed_to_delete:
         error_msg_builder = ['Some resources failed to be deleted (run with `--verbose` for more information):']
-        for _, id_dict in to_be_deleted:
+        for _, id_dict in failed_to_delete:
             logger.info(id_dict['exception'])
             resource_id = _build_resource_id(**id_dict) or id_dict['resource_id']
             error_msg_builder.append(resource_id)
@@ -1784,6 +1827,91 @@ def delete_resource(cmd, resource_ids=None, resource_group_name=None,
     return _single_or_collection(results)
 
 
+def _get_resource_type_for_delete(resource_id):
+    parts = parse_resource_id(resource_id)
+    resource_type = '{}/{}'.format(parts.get('namespace'), parts.get('type'))
+    for level in range(1, (parts.get('last_child_num') or 0) + 1):
+        resource_type += '/' + parts['child_type_{}'.format(level)]
+    return resource_type.lower()
+
+
+def _get_delete_blockers(resource_ids):
+    """
+    Infer from the ids which resources must be deleted before each resource: its child resources and the resources
+    of types which usually reference it. Return a set of indexes into resource_ids for each id.
+    """
+    resource_ids = [(resource_id or '').lower() for resource_id in resource_ids]
+    resource_types = [_get_resource_type_for_delete(resource_id) if is_valid_resource_id(resource_id) else None
+                      for resource_id in resource_ids]
+    blockers = []
+    for index, resource_id in enumerate(resource_ids):
+        blockers.append({other_index for other_index, other_id in enumerate(resource_ids)
+                         if other_index != index and resource_id and
+                         (other_id.startswith(resource_id + '/') or
+                          resource_types[index] in _DELETE_BEFORE.get(resource_types[other_index], ()))})
+    return blockers
+
+
+def _delete_in_dependency_order(to_be_deleted):
+    """
+    Delete the resources with up to MAX_CONCURRENT_RESOURCE_OPERATIONS deletions in flight. A resource is deleted
+    once the resources blocking it have been deleted. A failed deletion is retried once any other resource has been
+    deleted since it failed, and given up when nothing else can be deleted.
+    Return the results in the order of to_be_deleted and the (rsrc_utils, id_dict) pairs which failed to be deleted.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    from azure.core.exceptions import HttpResponseError
+
+    def _delete(index):
+        rsrc_utils, id_dict = to_be_deleted[index]
+        logger.debug("deleting %s", resource_ids[index])
+        try:
+            return True, rsrc_utils.delete().result()
+        except HttpResponseError as e:
+            id_dict['exception'] = str(e)
+            return False, None
+
+    resource_ids = [id_dict.get('resource_id') or _build_resource_id(**id_dict) for _, id_dict in to_be_deleted]
+    blockers = _get_delete_blockers(resource_ids)
+    results = {}
+    waiting = set(range(len(to_be_deleted)))
+    retrying = set()
+    failed = set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RESOURCE_OPERATIONS) as executor:
+        while waiting or running or retrying:
+            not_deleted = waiting | retrying | set(running.values())
+            ready = [index for index in sorted(waiting) if not blockers[index] & not_deleted]
+            if not ready and not running:
+                if retrying:
+                    # Nothing has been deleted since these failed, so retrying them can't succeed
+                    failed |= retrying
+                    retrying.clear()
+                    continue
+                # The inferred dependencies are circular, ignore them
+                ready = sorted(waiting)
+            for index in ready:
+                waiting.discard(index)
+                running[executor.submit(_delete, index)] = index
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            deleted_any = False
+            for future in done:
+                index = running.pop(future)
+                succeeded, result = future.result()
+                if succeeded:
+                    results[index] = result
+                    deleted_any = True
+                else:
+                    retrying.add(index)
+            if deleted_any and retrying:
+                logger.debug("Retry deleting %d resources.", len(retrying))
+                waiting |= retrying
+                retrying.clear()
+
+    return [results[index] for index in sorted(results)], [to_be_deleted[index] for index in sorted(failed)]
+
+
 def update_resource(cmd, parameters, resource_ids=None,
                     resource_group_name=None, resource_provider_namespace=None,
                     parent_resource_path=None, resource_type=None, resource_name=None, api_version=None,
@@ -1795,9 +1923,11 @@ def update_resource(cmd, parameters, resource_ids=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview).update(parameters)
-         for id_dict in parsed_ids])
+    def _update(id_dict):
+        rsrc_utils = _get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview)
+        return rsrc_utils.update(parameters)
+
+    return _single_or_collection(_run_for_parsed_ids(parsed_ids, _update, 'updated'))
 
 
 def tag_resource(cmd, tags, resource_ids=None, resource_group_name=None, resource_provider_namespace=None,
@@ -1812,9 +1942,11 @@ def tag_resource(cmd, tags, resource_ids=None, resource_group_name=None, resourc
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection([LongRunningOperation(cmd.cli_ctx)(
-        _get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview).tag(
-            tags, is_incremental)) for id_dict in parsed_ids])
+    def _tag(id_dict):
+        rsrc_utils = _get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview)
+        return LongRunningOperation(cmd.cli_ctx)(rsrc_utils.tag(tags, is_incremental))
+
+    return _single_or_collection(_run_for_parsed_ids(parsed_ids, _tag, 'tagged'))
 
 
 def invoke_resource_action(cmd, action, request_body=None, resource_ids=None,
@@ -1829,9 +1961,11 @@ def invoke_resource_action(cmd, action, request_body=None, resource_ids=None,
                                                                               resource_type,
                                                                               resource_name)]
 
-    return _single_or_collection(
-        [_get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview).invoke_action(
-            action, request_body) for id_dict in parsed_ids])
+    def _invoke_action(id_dict):
+        rsrc_utils = _get_rsrc_util_from_parsed_id(cmd.cli_ctx, id_dict, api_version, latest_include_preview)
+        return rsrc_utils.invoke_action(action, request_body)
+
+    return _single_or_collection(_run_for_parsed_ids(parsed_ids, _invoke_action, 'invoked'))
 
 
 def get_deployment_operations(client, resource_group_name, deployment_name, operation_ids):
@@ -3238,7 +3372,8 @@ class _ResourceUtils:  # pylint: disable=too-many-instance-attributes
         if api_version is None:
             if resource_id:
                 api_version = _ResourceUtils._resolve_api_version_by_id(self.rcf, resource_id,
-                                                                        latest_include_preview=latest_include_preview)
+                                                                        latest_include_preview=latest_include_preview,
+                                                                        cli_ctx=cli_ctx)
             else:
                 _validate_resource_inputs(resource_group_name, resource_provider_namespace,
                                           resource_type, resource_name)
@@ -3246,7 +3381,8 @@ class _ResourceUtils:  # pylint: disable=too-many-instance-attributes
                                                                  resource_provider_namespace,
                                                                  parent_resource_path,
                                                                  resource_type,
-                                                                 latest_include_preview=latest_include_preview)
+                                                                 latest_include_preview=latest_include_preview,
+                                                                 cli_ctx=cli_ctx)
 
         self.resource_group_name = resource_group_name
         self.resource_provider_namespace = resource_provider_namespace
@@ -3463,31 +3599,28 @@ class _ResourceUtils:  # pylint: disable=too-many-instance-attributes
 
     @staticmethod
     def resolve_api_version(rcf, resource_provider_namespace, parent_resource_path, resource_type,
-                            latest_include_preview=False):
-        provider = rcf.providers.get(resource_provider_namespace)
-
+                            latest_include_preview=False, cli_ctx=None):
         # If available, we will use parent resource's api-version
         resource_type_str = (parent_resource_path.split('/')[0] if parent_resource_path else resource_type)
 
-        rt = [t for t in provider.resource_types
-              if t.resource_type.lower() == resource_type_str.lower()]
-        if not rt:
+        api_versions = _get_provider_api_versions(rcf, resource_provider_namespace, resource_type_str, cli_ctx)
+        if api_versions is None:
             raise IncorrectUsageError('Resource type {} not found.'.format(resource_type_str))
-        if len(rt) == 1 and rt[0].api_versions:
+        if api_versions:
             # If latest_include_preview is true,
             # the last api-version will be taken regardless of whether it is preview version or not
             if latest_include_preview:
-                return rt[0].api_versions[0]
+                return api_versions[0]
             # Take the latest stable version first.
             # if there is no stable version, the latest preview version will be taken.
-            npv = [v for v in rt[0].api_versions if 'preview' not in v.lower()]
-            return npv[0] if npv else rt[0].api_versions[0]
+            npv = [v for v in api_versions if 'preview' not in v.lower()]
+            return npv[0] if npv else api_versions[0]
         raise IncorrectUsageError(
             'API version is required and could not be resolved for resource {}'
             .format(resource_type))
 
     @staticmethod
-    def _resolve_api_version_by_id(rcf, resource_id, latest_include_preview=False):
+    def _resolve_api_version_by_id(rcf, resource_id, latest_include_preview=False, cli_ctx=None):
         parts = parse_resource_id(resource_id)
 
         if len(parts) == 2 and parts['subscription'] is not None and parts['resource_group'] is not None:
@@ -3514,7 +3647,79 @@ class _ResourceUtils:  # pylint: disable=too-many-instance-attributes
             resource_type = parts['type']
 
         return _ResourceUtils.resolve_api_version(rcf, namespace, parent, resource_type,
-                                                  latest_include_preview=latest_include_preview)
+                                                  latest_include_preview=latest_include_preview, cli_ctx=cli_ctx)
+
+
+# {resource type: api-versions} of the resource providers, shared by all the lookups of the current process and
+# persisted in PROVIDER_API_VERSIONS_FILE_NAME for PROVIDER_API_VERSIONS_VALID_SECONDS
+_provider_api_versions = {}
+_provider_api_versions_lock = threading.Lock()
+_provider_locks = {}
+# The cache file is shared by the lookups of all providers, so every access to it is guarded by one lock
+_PROVIDER_API_VERSIONS = Session()
+_provider_api_versions_file_lock = threading.RLock()
+PROVIDER_API_VERSIONS_FILE_NAME = 'providerApiVersions.json'
+PROVIDER_API_VERSIONS_VALID_SECONDS = 3600 * 24
+
+
+def _get_provider_api_versions(rcf, resource_provider_namespace, resource_type, cli_ctx=None):
+    """Get the api-versions of a resource type, latest first, or None if the provider doesn't have the type.
+
+    The resource types of the provider are cached per cloud and subscription, in memory and, given cli_ctx, on disk.
+    The provider is looked up again if the cache doesn't have the resource type."""
+    subscription_id = getattr(getattr(rcf, '_config', None), 'subscription_id', None)
+    if not isinstance(subscription_id, str):
+        # Clients which aren't bound to a subscription are not cached
+        return _lookup_provider_api_versions(rcf, resource_provider_namespace).get(resource_type.lower())
+
+    cloud_name = cli_ctx.cloud.name if cli_ctx else ''
+    key = '{}/{}/{}'.format(cloud_name, subscription_id, resource_provider_namespace).lower()
+    with _provider_api_versions_lock:
+        provider_lock = _provider_locks.setdefault(key, threading.Lock())
+    # Only one thread looks up a provider, others wait for its result
+    with provider_lock:
+        resource_types = _provider_api_versions.get(key)
+        if resource_types is None and cli_ctx:
+            resource_types = _load_provider_api_versions(cli_ctx, key)
+        if resource_types is None or resource_type.lower() not in resource_types:
+            resource_types = _lookup_provider_api_versions(rcf, resource_provider_namespace)
+            if cli_ctx:
+                _save_provider_api_versions(cli_ctx, key, resource_types)
+        _provider_api_versions[key] = resource_types
+    return resource_types.get(resource_type.lower())
+
+
+def _lookup_provider_api_versions(rcf, resource_provider_namespace):
+    provider = rcf.providers.get(resource_provider_namespace)
+    resource_types = {}
+    for t in provider.resource_types:
+        # Resource types which are listed more than once are ambiguous, so their api-version can't be resolved
+        resource_types[t.resource_type.lower()] = [] if t.resource_type.lower() in resource_types \
+            else list(t.api_versions or [])
+    return resource_types
+
+
+def _load_provider_api_versions(cli_ctx, key):
+    filename = os.path.join(cli_ctx.config.config_dir, PROVIDER_API_VERSIONS_FILE_NAME)
+    with _provider_api_versions_file_lock:
+        if _PROVIDER_API_VERSIONS.filename != filename:
+            _PROVIDER_API_VERSIONS.load(filename)
+        entry = _PROVIDER_API_VERSIONS.get(key)
+    if entry and time.time() - entry['timestamp'] < PROVIDER_API_VERSIONS_VALID_SECONDS:
+        return entry['resourceTypes']
+    return None
+
+
+def _save_provider_api_versions(cli_ctx, key, resource_types):
+    with _provider_api_versions_file_lock:
+        _load_provider_api_versions(cli_ctx, key)
+        now = time.time()
+        with _PROVIDER_API_VERSIONS.batch():
+            # Drop expired entries so that the file doesn't grow forever
+            for k in [k for k, v in _PROVIDER_API_VERSIONS.data.items()
+                      if now - v['timestamp'] >= PROVIDER_API_VERSIONS_VALID_SECONDS]:
+                del _PROVIDER_API_VERSIONS[k]
+            _PROVIDER_API_VERSIONS[key] = {'resourceTypes': resource_types, 'timestamp': now}
 
 
 def install_bicep_cli(cmd, version=None):
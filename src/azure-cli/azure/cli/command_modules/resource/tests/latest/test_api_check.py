@@ -5,6 +5,7 @@
 
 import unittest
 
+import mock
 try:
     from unittest.mock import MagicMock
 except ImportError:
@@ -91,6 +92,138 @@ class TestApiCheck(unittest.TestCase):
                                    resource_group_name='rg', rcf=rcf, latest_include_preview=True)
         self.assertEqual(res_utils.api_version, "2016-01-01-preview")
 
+    def test_resolve_api_version_cache(self):
+        import shutil
+        import tempfile
+        from azure.cli.command_modules.resource import custom
+        cli = MagicMock()
+        cli.cloud.name = 'AzureCloud'
+        cli.config.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cli.config.config_dir)
+
+        def _reset_process_cache():
+            custom._provider_api_versions.clear()
+            custom._PROVIDER_API_VERSIONS.filename = None
+
+        _reset_process_cache()
+        self.addCleanup(_reset_process_cache)
+        rcf = self._get_mock_client()
+        rcf._config.subscription_id = '00000000-0000-0000-0000-000000000000'
+
+        # Ids which share a provider namespace reuse one lookup
+        for resource_id in ['/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+                            'Mock/test/vnet1',
+                            '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+                            'Mock/test/vnet2',
+                            '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+                            'Mock/foo/foo1']:
+            res_utils = _ResourceUtils(cli, resource_id=resource_id, rcf=rcf)
+        self.assertEqual(res_utils.api_version, '1999-01-01')
+        rcf.providers.get.assert_called_once_with('Mock')
+
+        # Another process reads the api-versions from the cache file
+        _reset_process_cache()
+        res_utils = _ResourceUtils(cli, resource_type='Mock/test', resource_name='vnet1',
+                                   resource_group_name='rg', rcf=rcf)
+        self.assertEqual(res_utils.api_version, '2016-01-01')
+        rcf.providers.get.assert_called_once()
+
+        # A resource type which isn't in the cache is looked up again
+        with self.assertRaises(CLIError):
+            _ResourceUtils(cli, resource_type='Mock/unknown', resource_name='vnet1', resource_group_name='rg',
+                           rcf=rcf)
+        self.assertEqual(rcf.providers.get.call_count, 2)
+
+        # Expired entries are looked up again
+        _reset_process_cache()
+        with mock.patch('time.time', return_value=custom.PROVIDER_API_VERSIONS_VALID_SECONDS * 2 + 1e10):
+            _ResourceUtils(cli, resource_type='Mock/test', resource_name='vnet1', resource_group_name='rg', rcf=rcf)
+        self.assertEqual(rcf.providers.get.call_count, 3)
+
+    def test_resolve_api_version_cache_from_threads(self):
+        import os
+        import shutil
+        import tempfile
+        import threading
+        import time
+        from azure.cli.command_modules.resource import custom
+        cli = MagicMock()
+        cli.cloud.name = 'AzureCloud'
+        cli.config.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cli.config.config_dir)
+
+        def _reset_process_cache():
+            custom._provider_api_versions.clear()
+            custom._PROVIDER_API_VERSIONS.filename = None
+
+        _reset_process_cache()
+        self.addCleanup(_reset_process_cache)
+
+        # Lookups of different providers load and save the shared cache file at the same time
+        custom._PROVIDER_API_VERSIONS.data = {}
+        for i in range(2000):
+            custom._PROVIDER_API_VERSIONS.data['azurecloud/sub/mock{}'.format(i)] = {
+                'resourceTypes': {'test': ['2016-01-01']}, 'timestamp': time.time()}
+        errors = []
+
+        def _save(thread_index):
+            try:
+                for i in range(50):
+                    custom._save_provider_api_versions(cli, 'azurecloud/sub/thread{}-{}'.format(thread_index, i),
+                                                       {'test': ['2016-01-01']})
+                    custom._load_provider_api_versions(cli, 'azurecloud/sub/mock0')
+            except Exception as ex:  # pylint: disable=broad-except
+                errors.append(ex)
+
+        with mock.patch.object(custom._PROVIDER_API_VERSIONS, 'save'):
+            custom._PROVIDER_API_VERSIONS.filename = os.path.join(cli.config.config_dir,
+                                                                  custom.PROVIDER_API_VERSIONS_FILE_NAME)
+            threads = [threading.Thread(target=_save, args=(i,)) for i in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(custom._PROVIDER_API_VERSIONS.data), 2500)
+
+    def test_show_resource_ids_in_multiple_namespaces(self):
+        import os
+        import shutil
+        import tempfile
+        from azure.cli.command_modules.resource import custom
+        cli = MagicMock()
+        cli.cloud.name = 'AzureCloud'
+        cli.config.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cli.config.config_dir)
+        cmd = MagicMock()
+        cmd.cli_ctx = cli
+
+        def _reset_process_cache():
+            custom._provider_api_versions.clear()
+            custom._PROVIDER_API_VERSIONS.filename = None
+
+        _reset_process_cache()
+        self.addCleanup(_reset_process_cache)
+        rcf = self._get_mock_client()
+        rcf._config.subscription_id = '00000000-0000-0000-0000-000000000000'
+        rcf.resources.get_by_id.side_effect = lambda resource_id, api_version, **_: (resource_id, api_version)
+
+        # The ids are shown from several threads, which look up and cache different providers at the same time
+        resource_ids = ['/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+                        'Mock{}/test/vnet{}'.format(i % 8, i) for i in range(40)]
+        with mock.patch('azure.cli.command_modules.resource.custom._resource_client_factory', return_value=rcf):
+            result = custom.show_resource(cmd, resource_ids=resource_ids)
+        self.assertEqual(result, [(resource_id, '2016-01-01') for resource_id in resource_ids])
+        self.assertEqual(sorted(c[0][0] for c in rcf.providers.get.call_args_list),
+                         ['Mock{}'.format(i) for i in range(8)])
+
+        # Each of the providers is in the cache file
+        _reset_process_cache()
+        custom._PROVIDER_API_VERSIONS.load(
+            os.path.join(cli.config.config_dir, custom.PROVIDER_API_VERSIONS_FILE_NAME))
+        self.assertEqual(sorted(custom._PROVIDER_API_VERSIONS.data),
+                         ['azurecloud/00000000-0000-0000-0000-000000000000/mock{}'.format(i) for i in range(8)])
+
     def _get_mock_client(self):
         client = MagicMock()
         provider = MagicMock()
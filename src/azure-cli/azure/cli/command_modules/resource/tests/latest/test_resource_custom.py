@@ -29,6 +29,8 @@ from azure.cli.command_modules.resource.custom import (
     deploy_arm_template_at_subscription_scope,
     deploy_arm_template_at_management_group,
     deploy_arm_template_at_tenant_scope,
+    tag_resource,
+    delete_resource,
 )
 
 from azure.cli.core.mock import DummyCli
@@ -537,6 +539,103 @@ class TestCustom(unittest.TestCase):
         self.assertEqual(1, len(result.changes))
         self.assertEqual(ChangeType.modify, result.changes[0].change_type)
 
+    @mock.patch("azure.cli.command_modules.resource.custom.LongRunningOperation.__call__", autospec=True)
+    @mock.patch("azure.cli.command_modules.resource.custom._get_rsrc_util_from_parsed_id", autospec=True)
+    def test_tag_resource_with_multiple_ids(self, get_rsrc_util_stub, long_running_operation_stub):
+        import threading
+        import time
+        resource_ids = ['/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+                        'Microsoft.Storage/storageAccounts/account{}'.format(i) for i in range(20)]
+        lock = threading.Lock()
+        in_flight = [0, 0]  # [current, max]
+
+        def _get_rsrc_util(_, id_dict, *__):
+            rsrc_utils = mock.MagicMock()
+
+            def _tag(*_):
+                with lock:
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight)
+                # later ids finish first
+                time.sleep(0.001 * (20 - resource_ids.index(id_dict['resource_id'])))
+                with lock:
+                    in_flight[0] -= 1
+                if id_dict['resource_id'].endswith(('account3', 'account7')):
+                    raise CLIError('Tag failed')
+                return id_dict['resource_id']
+
+            rsrc_utils.tag.side_effect = _tag
+            return rsrc_utils
+
+        get_rsrc_util_stub.side_effect = _get_rsrc_util
+        long_running_operation_stub.side_effect = lambda _, result: result
+
+        # Results are returned in the order of the ids
+        self.assertEqual(tag_resource(cmd, {'a': 'b'}, resource_ids=resource_ids[8:]), resource_ids[8:])
+        self.assertLessEqual(in_flight[1], 10)
+        self.assertGreater(in_flight[1], 1)
+
+        # All failed ids are reported
+        with self.assertRaises(CLIError) as cm:
+            tag_resource(cmd, {'a': 'b'}, resource_ids=resource_ids)
+        message = str(cm.exception)
+        self.assertIn('2 of 20 resources failed to be tagged', message)
+        self.assertIn(resource_ids[3] + ': Tag failed', message)
+        self.assertIn(resource_ids[7] + ': Tag failed', message)
+
+    @mock.patch("azure.cli.command_modules.resource.custom._get_rsrc_util_from_parsed_id", autospec=True)
+    def test_delete_resource_in_dependency_order(self, get_rsrc_util_stub):
+        from azure.core.exceptions import HttpResponseError
+        prefix = '/subscriptions/00000000-0000-0000-0000-000000000000/resourceGroups/rg/providers/'
+        vm = prefix + 'Microsoft.Compute/virtualMachines/vm'
+        nic = prefix + 'Microsoft.Network/networkInterfaces/nic'
+        disk = prefix + 'Microsoft.Compute/disks/disk'
+        vnet = prefix + 'Microsoft.Network/virtualNetworks/vnet'
+        subnet = vnet + '/subnets/subnet'
+        account = prefix + 'Microsoft.Storage/storageAccounts/account'
+        deleted = []
+        attempts = {}
+
+        def _get_rsrc_util(_, id_dict, *__):
+            resource_id = id_dict['resource_id']
+            rsrc_utils = mock.MagicMock()
+
+            def _result():
+                attempts[resource_id] = attempts.get(resource_id, 0) + 1
+                # The account can only be deleted after something else has been deleted
+                if resource_id == account and not deleted:
+                    raise HttpResponseError('In use')
+                if resource_id == disk and fail_disk:
+                    raise HttpResponseError('Disk failed')
+                deleted.append(resource_id)
+                return resource_id
+
+            rsrc_utils.delete.return_value.result.side_effect = _result
+            return rsrc_utils
+
+        get_rsrc_util_stub.side_effect = _get_rsrc_util
+
+        fail_disk = False
+        resource_ids = [vnet, account, disk, subnet, nic, vm]
+        self.assertEqual(delete_resource(cmd, resource_ids=resource_ids), resource_ids)
+        self.assertLess(deleted.index(vm), deleted.index(nic))
+        self.assertLess(deleted.index(vm), deleted.index(disk))
+        self.assertLess(deleted.index(nic), deleted.index(vnet))
+        self.assertLess(deleted.index(subnet), deleted.index(vnet))
+        self.assertEqual(attempts[account], 2)
+        self.assertEqual(attempts[vm], 1)
+
+        # A resource failing after everything else is deleted is reported
+        fail_disk = True
+        deleted.clear()
+        attempts.clear()
+        with self.assertRaises(CLIError) as cm:
+            delete_resource(cmd, resource_ids=[vm, disk])
+        self.assertEqual(str(cm.exception).splitlines(),
+                         ['Some resources failed to be deleted (run with `--verbose` for more information):', disk])
+        self.assertEqual(deleted, [vm])
+        self.assertEqual(attempts[disk], 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -800,6 +800,9 @@ examples:
   - name: Delete all blobs with the format 'cli-201x-xx-xx.txt' except cli-2018-xx-xx.txt' and 'cli-2019-xx-xx.txt' in a container.
     text: |
         az storage blob delete-batch -s mycontainer --pattern cli-201[!89]-??-??.txt
+  - name: Delete all blobs in a container with the Blob Batch API, sending 4 batch requests in parallel.
+    text: |
+        az storage blob delete-batch -s mycontainer --account-name mystorageaccount --use-batch-api --max-workers 4
 """
 
 helps['storage blob download-batch'] = """
@@ -833,6 +836,9 @@ examples:
   - name: Download all blobs with the format 'cli-201x-xx-xx.txt' except cli-2018-xx-xx.txt' and 'cli-2019-xx-xx.txt' in container to current path.
     text: |
         az storage blob download-batch -d . -s mycontainer --pattern cli-201[!89]-??-??.txt
+  - name: Resume an interrupted download of a container, downloading 16 blobs at a time.
+    text: |
+        az storage blob download-batch -d . -s mycontainer --max-workers 16 --skip-unchanged
 """
 
 helps['storage blob exists'] = """
@@ -1031,6 +1037,32 @@ examples:
     crafted: true
 """
 
+helps['storage blob set-tier-batch'] = """
+type: command
+short-summary: Set the tier on block blobs in a blob container with the Blob Batch API.
+long-summary: Up to 256 blobs are updated in each batch request. This command only supports block blobs on standard storage accounts.
+parameters:
+  - name: --source -s
+    type: string
+    short-summary: The blob container where the tier of blobs will be set.
+    long-summary: The source can be the container URL or the container name. When the source is the container URL, the storage account name will be parsed from the URL.
+  - name: --pattern
+    type: string
+    short-summary: The pattern used for globbing blobs in the source. The supported patterns are '*', '?', '[seq]', and '[!seq]'. For more information, please refer to https://docs.python.org/3.7/library/fnmatch.html.
+  - name: --dryrun
+    type: bool
+    short-summary: Show the summary of the operations to be taken instead of actually setting the tier.
+  - name: --timeout
+    short-summary: The timeout parameter is expressed in seconds.
+examples:
+  - name: Move all blobs in a directory named "logs" to the Archive tier.
+    text: |
+        az storage blob set-tier-batch -s mycontainer --account-name mystorageaccount --pattern logs/* --tier Archive
+  - name: Rehydrate all archived blobs in a container with high priority, sending 4 batch requests in parallel.
+    text: |
+        az storage blob set-tier-batch -s mycontainer --account-name mystorageaccount --tier Hot -r High --max-workers 4
+"""
+
 helps['storage blob show'] = """
 type: command
 short-summary: Get the details of a blob.
@@ -1121,6 +1153,9 @@ examples:
   - name: Upload all files with the format 'cli-201x-xx-xx.txt' except cli-2018-xx-xx.txt' and 'cli-2019-xx-xx.txt' in a container.
     text: |
         az storage blob upload-batch -d mycontainer -s <path-to-directory> --pattern cli-201[!89]-??-??.txt
+  - name: Upload all files from local path directory to a container, 16 files at a time.
+    text: |
+        az storage blob upload-batch -d mycontainer -s <path-to-directory> --max-workers 16
 """
 
 helps['storage blob url'] = """
@@ -1795,6 +1830,9 @@ examples:
   - name: Upload files from a local directory to an Azure Storage File Share with url in a batch operation.
     text: |
         az storage file upload-batch --destination https://myaccount.file.core.windows.net/myshare --source . --account-key 00000000
+  - name: Upload files from a local directory to an Azure Storage File Share, 16 files at a time.
+    text: |
+        az storage file upload-batch --destination myshare --source . --account-name myaccount --max-workers 16
 """
 
 helps['storage file url'] = """
@@ -21,7 +21,8 @@ from ._validators import (get_datetime_type, validate_metadata, get_permission_v
                           validate_delete_retention_days, validate_container_delete_retention_days,
                           validate_file_delete_retention_days, validator_change_feed_retention_days,
                           validate_fs_public_access, validate_logging_version, validate_or_policy, validate_policy,
-                          get_api_version_type, blob_download_file_path_validator, blob_tier_validator, validate_subnet)
+                          get_api_version_type, blob_download_file_path_validator, blob_tier_validator, validate_subnet,
+                          validate_max_workers)
 
 
 def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statements, too-many-lines, too-many-branches
@@ -74,6 +75,9 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
                                     action='store_true', validator=add_progress_callback)
     socket_timeout_type = CLIArgumentType(help='The socket timeout(secs), used by the service to regulate data flow.',
                                           type=int)
+    max_workers_type = CLIArgumentType(type=int, validator=validate_max_workers,
+                                       help='The maximum number of files or blobs to transfer in parallel. Each of '
+                                            'them may still use up to --max-connections connections. Default: 1.')
     large_file_share_type = CLIArgumentType(
         action='store_true', min_api='2019-04-01',
         help='Enable the capability to support large file shares with more than 5 TiB capacity for storage account.'
@@ -861,6 +865,7 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('maxsize_condition', arg_group='Content Control')
         c.argument('validate_content', action='store_true', min_api='2016-05-31', arg_group='Content Control')
         c.argument('blob_type', options_list=('--type', '-t'), arg_type=get_enum_type(get_blob_types()))
+        c.argument('max_workers', max_workers_type)
         c.extra('no_progress', progress_type)
         c.extra('socket_timeout', socket_timeout_type)
 
@@ -882,6 +887,11 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.extra('socket_timeout', socket_timeout_type)
         c.argument('max_connections', type=int,
                    help='Maximum number of parallel connections to use when the blob size exceeds 64MB.')
+        c.argument('max_workers', max_workers_type)
+        c.argument('skip_unchanged', action='store_true',
+                   help='Skip blobs whose local file already exists with the same size and MD5. Blobs without an '
+                        'MD5 are skipped if the local file has the same size and was modified after the blob. '
+                        'Useful to resume an interrupted download.')
 
     with self.argument_context('storage blob delete') as c:
         from .sdkutil import get_delete_blob_snapshot_type_names
@@ -893,6 +903,22 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('delete_snapshots', arg_type=get_enum_type(get_delete_blob_snapshot_type_names()),
                    help='Required if the blob has associated snapshots.')
         c.argument('lease_id', help='The active lease id for the blob.')
+        c.argument('use_batch_api', action='store_true',
+                   help='Delete up to 256 blobs in each request with the Blob Batch API. Use --max-workers to send '
+                        'several batch requests in parallel.')
+        c.argument('max_workers', max_workers_type,
+                   help='The maximum number of batch requests to send in parallel with --use-batch-api. Default: 1.')
+
+    with self.argument_context('storage blob set-tier-batch') as c:
+        c.ignore('source_container_name')
+        c.argument('source', options_list=('--source', '-s'))
+        c.argument('tier', arg_type=get_enum_type(('Hot', 'Cool', 'Archive')),
+                   help='The tier value to set the block blobs to.')
+        c.argument('rehydrate_priority', options_list=('--rehydrate-priority', '-r'),
+                   arg_type=get_enum_type(('High', 'Standard')),
+                   help='Indicate the priority with which to rehydrate archived blobs.')
+        c.argument('max_workers', max_workers_type,
+                   help='The maximum number of batch requests to send in parallel. Default: 1.')
 
     with self.argument_context('storage blob lease') as c:
         c.argument('blob_name', arg_type=blob_name_type)
@@ -1511,6 +1537,7 @@ def load_arguments(self, _):  # pylint: disable=too-many-locals, too-many-statem
         c.argument('validate_content', action='store_true', min_api='2016-05-31')
         c.register_content_settings_argument(t_file_content_settings, update=False, arg_group='Content Settings')
         c.extra('no_progress', progress_type)
+        c.argument('max_workers', max_workers_type)
 
     with self.argument_context('storage file download-batch') as c:
         from ._validators import process_file_download_batch_parameters
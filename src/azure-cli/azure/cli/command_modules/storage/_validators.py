@@ -7,6 +7,7 @@
 import os
 import argparse
 
+from azure.cli.core._session import Session
 from azure.cli.core.commands.validators import validate_key_value_pairs
 from azure.cli.core.profiles import ResourceType, get_sdk
 from azure.cli.core.util import get_file_json, shell_safe_json_parse
@@ -31,10 +32,38 @@ logger = get_logger(__name__)
 # Utilities
 
 
+# Cache of storage account name -> resource ID, shared across invocations. Account keys are never written to disk,
+# they are only cached in memory for the current process.
+_ACCOUNT_IDS = Session()
+_ACCOUNT_IDS_FILE_NAME = 'storageAccountIds.json'
+_ACCOUNT_ID_VALID_SECONDS = 3600 * 24
+_ACCOUNT_KEYS = {}
+
+
 # pylint: disable=inconsistent-return-statements,too-many-lines
 def _query_account_key(cli_ctx, account_name):
     """Query the storage account key. This is used when the customer doesn't offer account key but name."""
+    from azure.core.exceptions import HttpResponseError
+    cache_key = _get_account_cache_key(cli_ctx, account_name)
+    if cache_key in _ACCOUNT_KEYS:
+        return _ACCOUNT_KEYS[cache_key]
+
+    cached = _get_cached_account_id(cli_ctx, account_name) is not None
     rg, scf = _query_account_rg(cli_ctx, account_name)
+    try:
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    except HttpResponseError as ex:
+        # The cached resource group is stale if the account was deleted, or recreated or moved elsewhere
+        if not cached or ex.status_code not in [403, 404]:
+            raise
+        _invalidate_account_id(cli_ctx, account_name)
+        rg, scf = _query_account_rg(cli_ctx, account_name)
+        key = _list_account_key(cli_ctx, scf, rg, account_name)
+    _ACCOUNT_KEYS[cache_key] = key
+    return key
+
+
+def _list_account_key(cli_ctx, scf, rg, account_name):
     t_storage_account_keys = get_sdk(
         cli_ctx, ResourceType.MGMT_STORAGE, 'models.storage_account_keys#StorageAccountKeys')
 
@@ -47,14 +76,69 @@ def _query_account_key(cli_ctx, account_name):
 
 def _query_account_rg(cli_ctx, account_name):
     """Query the storage account's resource group, which the mgmt sdk requires."""
+    from msrestazure.tools import parse_resource_id
     scf = storage_client_factory(cli_ctx)
-    acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
+    account_id = _get_cached_account_id(cli_ctx, account_name)
+    if not account_id:
+        account_id = _query_account_id(cli_ctx, scf, account_name)
+        _cache_account_id(cli_ctx, account_name, account_id)
+    return parse_resource_id(account_id)['resource_group'], scf
+
+
+def _query_account_id(cli_ctx, scf, account_name):
+    """Query the storage account's resource ID with a targeted lookup, falling back to listing all the accounts in the
+    subscription, as new accounts may not be visible to the lookup yet."""
+    from azure.cli.core.commands.client_factory import get_mgmt_service_client
+    resource_client = get_mgmt_service_client(cli_ctx, ResourceType.MGMT_RESOURCE_RESOURCES)
+    query_filter = "resourceType eq 'Microsoft.Storage/storageAccounts' and name eq '{}'".format(account_name)
+    acc = next((x for x in resource_client.resources.list(filter=query_filter)
+                if x.name.lower() == account_name.lower()), None)
+    if not acc:
+        acc = next((x for x in scf.storage_accounts.list() if x.name == account_name), None)
     if acc:
-        from msrestazure.tools import parse_resource_id
-        return parse_resource_id(acc.id)['resource_group'], scf
+        return acc.id
     raise ValueError("Storage account '{}' not found.".format(account_name))
 
 
+def _get_account_cache_key(cli_ctx, account_name):
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    return '{}/{}'.format(get_subscription_id(cli_ctx), account_name.lower())
+
+
+def _load_account_ids(cli_ctx):
+    filename = os.path.join(cli_ctx.config.config_dir, _ACCOUNT_IDS_FILE_NAME)
+    if _ACCOUNT_IDS.filename != filename:
+        _ACCOUNT_IDS.load(filename)
+    return _ACCOUNT_IDS
+
+
+def _get_cached_account_id(cli_ctx, account_name):
+    import time
+    entry = _load_account_ids(cli_ctx).get(_get_account_cache_key(cli_ctx, account_name))
+    if entry and time.time() - entry['timestamp'] < _ACCOUNT_ID_VALID_SECONDS:
+        return entry['id']
+    return None
+
+
+def _cache_account_id(cli_ctx, account_name, account_id):
+    import time
+    account_ids = _load_account_ids(cli_ctx)
+    with account_ids.batch():
+        # Drop expired entries so that the file doesn't grow forever
+        now = time.time()
+        for key in [k for k, v in account_ids.data.items() if now - v['timestamp'] >= _ACCOUNT_ID_VALID_SECONDS]:
+            del account_ids[key]
+        account_ids[_get_account_cache_key(cli_ctx, account_name)] = {'id': account_id, 'timestamp': now}
+
+
+def _invalidate_account_id(cli_ctx, account_name):
+    cache_key = _get_account_cache_key(cli_ctx, account_name)
+    _ACCOUNT_KEYS.pop(cache_key, None)
+    account_ids = _load_account_ids(cli_ctx)
+    if cache_key in account_ids.data:
+        del account_ids[cache_key]
+
+
 def _create_token_credential(cli_ctx):
     from knack.cli import EVENT_CLI_POST_EXECUTE
 
@@ -1023,6 +1107,10 @@ def process_blob_delete_batch_parameters(cmd, namespace):
     _process_blob_batch_container_parameters(cmd, namespace)
 
 
+def process_blob_set_tier_batch_parameters(cmd, namespace):
+    _process_blob_batch_container_parameters(cmd, namespace)
+
+
 def _process_blob_batch_container_parameters(cmd, namespace, source=True):
     """Process the container parameters for storage blob batch commands before populating args from environment."""
     if source:
@@ -1436,6 +1524,12 @@ def validate_delete_retention_days(namespace):
                                     days='delete_retention_days')
 
 
+def validate_max_workers(namespace):
+    from azure.cli.core.azclierror import InvalidArgumentValueError
+    if namespace.max_workers is not None and namespace.max_workers < 1:
+        raise InvalidArgumentValueError('usage error: --max-workers must be a positive integer.')
+
+
 def validate_file_delete_retention_days(namespace):
     from azure.cli.core.azclierror import ValidationError
     if namespace.enable_delete_retention is True and namespace.delete_retention_days is None:
@@ -346,7 +346,7 @@ def load_command_table(self, _):  # pylint: disable=too-many-locals, too-many-st
         from ._transformers import (transform_storage_list_output, transform_url,
                                     create_boolean_result_output_transformer)
         from ._validators import (process_blob_download_batch_parameters, process_blob_delete_batch_parameters,
-                                  process_blob_upload_batch_parameters)
+                                  process_blob_upload_batch_parameters, process_blob_set_tier_batch_parameters)
         from ._exception_handler import file_related_exception_handler
         g.storage_command_oauth(
             'download', 'get_blob_to_path', table_transformer=transform_blob_output,
@@ -374,6 +374,8 @@ def load_command_table(self, _):  # pylint: disable=too-many-locals, too-many-st
                                        exception_handler=file_related_exception_handler)
         g.storage_custom_command_oauth('delete-batch', 'storage_blob_delete_batch',
                                        validator=process_blob_delete_batch_parameters)
+        g.storage_custom_command_oauth('set-tier-batch', 'storage_blob_set_tier_batch',
+                                       validator=process_blob_set_tier_batch_parameters, min_api='2018-11-09')
         g.storage_command_oauth(
             'metadata show', 'get_blob_metadata', exception_handler=show_exception_handler)
         g.storage_command_oauth('metadata update', 'set_blob_metadata')
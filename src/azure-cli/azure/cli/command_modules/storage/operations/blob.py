@@ -15,7 +15,7 @@ from azure.cli.command_modules.storage.util import (create_blob_service_from_sto
                                                     create_short_lived_container_sas,
                                                     filter_none, collect_blobs, collect_blob_objects, collect_files,
                                                     mkdir_p, guess_content_type, normalize_blob_file_path,
-                                                    check_precondition_success)
+                                                    check_precondition_success, run_concurrently, BatchProgress)
 from knack.log import get_logger
 from knack.util import CLIError
 from .._transformers import transform_response_with_bytearray
@@ -23,6 +23,9 @@ from ..util import get_datetime_from_string
 
 logger = get_logger(__name__)
 
+# The maximum number of sub-requests in a blob batch request
+BLOB_BATCH_MAX_SUBREQUESTS = 256
+
 
 def set_legal_hold(cmd, client, container_name, account_name, tags, resource_group_name=None):
     LegalHold = cmd.get_models('LegalHold', resource_type=ResourceType.MGMT_STORAGE)
@@ -326,11 +329,12 @@ def storage_blob_copy_batch(cmd, client, source_client, container_name=None,
     raise ValueError('Fail to find source. Neither blob container or file share is specified')
 
 
-# pylint: disable=unused-argument
+# pylint: disable=unused-argument, too-many-locals
 def storage_blob_download_batch(client, source, destination, source_container_name, pattern=None, dryrun=False,
-                                progress_callback=None, max_connections=2):
+                                progress_callback=None, max_connections=2, max_workers=1, skip_unchanged=False):
 
-    def _download_blob(blob_service, container, destination_folder, normalized_blob_name, blob_name):
+    def _download_blob(blob_service, container, destination_folder, normalized_blob_name, blob_name,
+                       blob_progress_callback):
         # TODO: try catch IO exception
         destination_path = os.path.join(destination_folder, normalized_blob_name)
         destination_folder = os.path.dirname(destination_path)
@@ -338,42 +342,68 @@ def storage_blob_download_batch(client, source, destination, source_container_na
             mkdir_p(destination_folder)
 
         blob = blob_service.get_blob_to_path(container, blob_name, destination_path, max_connections=max_connections,
-                                             progress_callback=progress_callback)
+                                             progress_callback=blob_progress_callback)
         return blob.name
 
-    source_blobs = collect_blobs(client, source_container_name, pattern)
-    blobs_to_download = {}
-    for blob_name in source_blobs:
-        # remove starting path seperator and normalize
-        normalized_blob_name = normalize_blob_file_path(None, blob_name)
-        if normalized_blob_name in blobs_to_download:
-            raise CLIError('Multiple blobs with download path: `{}`. As a solution, use the `--pattern` parameter '
-                           'to select for a subset of blobs to download OR utilize the `storage blob download` '
-                           'command instead to download individual blobs.'.format(normalized_blob_name))
-        blobs_to_download[normalized_blob_name] = blob_name
+    def _check_download_paths(blobs):
+        # Check for conflicting download paths as the blobs are listed
+        download_paths = set()
+        for blob_name, blob in blobs:
+            # remove starting path seperator and normalize
+            normalized_blob_name = normalize_blob_file_path(None, blob_name)
+            if normalized_blob_name in download_paths:
+                raise CLIError('Multiple blobs with download path: `{}`. As a solution, use the `--pattern` '
+                               'parameter to select for a subset of blobs to download OR utilize the `storage blob '
+                               'download` command instead to download individual blobs.'.format(normalized_blob_name))
+            download_paths.add(normalized_blob_name)
+            yield normalized_blob_name, blob_name, blob
+
+    # Downloads start while the blobs are still being listed
+    source_blobs = _check_download_paths(collect_blob_objects(client, source_container_name, pattern))
 
     if dryrun:
+        source_blobs = list(source_blobs)
         logger.warning('download action: from %s to %s', source, destination)
         logger.warning('    pattern %s', pattern)
         logger.warning('  container %s', source_container_name)
         logger.warning('      total %d', len(source_blobs))
         logger.warning(' operations')
-        for b in source_blobs:
-            logger.warning('  - %s', b)
+        for _, blob_name, _ in source_blobs:
+            logger.warning('  - %s', blob_name)
         return []
 
     # Tell progress reporter to reuse the same hook
     if progress_callback:
         progress_callback.reuse = True
 
-    results = []
-    for index, blob_normed in enumerate(blobs_to_download):
-        # add blob name and number to progress message
-        if progress_callback:
-            progress_callback.message = '{}/{}: "{}"'.format(
-                index + 1, len(blobs_to_download), blobs_to_download[blob_normed])
-        results.append(_download_blob(
-            client, source_container_name, destination, blob_normed, blobs_to_download[blob_normed]))
+    # Concurrent downloads report the aggregated progress of all blobs, whose number is unknown until listed
+    batch_progress = None
+    if progress_callback and max_workers > 1:
+        batch_progress = BatchProgress(progress_callback, None)
+    skipped_blobs = []
+
+    def _download_indexed_blob(indexed_blob):
+        index, (blob_normed, blob_name, blob) = indexed_blob
+        if skip_unchanged and _is_local_file_unchanged(os.path.join(destination, blob_normed), blob):
+            skipped_blobs.append(blob_name)
+            if batch_progress:
+                batch_progress.complete(index)
+            return None
+        blob_progress_callback = progress_callback
+        if batch_progress:
+            blob_progress_callback = batch_progress.get_callback(index)
+        elif progress_callback:
+            # add blob name and number to progress message
+            progress_callback.message = '{}/?: "{}"'.format(index + 1, blob_name)
+        result = _download_blob(client, source_container_name, destination, blob_normed, blob_name,
+                                blob_progress_callback)
+        if batch_progress:
+            batch_progress.complete(index)
+        return result
+
+    results = list(filter_none(run_concurrently(_download_indexed_blob, enumerate(source_blobs), max_workers)))
+    if skipped_blobs:
+        logger.warning('%s blobs skipped because the local files are unchanged.', len(skipped_blobs))
 
     # end progress hook
     if progress_callback:
@@ -382,13 +412,39 @@ def storage_blob_download_batch(client, source, destination, source_container_na
     return results
 
 
+def _is_local_file_unchanged(file_path, blob):
+    """Check whether the local file has the same content as the blob.
+
+    The MD5 of the file is compared with the MD5 of the blob. Blobs without an MD5, like most blobs uploaded in
+    blocks, are compared by size, and by the file being modified after the blob.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+    properties = blob.properties
+    if stat.st_size != properties.content_length:
+        return False
+
+    content_md5 = properties.content_settings.content_md5 if properties.content_settings else None
+    if not content_md5:
+        return bool(properties.last_modified) and stat.st_mtime >= properties.last_modified.timestamp()
+    import base64
+    import hashlib
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(4 * 1024 * 1024), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('utf-8') == content_md5
+
+
 def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  # pylint: disable=too-many-locals
                               source_files=None, destination_path=None,
                               destination_container_name=None, blob_type=None,
                               content_settings=None, metadata=None, validate_content=False,
                               maxsize_condition=None, max_connections=2, lease_id=None, progress_callback=None,
                               if_modified_since=None, if_unmodified_since=None, if_match=None,
-                              if_none_match=None, timeout=None, dryrun=False):
+                              if_none_match=None, timeout=None, dryrun=False, max_workers=1):
     def _create_return_result(blob_name, blob_content_settings, upload_result=None):
         blob_name = normalize_blob_file_path(destination_path, blob_name)
         return {
@@ -419,13 +475,21 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
         if progress_callback:
             progress_callback.reuse = True
 
-        for index, source_file in enumerate(source_files):
-            src, dst = source_file
-            # logger.warning('uploading %s', src)
+        # Concurrent uploads report the aggregated progress of all files
+        batch_progress = None
+        if progress_callback and max_workers > 1:
+            batch_progress = BatchProgress(progress_callback, len(source_files),
+                                           sum(os.path.getsize(src) for src, _ in source_files))
+
+        def _upload_source_file(indexed_source_file):
+            index, (src, dst) = indexed_source_file
             guessed_content_settings = guess_content_type(src, content_settings, t_content_settings)
 
-            # add blob name and number to progress message
-            if progress_callback:
+            file_progress_callback = progress_callback
+            if batch_progress:
+                file_progress_callback = batch_progress.get_callback(index)
+            elif progress_callback:
+                # add blob name and number to progress message
                 progress_callback.message = '{}/{}: "{}"'.format(
                     index + 1, len(source_files), normalize_blob_file_path(destination_path, dst))
 
@@ -434,12 +498,15 @@ def storage_blob_upload_batch(cmd, client, source, destination, pattern=None,  #
                                            blob_type=blob_type, content_settings=guessed_content_settings,
                                            metadata=metadata, validate_content=validate_content,
                                            maxsize_condition=maxsize_condition, max_connections=max_connections,
-                                           lease_id=lease_id, progress_callback=progress_callback,
+                                           lease_id=lease_id, progress_callback=file_progress_callback,
                                            if_modified_since=if_modified_since,
                                            if_unmodified_since=if_unmodified_since, if_match=if_match,
                                            if_none_match=if_none_match, timeout=timeout)
-            if include:
-                results.append(_create_return_result(dst, guessed_content_settings, result))
+            if batch_progress:
+                batch_progress.complete(index)
+            return _create_return_result(dst, guessed_content_settings, result) if include else None
+
+        results = list(filter_none(run_concurrently(_upload_source_file, enumerate(source_files), max_workers)))
         # end progress hook
         if progress_callback:
             progress_callback.hook.end()
@@ -485,8 +552,6 @@ def upload_blob(cmd, client, file_path, container_name=None, blob_name=None, blo
 
     if encryption_scope:
         count = os.path.getsize(file_path)
-        with open(file_path, 'rb') as stream:
-            data = stream.read(count)
         from azure.core import MatchConditions
         upload_args = {
             'content_settings': content_settings,
@@ -519,7 +584,11 @@ def upload_blob(cmd, client, file_path, container_name=None, blob_name=None, blo
             upload_args['etag'] = if_none_match
             upload_args['match_condition'] = MatchConditions.IfModified
         _adjust_block_blob_size(client, blob_type, length=count)
-        response = client.upload_blob(data=data, length=count, encryption_scope=encryption_scope, **upload_args)
+        # Upload from the file stream, so that the SDK reads and stages one block per connection at a time instead
+        # of holding the whole file in memory. Block MD5s are still computed per chunk with --validate-content.
+        with open(file_path, 'rb') as stream:
+            response = client.upload_blob(data=stream, length=count, encryption_scope=encryption_scope,
+                                          **upload_args)
         return transform_response_with_bytearray(response)
 
     t_content_settings = cmd.get_models('blob.models#ContentSettings')
@@ -662,9 +731,9 @@ def show_blob(cmd, client, container_name, blob_name, snapshot=None, lease_id=No
     return blob
 
 
-def storage_blob_delete_batch(client, source, source_container_name, pattern=None, lease_id=None,
+def storage_blob_delete_batch(cmd, client, source, source_container_name, pattern=None, lease_id=None,
                               delete_snapshots=None, if_modified_since=None, if_unmodified_since=None, if_match=None,
-                              if_none_match=None, timeout=None, dryrun=False):
+                              if_none_match=None, timeout=None, dryrun=False, use_batch_api=False, max_workers=1):
     @check_precondition_success
     def _delete_blob(blob_name):
         delete_blob_args = {
@@ -683,14 +752,7 @@ def storage_blob_delete_batch(client, source, source_container_name, pattern=Non
     source_blobs = list(collect_blob_objects(client, source_container_name, pattern))
 
     if dryrun:
-        from datetime import timezone
-        delete_blobs = []
-        if_modified_since_utc = if_modified_since.replace(tzinfo=timezone.utc) if if_modified_since else None
-        if_unmodified_since_utc = if_unmodified_since.replace(tzinfo=timezone.utc) if if_unmodified_since else None
-        for blob in source_blobs:
-            if not if_modified_since or blob[1].properties.last_modified >= if_modified_since_utc:
-                if not if_unmodified_since or blob[1].properties.last_modified <= if_unmodified_since_utc:
-                    delete_blobs.append(blob[0])
+        delete_blobs = _filter_blobs_by_last_modified(source_blobs, if_modified_since, if_unmodified_since)
         logger.warning('delete action: from %s', source)
         logger.warning('    pattern %s', pattern)
         logger.warning('  container %s', source_container_name)
@@ -700,12 +762,121 @@ def storage_blob_delete_batch(client, source, source_container_name, pattern=Non
             logger.warning('  - %s', blob)
         return []
 
+    if use_batch_api:
+        if if_match and if_none_match:
+            from azure.cli.core.azclierror import MutuallyExclusiveArgumentError
+            raise MutuallyExclusiveArgumentError('usage error: --if-match | --if-none-match with --use-batch-api')
+        from azure.core import MatchConditions
+        delete_blobs = _filter_blobs_by_last_modified(source_blobs, if_modified_since, if_unmodified_since)
+        blob_args = {'lease_id': lease_id}
+        if if_match or if_none_match:
+            blob_args['etag'] = if_match or if_none_match
+            blob_args['match_condition'] = MatchConditions.IfNotModified if if_match else MatchConditions.IfModified
+        container_client = _get_container_client_v2(cmd, client, source_container_name)
+
+        def _delete_blobs(blob_names):
+            return container_client.delete_blobs(
+                *[dict(blob_args, name=name) for name in blob_names], delete_snapshots=delete_snapshots,
+                if_modified_since=if_modified_since, if_unmodified_since=if_unmodified_since, timeout=timeout,
+                raise_on_any_failure=False)
+
+        _run_blob_batch(_delete_blobs, delete_blobs, len(source_blobs), 'deleted', max_workers)
+        return
+
     results = [result for include, result in (_delete_blob(blob[0]) for blob in source_blobs) if include]
     num_failures = len(source_blobs) - len(results)
     if num_failures:
         logger.warning('%s of %s blobs not deleted due to "Failed Precondition"', num_failures, len(source_blobs))
 
 
+def storage_blob_set_tier_batch(cmd, client, source, source_container_name, tier, pattern=None,
+                                rehydrate_priority=None, timeout=None, dryrun=False, max_workers=1):
+    source_blobs = [blob[0] for blob in collect_blob_objects(client, source_container_name, pattern)]
+
+    if dryrun:
+        logger.warning('set tier action: from %s', source)
+        logger.warning('    pattern %s', pattern)
+        logger.warning('  container %s', source_container_name)
+        logger.warning('       tier %s', tier)
+        logger.warning('      total %d', len(source_blobs))
+        logger.warning(' operations')
+        for blob in source_blobs:
+            logger.warning('  - %s', blob)
+        return []
+
+    container_client = _get_container_client_v2(cmd, client, source_container_name)
+
+    def _set_blob_tiers(blob_names):
+        return container_client.set_standard_blob_tier_blobs(tier, *blob_names, rehydrate_priority=rehydrate_priority,
+                                                             timeout=timeout, raise_on_any_failure=False)
+
+    _run_blob_batch(_set_blob_tiers, source_blobs, len(source_blobs), 'updated', max_workers)
+
+
+def _filter_blobs_by_last_modified(source_blobs, if_modified_since=None, if_unmodified_since=None):
+    """Return the names of the (name, blob) pairs whose last modified time meets the given conditions."""
+    from datetime import timezone
+    if_modified_since_utc = if_modified_since.replace(tzinfo=timezone.utc) if if_modified_since else None
+    if_unmodified_since_utc = if_unmodified_since.replace(tzinfo=timezone.utc) if if_unmodified_since else None
+    blob_names = []
+    for blob in source_blobs:
+        if not if_modified_since or blob[1].properties.last_modified >= if_modified_since_utc:
+            if not if_unmodified_since or blob[1].properties.last_modified <= if_unmodified_since_utc:
+                blob_names.append(blob[0])
+    return blob_names
+
+
+def _get_container_client_v2(cmd, client, container_name):
+    """Create a track2 container client for the endpoint and credentials of a track1 blob service client, so that
+    custom endpoints from connection strings, like the storage emulator or private endpoints, are kept."""
+    from .._client_factory import prepare_client_kwargs_track2
+    t_container_client = cmd.get_models('_container_client#ContainerClient',
+                                        resource_type=ResourceType.DATA_STORAGE_BLOB)
+    account_url = '{}://{}'.format(client.protocol, client.primary_endpoint)
+    if client.token_credential:
+        from azure.cli.core._profile import Profile
+        credential, _, _ = Profile(cli_ctx=cmd.cli_ctx).get_login_credentials(
+            subscription_id=cmd.cli_ctx.data.get('subscription_id'))
+    elif client.account_key:
+        credential = {'account_name': client.account_name, 'account_key': client.account_key}
+    else:
+        credential = client.sas_token
+    return t_container_client(account_url=account_url, container_name=container_name, credential=credential,
+                              **prepare_client_kwargs_track2(cmd.cli_ctx))
+
+
+def _run_blob_batch(send_batch, blob_names, total, action, max_workers=1):
+    """Send blob batch requests of up to BLOB_BATCH_MAX_SUBREQUESTS blobs each and report the failed blobs.
+
+    :param send_batch: Callable that sends one batch request for a list of blob names and returns the responses of
+        the sub-requests, in order.
+    """
+    from azure.cli.core.azclierror import AzureResponseError
+
+    def _send_batch(batch):
+        return [(name, response.status_code, response.headers.get('x-ms-error-code') or response.reason)
+                for name, response in zip(batch, send_batch(batch))]
+
+    batches = (blob_names[i:i + BLOB_BATCH_MAX_SUBREQUESTS]
+               for i in range(0, len(blob_names), BLOB_BATCH_MAX_SUBREQUESTS))
+    num_precondition_failures = 0
+    failures = []
+    for results in run_concurrently(_send_batch, batches, max_workers):
+        for name, status_code, error in results:
+            if status_code == 412:
+                num_precondition_failures += 1
+            elif status_code >= 300:
+                failures.append((name, status_code, error))
+
+    num_skipped = total - len(blob_names) + num_precondition_failures
+    if num_skipped:
+        logger.warning('%s of %s blobs not %s due to "Failed Precondition"', num_skipped, total, action)
+    if failures:
+        for name, status_code, error in failures:
+            logger.warning('  - %s: %s %s', name, status_code, error)
+        raise AzureResponseError('{} of {} blobs not {}.'.format(len(failures), total, action))
+
+
 def generate_sas_blob_uri(client, container_name, blob_name, permission=None,
                           expiry=None, start=None, id=None, ip=None,  # pylint: disable=redefined-builtin
                           protocol=None, cache_control=None, content_disposition=None,
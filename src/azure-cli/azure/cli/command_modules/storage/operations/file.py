@@ -131,10 +131,11 @@ def list_share_files(cmd, client, share_name, directory_name=None, timeout=None,
 
 def storage_file_upload_batch(cmd, client, destination, source, destination_path=None, pattern=None, dryrun=False,
                               validate_content=False, content_settings=None, max_connections=1, metadata=None,
-                              progress_callback=None):
+                              progress_callback=None, max_workers=1):
     """ Upload local files to Azure Storage File Share in batch """
 
-    from azure.cli.command_modules.storage.util import glob_files_locally, normalize_blob_file_path
+    from azure.cli.command_modules.storage.util import (glob_files_locally, normalize_blob_file_path,
+                                                        run_concurrently, BatchProgress)
 
     source_files = list(glob_files_locally(source, pattern))
     logger = get_logger(__name__)
@@ -149,16 +150,26 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
                  'Type': guess_content_type(src, content_settings, settings_class).content_type} for src, dst in
                 source_files]
 
-    # TODO: Performance improvement
-    # 1. Upload files in parallel
-    def _upload_action(src, dst):
+    # the cache of existing directories in the destination file share, shared by the concurrent uploads
+    existing_dirs = _DirectoryCache()
+
+    # Concurrent uploads report the aggregated progress of all files
+    batch_progress = None
+    if progress_callback and max_workers > 1:
+        batch_progress = BatchProgress(progress_callback, len(source_files),
+                                       sum(os.path.getsize(src) for src, _ in source_files))
+
+    def _upload_action(indexed_source_file):
+        index, (src, dst) = indexed_source_file
         dst = normalize_blob_file_path(destination_path, dst)
         dir_name = os.path.dirname(dst)
         file_name = os.path.basename(dst)
 
-        _make_directory_in_files_share(client, destination, dir_name)
+        file_progress_callback = batch_progress.get_callback(index) if batch_progress else progress_callback
+
+        _make_directory_in_files_share(client, destination, dir_name, existing_dirs)
         create_file_args = {'share_name': destination, 'directory_name': dir_name, 'file_name': file_name,
-                            'local_file_path': src, 'progress_callback': progress_callback,
+                            'local_file_path': src, 'progress_callback': file_progress_callback,
                             'content_settings': guess_content_type(src, content_settings, settings_class),
                             'metadata': metadata, 'max_connections': max_connections}
 
@@ -167,10 +178,12 @@ def storage_file_upload_batch(cmd, client, destination, source, destination_path
 
         logger.warning('uploading %s', src)
         client.create_file_from_path(**create_file_args)
+        if batch_progress:
+            batch_progress.complete(index)
 
         return client.make_file_url(destination, dir_name, file_name)
 
-    return list(_upload_action(src, dst) for src, dst in source_files)
+    return list(run_concurrently(_upload_action, enumerate(source_files), max_workers))
 
 
 def storage_file_download_batch(cmd, client, source, destination, pattern=None, dryrun=False, validate_content=False,
@@ -242,7 +255,7 @@ def storage_file_copy_batch(cmd, client, source_client, destination_share=None,
 
         # the cache of existing directories in the destination file share. the cache helps to avoid
         # repeatedly create existing directory so as to optimize the performance.
-        existing_dirs = set([])
+        existing_dirs = _DirectoryCache()
 
         if not source_sas:
             source_sas = create_short_lived_container_sas(cmd, source_client.account_name, source_client.account_key,
@@ -270,7 +283,7 @@ def storage_file_copy_batch(cmd, client, source_client, destination_share=None,
 
         # the cache of existing directories in the destination file share. the cache helps to avoid
         # repeatedly create existing directory so as to optimize the performance.
-        existing_dirs = set([])
+        existing_dirs = _DirectoryCache()
 
         if not source_sas:
             source_sas = create_short_lived_share_sas(cmd, source_client.account_name, source_client.account_key,
@@ -305,9 +318,10 @@ def storage_file_delete_batch(cmd, client, source, pattern=None, dryrun=False, t
         return client.delete_file(**delete_file_args)
 
     from azure.cli.command_modules.storage.util import glob_files_remotely
-    source_files = list(glob_files_remotely(cmd, client, source, pattern))
+    source_files = glob_files_remotely(cmd, client, source, pattern)
 
     if dryrun:
+        source_files = list(source_files)
         logger = get_logger(__name__)
         logger.warning('delete files from %s', source)
         logger.warning('    pattern %s', pattern)
@@ -374,12 +388,41 @@ def _create_file_and_directory_from_file(file_service, source_file_service, shar
         raise CLIError(error_template.format(file_name, source_share, share))
 
 
+class _DirectoryCache:
+    """
+    Thread-safe cache of the directories which exist in a file share. Each directory is created only once, even when
+    several threads need it at the same time.
+    """
+
+    def __init__(self):
+        import threading
+        self._lock = threading.Lock()
+        self._dir_locks = {}
+        self._existing_dirs = set()
+
+    def __contains__(self, dir_name):
+        return dir_name in self._existing_dirs
+
+    def create_once(self, dir_name, create_directory):
+        """Call create_directory(dir_name) unless the directory has already been created."""
+        if dir_name in self._existing_dirs:
+            return
+        import threading
+        with self._lock:
+            dir_lock = self._dir_locks.setdefault(dir_name, threading.Lock())
+        with dir_lock:
+            # Another thread may have created the directory while we were waiting. If it failed, try again.
+            if dir_name not in self._existing_dirs:
+                create_directory(dir_name)
+                self._existing_dirs.add(dir_name)
+
+
 def _make_directory_in_files_share(file_service, file_share, directory_path, existing_dirs=None):
     """
     Create directories recursively.
 
-    This method accept a existing_dirs set which serves as the cache of existing directory. If the
-    parameter is given, the method will search the set first to avoid repeatedly create directory
+    This method accept a existing_dirs _DirectoryCache which serves as the cache of existing directory. If the
+    parameter is given, the method will search the cache first to avoid repeatedly create directory
     which already exists.
     """
     from azure.common import AzureHttpError
@@ -393,18 +436,18 @@ def _make_directory_in_files_share(file_service, file_share, directory_path, exi
         parents.append(p)
         p = os.path.dirname(p)
 
-    for dir_name in reversed(parents):
-        if existing_dirs and (dir_name in existing_dirs):
-            continue
-
+    def _create_directory(dir_name):
         try:
             file_service.create_directory(share_name=file_share, directory_name=dir_name, fail_on_exist=False)
         except AzureHttpError:
             from knack.util import CLIError
             raise CLIError('Failed to create directory {}'.format(dir_name))
 
-        if existing_dirs:
-            existing_dirs.add(directory_path)
+    for dir_name in reversed(parents):
+        if existing_dirs is None:
+            _create_directory(dir_name)
+        else:
+            existing_dirs.create_once(dir_name, _create_directory)
 
 
 def _file_share_exists(client, resource_group_name, account_name, share_name):
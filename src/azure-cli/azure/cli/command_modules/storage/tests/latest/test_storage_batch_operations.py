@@ -29,6 +29,14 @@ class StorageBatchOperationScenarios(StorageScenarioMixin, LiveScenarioTest):
         self.storage_cmd(cmd, storage_account_info)
         self.assertEqual(41, sum(len(f) for r, d, f in os.walk(local_folder)))
 
+        # download in parallel, then skip the blobs that are already downloaded
+        local_folder = self.create_temp_dir()
+        cmd = 'storage blob download-batch -s {} -d "{}" --max-workers 8'.format(src_container, local_folder)
+        self.assertEqual(41, len(self.storage_cmd(cmd, storage_account_info).get_output_in_json()))
+        self.assertEqual(41, sum(len(f) for r, d, f in os.walk(local_folder)))
+        cmd = 'storage blob download-batch -s {} -d "{}" --skip-unchanged'.format(src_container, local_folder)
+        self.assertEqual(0, len(self.storage_cmd(cmd, storage_account_info).get_output_in_json()))
+
         # download recursively with wild card *, and use URL as source
         local_folder = self.create_temp_dir()
         src_url = self.storage_cmd('storage blob url -c {} -n readme -otsv', storage_account_info, src_container).output
@@ -112,6 +120,14 @@ class StorageBatchOperationScenarios(StorageScenarioMixin, LiveScenarioTest):
         self.storage_cmd('storage blob list -c {} --prefix some_dir',
                          storage_account_info, container).assert_with_checks(JMESPathCheck('length(@)', 4))
 
+        # upload files in parallel
+        container = self.create_container(storage_account_info)
+        result = self.storage_cmd('storage blob upload-batch -s "{}" -d {} --max-workers 8', storage_account_info,
+                                  test_dir, container).get_output_in_json()
+        self.assertEqual(41, len(result))
+        self.storage_cmd('storage blob list -c {}', storage_account_info, container).assert_with_checks(
+            JMESPathCheck('length(@)', 41))
+
     @ResourceGroupPreparer()
     @StorageAccountPreparer()
     @StorageTestFilesPreparer()
@@ -187,6 +203,14 @@ class StorageBatchOperationScenarios(StorageScenarioMixin, LiveScenarioTest):
         self.storage_cmd('storage file download-batch -s {} -d "{}"', storage_account_info, src_share, local_folder)
         self.assertEqual(10, sum(len(f) for r, d, f in os.walk(local_folder)))
 
+        # upload concurrently
+        src_share = self.create_share(storage_account_info)
+        local_folder = self.create_temp_dir()
+        self.storage_cmd('storage file upload-batch -s "{}" -d {} --max-workers 4', storage_account_info, test_dir,
+                         src_share)
+        self.storage_cmd('storage file download-batch -s {} -d "{}"', storage_account_info, src_share, local_folder)
+        self.assertEqual(41, sum(len(f) for r, d, f in os.walk(local_folder)))
+
         # upload with pattern */file_0
         src_share = self.create_share(storage_account_info)
         local_folder = self.create_temp_dir()
@@ -427,6 +451,17 @@ class StorageBatchOperationScenarios(StorageScenarioMixin, LiveScenarioTest):
         self.storage_cmd('storage blob list -c {}', storage_account_info, src_container).assert_with_checks(
             JMESPathCheck('length(@)', 0))
 
+        # set tier and delete with the blob batch api
+        src_container = create_and_populate_container()
+        self.storage_cmd('storage blob set-tier-batch -s {} --pattern apple/* --tier Cool --max-workers 2',
+                         storage_account_info, src_container)
+        self.storage_cmd('storage blob show -c {} -n apple/file_0', storage_account_info, src_container) \
+            .assert_with_checks(JMESPathCheck('properties.blobTier', 'Cool'))
+        self.storage_cmd('storage blob delete-batch -s {} --pattern apple/* --use-batch-api --max-workers 2',
+                         storage_account_info, src_container)
+        self.storage_cmd('storage blob list -c {}', storage_account_info, src_container).assert_with_checks(
+            JMESPathCheck('length(@)', 31))
+
     @ResourceGroupPreparer()
     @StorageAccountPreparer()
     @StorageTestFilesPreparer()
@@ -0,0 +1,327 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import ntpath
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import mock
+from knack.util import CLIError
+
+from azure.cli.command_modules.storage.util import (run_concurrently, BatchProgress, collect_blob_objects,
+                                                    glob_files_remotely, _get_pattern_prefix, _match_path)
+from azure.cli.command_modules.storage.operations.file import _DirectoryCache, _make_directory_in_files_share
+from azure.cli.command_modules.storage.operations.blob import (_is_local_file_unchanged, _run_blob_batch,
+                                                               _filter_blobs_by_last_modified, upload_blob,
+                                                               storage_blob_download_batch, _get_container_client_v2)
+
+
+class TestStorageUtil(unittest.TestCase):
+
+    def test_run_concurrently_keeps_order(self):
+        def _delayed_square(i):
+            # later items finish first
+            time.sleep((10 - i) * 0.001)
+            return i * i
+
+        for max_workers in [1, 4]:
+            self.assertEqual(list(run_concurrently(_delayed_square, range(10), max_workers)),
+                             [i * i for i in range(10)])
+
+    def test_run_concurrently_consumes_items_lazily(self):
+        consumed = []
+
+        def _items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = run_concurrently(lambda i: i, _items(), 2)
+        self.assertEqual(next(results), 0)
+        # At most 2 * max_workers items are in flight
+        self.assertLessEqual(len(consumed), 5)
+        self.assertEqual(list(results), list(range(1, 100)))
+
+    def test_run_concurrently_raises_error(self):
+        def _fail_on_three(i):
+            if i == 3:
+                raise ValueError('failed')
+            return i
+
+        with self.assertRaises(ValueError):
+            list(run_concurrently(_fail_on_three, range(10), 4))
+
+    def test_batch_progress(self):
+        progress_callback = mock.MagicMock()
+        progress = BatchProgress(progress_callback, total_files=3, total_bytes=30)
+        progress.get_callback('a')(5, 10)
+        progress_callback.assert_called_with(5, 30)
+        progress.get_callback('b')(20, 20)
+        progress_callback.assert_called_with(25, 30)
+        # A file is only completed once its transfer returns
+        self.assertEqual(progress_callback.message, '0/3 files')
+        progress.complete('b')
+        self.assertEqual(progress_callback.message, '1/3 files')
+        progress.get_callback('a')(10, 10)
+        progress.complete('a')
+        progress_callback.assert_called_with(30, 30)
+        self.assertEqual(progress_callback.message, '2/3 files')
+        # An empty file never reports its progress
+        progress.complete('c')
+        progress_callback.assert_called_with(30, 30)
+        self.assertEqual(progress_callback.message, '3/3 files')
+
+        self.assertIsNone(BatchProgress(None, total_files=1).get_callback('a'))
+
+    def test_get_pattern_prefix(self):
+        self.assertEqual(_get_pattern_prefix(None), '')
+        self.assertEqual(_get_pattern_prefix('*'), '')
+        self.assertEqual(_get_pattern_prefix('logs/2024/10/*.gz'), 'logs/2024/10/')
+        self.assertEqual(_get_pattern_prefix('cli-201[89]-??-??.txt'), 'cli-201')
+        self.assertEqual(_get_pattern_prefix('dir/file?'), 'dir/file')
+        self.assertEqual(_get_pattern_prefix('dir/file'), 'dir/file')
+
+        # Patterns match case-insensitively on Windows, so blobs can't be listed by a case-sensitive prefix
+        with mock.patch('os.path.normcase', ntpath.normcase):
+            self.assertEqual(_get_pattern_prefix('Logs/*'), '')
+            self.assertTrue(_match_path('logs/a', 'Logs/*'))
+
+    def test_collect_blob_objects_with_prefix(self):
+        def _blob(name):
+            blob = mock.MagicMock()
+            blob.name = name
+            return blob
+
+        def _list_blobs(container, prefix=None):
+            names = ['apple/file_0', 'apple/file_1.gz', 'apple/sub/file_2.gz', 'butter/file_0.gz']
+            return [_blob(n) for n in names if not prefix or n.startswith(prefix)]
+
+        blob_service = mock.MagicMock()
+        blob_service.list_blobs.side_effect = _list_blobs
+        blob_names = [name for name, _ in collect_blob_objects(blob_service, 'container', 'apple/*.gz')]
+        blob_service.list_blobs.assert_called_once_with('container', prefix='apple/')
+        # '*' also matches '/', so blobs in sub directories are included
+        self.assertEqual(blob_names, ['apple/file_1.gz', 'apple/sub/file_2.gz'])
+
+        blob_names = [name for name, _ in collect_blob_objects(blob_service, 'container', 'apple/*')]
+        self.assertEqual(blob_names, ['apple/file_0', 'apple/file_1.gz', 'apple/sub/file_2.gz'])
+
+        blob_service.list_blobs.reset_mock()
+        blob_names = [name for name, _ in collect_blob_objects(blob_service, 'container', '*/file_0*')]
+        blob_service.list_blobs.assert_called_once_with('container', prefix=None)
+        self.assertEqual(blob_names, ['apple/file_0', 'butter/file_0.gz'])
+
+    def test_glob_files_remotely(self):
+        class _Directory:
+            def __init__(self, name):
+                self.name = name
+
+        class _File(_Directory):
+            pass
+
+        tree = {
+            '': [_File('readme'), _Directory('apple'), _Directory('butter')],
+            'apple': [_File('file_0'), _Directory('sub')],
+            os.path.join('apple', 'sub'): [_File('file_1')],
+            'butter': [_File('file_0'), _File('file_2')]
+        }
+        listed = []
+
+        def _list_directories_and_files(share_name, directory, snapshot=None):
+            listed.append(directory)
+            return tree[directory]
+
+        cmd = mock.MagicMock()
+        cmd.get_models.return_value = (_Directory, _File)
+        client = mock.MagicMock()
+        client.list_directories_and_files.side_effect = _list_directories_and_files
+
+        for max_workers in [1, 4]:
+            listed.clear()
+            self.assertEqual(sorted(glob_files_remotely(cmd, client, 'share', None, max_workers=max_workers)),
+                             sorted([('', 'readme'), ('apple', 'file_0'), (os.path.join('apple', 'sub'), 'file_1'),
+                                     ('butter', 'file_0'), ('butter', 'file_2')]))
+            self.assertEqual(len(listed), 4)
+
+            # '*' also matches '/'
+            self.assertEqual(sorted(glob_files_remotely(cmd, client, 'share', '*/file_0', max_workers=max_workers)),
+                             [('apple', 'file_0'), ('butter', 'file_0')])
+
+            # Directories that can't match the literal prefix of the pattern are not listed
+            listed.clear()
+            self.assertEqual(list(glob_files_remotely(cmd, client, 'share', 'apple/s*', max_workers=max_workers)),
+                             [(os.path.join('apple', 'sub'), 'file_1')])
+            self.assertEqual(sorted(listed), sorted(['', 'apple', os.path.join('apple', 'sub')]))
+
+            # Directories are compared case-insensitively where patterns match case-insensitively
+            listed.clear()
+            with mock.patch('os.path.normcase', ntpath.normcase):
+                self.assertEqual(list(glob_files_remotely(cmd, client, 'share', 'Apple/S*', max_workers=max_workers)),
+                                 [(os.path.join('apple', 'sub'), 'file_1')])
+            self.assertEqual(sorted(listed), sorted(['', 'apple', os.path.join('apple', 'sub')]))
+
+    def test_make_directory_in_files_share_with_cache(self):
+        file_service = mock.MagicMock()
+        existing_dirs = _DirectoryCache()
+        paths = [os.path.join('a', 'b', 'c'), os.path.join('a', 'b', 'd'), os.path.join('a', 'e')] * 10
+        list(run_concurrently(lambda p: _make_directory_in_files_share(file_service, 'share', p, existing_dirs),
+                              paths, 8))
+        created = [c[1]['directory_name'] for c in file_service.create_directory.call_args_list]
+        # Each directory is created exactly once
+        self.assertEqual(sorted(created), sorted(['a', os.path.join('a', 'b'), os.path.join('a', 'b', 'c'),
+                                                  os.path.join('a', 'b', 'd'), os.path.join('a', 'e')]))
+        self.assertIn(os.path.join('a', 'b'), existing_dirs)
+
+    def test_upload_blob_with_encryption_scope_streams_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, 'file')
+            with open(file_path, 'wb') as f:
+                f.write(b'hello')
+
+            streams = []
+
+            def _upload_blob(data, length, **_):
+                streams.append(data)
+                # The SDK reads the data chunk by chunk from the open file
+                self.assertEqual(data.read(2), b'he')
+                self.assertEqual(length, 5)
+                return {}
+
+            client = mock.MagicMock()
+            client.upload_blob.side_effect = _upload_blob
+            upload_blob(mock.MagicMock(), client, file_path, blob_type='block', encryption_scope='scope1')
+            self.assertEqual(client.upload_blob.call_args[1]['encryption_scope'], 'scope1')
+            self.assertTrue(streams[0].closed)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_is_local_file_unchanged(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(temp_dir, 'file')
+            with open(file_path, 'wb') as f:
+                f.write(b'hello')
+
+            def _blob(content_length, content_md5=None, last_modified=None):
+                properties = mock.MagicMock(content_length=content_length, last_modified=last_modified)
+                properties.content_settings.content_md5 = content_md5
+                return mock.MagicMock(properties=properties)
+
+            hello_md5 = 'XUFAKrxLKna5cZ2REBfFkg=='
+            self.assertTrue(_is_local_file_unchanged(file_path, _blob(5, hello_md5)))
+            self.assertFalse(_is_local_file_unchanged(file_path, _blob(5, 'AAAAAAAAAAAAAAAAAAAAAA==')))
+            self.assertFalse(_is_local_file_unchanged(file_path, _blob(6, hello_md5)))
+            self.assertFalse(_is_local_file_unchanged(os.path.join(temp_dir, 'missing'), _blob(5, hello_md5)))
+
+            # Without MD5, a file of the same size is unchanged if it was modified after the blob
+            now = datetime.now(timezone.utc)
+            self.assertTrue(_is_local_file_unchanged(file_path, _blob(5, last_modified=now - timedelta(hours=1))))
+            self.assertFalse(_is_local_file_unchanged(file_path, _blob(5, last_modified=now + timedelta(hours=1))))
+            self.assertFalse(_is_local_file_unchanged(file_path, _blob(6, last_modified=now - timedelta(hours=1))))
+            self.assertFalse(_is_local_file_unchanged(file_path, _blob(5)))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_download_batch_streams_listing(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(temp_dir, 'unchanged'), 'wb') as f:
+                f.write(b'hello')
+            listed = []
+
+            def _list_blobs(*_, **__):
+                for name, size in [('apple', 1), ('unchanged', 5), ('butter', 1), ('/apple', 1), ('cherry', 1)]:
+                    blob = mock.MagicMock(properties=mock.MagicMock(content_length=size))
+                    blob.name = name
+                    blob.properties.content_settings.content_md5 = None
+                    blob.properties.last_modified = datetime.now(timezone.utc) - timedelta(hours=1)
+                    listed.append(name)
+                    yield blob
+
+            def _get_blob_to_path(container, blob_name, *_, **__):
+                # The first blob is downloaded before the listing reaches the later blobs
+                self.assertNotIn('cherry', listed)
+                return mock.MagicMock(name=blob_name)
+
+            client = mock.MagicMock()
+            client.list_blobs.side_effect = _list_blobs
+            client.get_blob_to_path.side_effect = _get_blob_to_path
+            # Conflicting download paths are found as the blobs are listed
+            with self.assertRaisesRegex(CLIError, 'Multiple blobs with download path: `apple`'):
+                storage_blob_download_batch(client, 'container', temp_dir, 'container', skip_unchanged=True)
+            self.assertEqual([c[0][1] for c in client.get_blob_to_path.call_args_list], ['apple', 'butter'])
+            self.assertEqual(listed, ['apple', 'unchanged', 'butter', '/apple'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_get_container_client_v2(self):
+        from azure.cli.core.mock import DummyCli
+        from azure.cli.core.profiles import get_sdk
+        cmd = mock.MagicMock()
+        cmd.cli_ctx = DummyCli()
+        cmd.get_models.side_effect = lambda path, resource_type: get_sdk(cmd.cli_ctx, resource_type, path)
+
+        # The endpoint of an emulator connection string is kept
+        client = mock.MagicMock(protocol='http', primary_endpoint='127.0.0.1:10000/devstoreaccount1',
+                                account_name='devstoreaccount1', account_key='a2V5', token_credential=None)
+        container_client = _get_container_client_v2(cmd, client, 'container')
+        self.assertEqual(container_client.url, 'http://127.0.0.1:10000/devstoreaccount1/container')
+        self.assertEqual(container_client.credential.account_name, 'devstoreaccount1')
+
+        # Login credentials are for the subscription of the command
+        client = mock.MagicMock(protocol='https', primary_endpoint='account.blob.core.chinacloudapi.cn')
+        cmd.cli_ctx.data['subscription_id'] = 'sub1'
+        with mock.patch('azure.cli.core._profile.Profile.get_login_credentials',
+                        return_value=(mock.MagicMock(), None, None)) as get_login_credentials:
+            container_client = _get_container_client_v2(cmd, client, 'container')
+        get_login_credentials.assert_called_once_with(subscription_id='sub1')
+        self.assertEqual(container_client.url, 'https://account.blob.core.chinacloudapi.cn/container')
+
+    def test_run_blob_batch(self):
+        batches = []
+
+        def _send_batch(blob_names):
+            batches.append(blob_names)
+            return [mock.MagicMock(status_code=412 if name == 'blob3' else 202, headers={}) for name in blob_names]
+
+        blob_names = ['blob{}'.format(i) for i in range(600)]
+        with mock.patch('azure.cli.command_modules.storage.operations.blob.logger') as logger_mock:
+            _run_blob_batch(_send_batch, blob_names, 610, 'deleted', max_workers=2)
+        self.assertEqual([len(batch) for batch in batches], [256, 256, 88])
+        self.assertEqual(sorted(sum(batches, [])), sorted(blob_names))
+        # Blobs filtered out before sending and failed preconditions are reported together
+        logger_mock.warning.assert_called_once_with('%s of %s blobs not %s due to "Failed Precondition"',
+                                                    11, 610, 'deleted')
+
+    def test_run_blob_batch_reports_failures(self):
+        from azure.cli.core.azclierror import AzureResponseError
+
+        def _send_batch(blob_names):
+            return [mock.MagicMock(status_code=404 if name == 'b' else 202, headers={'x-ms-error-code': 'BlobNotFound'})
+                    for name in blob_names]
+
+        with mock.patch('azure.cli.command_modules.storage.operations.blob.logger') as logger_mock:
+            with self.assertRaisesRegex(AzureResponseError, '1 of 3 blobs not deleted'):
+                _run_blob_batch(_send_batch, ['a', 'b', 'c'], 3, 'deleted')
+        logger_mock.warning.assert_called_once_with('  - %s: %s %s', 'b', 404, 'BlobNotFound')
+
+    def test_filter_blobs_by_last_modified(self):
+        def _blob(day):
+            return mock.MagicMock(properties=mock.MagicMock(last_modified=datetime(2021, 1, day, tzinfo=timezone.utc)))
+
+        blobs = [('a', _blob(1)), ('b', _blob(10)), ('c', _blob(20))]
+        self.assertEqual(_filter_blobs_by_last_modified(blobs), ['a', 'b', 'c'])
+        self.assertEqual(_filter_blobs_by_last_modified(blobs, if_modified_since=datetime(2021, 1, 5)), ['b', 'c'])
+        self.assertEqual(_filter_blobs_by_last_modified(blobs, if_modified_since=datetime(2021, 1, 5),
+                                                        if_unmodified_since=datetime(2021, 1, 15)), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
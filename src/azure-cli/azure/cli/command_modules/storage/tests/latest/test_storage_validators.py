@@ -3,6 +3,7 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import os
 import unittest
 import mock
 from argparse import (Namespace, ArgumentError)
@@ -377,5 +378,86 @@ class TestAzcopyValidator(unittest.TestCase):
         self.assertIsNotNone(ns.destination)
 
 
+class TestStorageAccountCache(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        from azure.cli.command_modules.storage import _validators
+        self.temp_dir = tempfile.mkdtemp()
+        self.cli_ctx = mock.MagicMock(data={'subscription_id': 'sub1'})
+        self.cli_ctx.config.config_dir = self.temp_dir
+        _validators._ACCOUNT_IDS.filename = None
+        _validators._ACCOUNT_KEYS.clear()
+
+        resource = mock.MagicMock(id='/subscriptions/sub1/resourceGroups/rg1/providers/Microsoft.Storage/'
+                                     'storageAccounts/account1')
+        resource.name = 'account1'
+        self.resource_client = mock.MagicMock()
+        self.resource_client.resources.list.return_value = [resource]
+        self.storage_client = mock.MagicMock()
+        patches = [mock.patch('azure.cli.core.commands.client_factory.get_mgmt_service_client',
+                              return_value=self.resource_client),
+                   mock.patch('azure.cli.command_modules.storage._validators.storage_client_factory',
+                              return_value=self.storage_client)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_query_account_rg_is_cached(self):
+        from azure.cli.command_modules.storage import _validators
+        self.assertEqual(_validators._query_account_rg(self.cli_ctx, 'account1')[0], 'rg1')
+        self.resource_client.resources.list.assert_called_once_with(
+            filter="resourceType eq 'Microsoft.Storage/storageAccounts' and name eq 'account1'")
+        self.storage_client.storage_accounts.list.assert_not_called()
+
+        # A new process reads the resource group from the cache file
+        _validators._ACCOUNT_IDS.filename = None
+        self.assertEqual(_validators._query_account_rg(self.cli_ctx, 'account1')[0], 'rg1')
+        self.resource_client.resources.list.assert_called_once()
+
+        # Expired entries are queried again
+        with mock.patch('time.time', return_value=_validators._ACCOUNT_ID_VALID_SECONDS * 2 + 1e10):
+            _validators._query_account_rg(self.cli_ctx, 'account1')
+        self.assertEqual(self.resource_client.resources.list.call_count, 2)
+
+    def test_query_account_rg_falls_back_to_list(self):
+        from azure.cli.command_modules.storage import _validators
+        self.resource_client.resources.list.return_value = []
+        account = mock.MagicMock(id='/subscriptions/sub1/resourceGroups/rg2/providers/Microsoft.Storage/'
+                                    'storageAccounts/account2')
+        account.name = 'account2'
+        self.storage_client.storage_accounts.list.return_value = [account]
+        self.assertEqual(_validators._query_account_rg(self.cli_ctx, 'account2')[0], 'rg2')
+        with self.assertRaisesRegex(ValueError, "Storage account 'account3' not found."):
+            _validators._query_account_rg(self.cli_ctx, 'account3')
+
+    def test_query_account_key_invalidates_stale_cache(self):
+        from azure.core.exceptions import HttpResponseError
+        from azure.cli.command_modules.storage import _validators
+        _validators._cache_account_id(self.cli_ctx, 'account1',
+                                      '/subscriptions/sub1/resourceGroups/old/providers/'
+                                      'Microsoft.Storage/storageAccounts/account1')
+
+        def _list_account_key(_, __, rg, ___):
+            if rg == 'old':
+                raise HttpResponseError(response=mock.MagicMock(status_code=404))
+            return 'secret-key'
+
+        with mock.patch('azure.cli.command_modules.storage._validators._list_account_key',
+                        side_effect=_list_account_key) as list_key_mock:
+            self.assertEqual(_validators._query_account_key(self.cli_ctx, 'account1'), 'secret-key')
+            self.assertEqual(list_key_mock.call_count, 2)
+            # The key is cached in memory only
+            self.assertEqual(_validators._query_account_key(self.cli_ctx, 'account1'), 'secret-key')
+            self.assertEqual(list_key_mock.call_count, 2)
+        self.assertEqual(_validators._get_cached_account_id(self.cli_ctx, 'account1'),
+                         '/subscriptions/sub1/resourceGroups/rg1/providers/Microsoft.Storage/storageAccounts/account1')
+        with open(os.path.join(self.temp_dir, _validators._ACCOUNT_IDS_FILE_NAME), encoding='utf-8-sig') as f:
+            self.assertNotIn('secret-key', f.read())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,10 @@ from azure.cli.core.profiles import ResourceType
 from datetime import datetime
 
 
+# The maximum number of directories listed concurrently when globbing a file share
+MAX_CONCURRENT_LISTINGS = 8
+
+
 def collect_blobs(blob_service, container, pattern=None):
     """
     List the blobs in the given blob container, filter the blob by comparing their path to the given pattern.
@@ -31,13 +35,17 @@ def collect_blob_objects(blob_service, container, pattern=None):
         if blob_service.exists(container, pattern):
             yield pattern, blob_service.get_blob_properties(container, pattern)
     else:
-        for blob in blob_service.list_blobs(container):
+        # Only list the blobs starting with the literal part of the pattern. As '*' matches any character including
+        # '/', all the blobs are matched when the pattern is the prefix followed by a single '*'.
+        prefix = _get_pattern_prefix(pattern)
+        match_all = not pattern or pattern == prefix + '*'
+        for blob in blob_service.list_blobs(container, prefix=prefix or None):
             try:
                 blob_name = blob.name.encode('utf-8') if isinstance(blob.name, unicode) else blob.name
             except NameError:
                 blob_name = blob.name
 
-            if not pattern or _match_path(blob_name, pattern):
+            if match_all or _match_path(blob_name, pattern):
                 yield blob_name, blob
 
 
@@ -89,20 +97,62 @@ def glob_files_locally(folder_path, pattern):
                 yield (full_path, full_path[len_folder_path:])
 
 
-def glob_files_remotely(cmd, client, share_name, pattern, snapshot=None):
-    """glob the files in remote file share based on the given pattern"""
+def glob_files_remotely(cmd, client, share_name, pattern, snapshot=None, max_workers=MAX_CONCURRENT_LISTINGS):
+    """
+    glob the files in remote file share based on the given pattern. Up to max_workers directories are listed
+    concurrently, and the files are yielded as soon as their directory is listed.
+    """
     from collections import deque
     t_dir, t_file = cmd.get_models('file.models#Directory', 'file.models#File')
 
-    queue = deque([""])
-    while queue:
-        current_dir = queue.pop()
-        for f in client.list_directories_and_files(share_name, current_dir, snapshot=snapshot):
+    # Directories are filtered locally, so they can be compared the same way as `_match_path` does, which folds case
+    # on Windows
+    prefix = os.path.normcase(_get_literal_prefix(pattern))
+
+    def _may_contain_matches(directory):
+        # '*' matches any character including '/', so only the literal prefix of the pattern can exclude a subtree
+        directory = os.path.normcase(directory + '/')
+        return directory.startswith(prefix) or prefix.startswith(directory)
+
+    def _list_directory(directory):
+        return list(client.list_directories_and_files(share_name, directory, snapshot=snapshot))
+
+    def _process_listing(current_dir, listing):
+        for f in listing:
             if isinstance(f, t_file):
                 if not pattern or _match_path(os.path.join(current_dir, f.name), pattern):
                     yield current_dir, f.name
             elif isinstance(f, t_dir):
-                queue.appendleft(os.path.join(current_dir, f.name))
+                sub_dir = os.path.join(current_dir, f.name)
+                if _may_contain_matches(sub_dir):
+                    queue.appendleft(sub_dir)
+
+    queue = deque([""])
+    if not max_workers or max_workers <= 1:
+        while queue:
+            current_dir = queue.pop()
+            for result in _process_listing(current_dir, _list_directory(current_dir)):
+                yield result
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+
+        def _submit_listings():
+            while queue and len(in_flight) < max_workers:
+                directory = queue.pop()
+                in_flight[executor.submit(_list_directory, directory)] = directory
+
+        _submit_listings()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = list(_process_listing(in_flight.pop(future), future.result()))
+                # Keep listing the sub directories while the consumer processes the files
+                _submit_listings()
+                for result in results:
+                    yield result
 
 
 def create_short_lived_blob_sas(cmd, account_name, account_key, container, blob):
@@ -187,6 +237,26 @@ def _pattern_has_wildcards(p):
     return not p or p.find('*') != -1 or p.find('?') != -1 or p.find('[') != -1
 
 
+def _get_pattern_prefix(pattern):
+    """Return the literal part of the pattern before its first wildcard, to list blobs by prefix.
+
+    Where the platform folds the case of paths, like on Windows, `_match_path` is case-insensitive. As listing by
+    prefix is case-sensitive, there is no literal prefix to filter on.
+    """
+    if os.path.normcase('A') != 'A':
+        return ''
+    return _get_literal_prefix(pattern)
+
+
+def _get_literal_prefix(pattern):
+    if not pattern:
+        return ''
+    for i, c in enumerate(pattern):
+        if c in '*?[':
+            return pattern[:i]
+    return pattern
+
+
 def _match_path(path, pattern):
     from fnmatch import fnmatch
     return fnmatch(path, pattern)
@@ -248,6 +318,71 @@ def check_precondition_success(func):
     return wrapper
 
 
+def run_concurrently(func, items, max_workers=1):
+    """
+    Call func for each of the items with a pool of max_workers threads and yield the results in the order of the
+    items. At most 2 * max_workers items are in flight, so items can be consumed while they are still produced.
+    """
+    if not max_workers or max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class BatchProgress:
+    """
+    Aggregate the progress of concurrent transfers into the progress_callback of a batch command.
+    """
+
+    def __init__(self, progress_callback, total_files, total_bytes=None):
+        import threading
+        self._progress_callback = progress_callback
+        self._total_files = total_files
+        self._total_bytes = total_bytes
+        self._lock = threading.Lock()
+        self._current = {}
+        self._totals = {}
+        self._completed = set()
+
+    def get_callback(self, key):
+        """Get the progress callback of a single transfer identified by key."""
+        if not self._progress_callback:
+            return None
+
+        def _update_progress(current, total):
+            with self._lock:
+                self._current[key] = current
+                self._totals[key] = total
+                self._report()
+        return _update_progress
+
+    def complete(self, key):
+        """Count the transfer identified by key as completed once it returns. Empty files never report progress."""
+        if not self._progress_callback:
+            return
+        with self._lock:
+            self._completed.add(key)
+            if key in self._totals:
+                self._current[key] = self._totals[key]
+            self._report()
+
+    def _report(self):
+        total = self._total_bytes if self._total_bytes is not None else sum(self._totals.values())
+        self._progress_callback.message = '{}/{} files'.format(len(self._completed), self._total_files or '?')
+        self._progress_callback(sum(self._current.values()), total)
+
+
 def get_datetime_from_string(dt_str):
     accepted_date_formats = ['%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%MZ',
                              '%Y-%m-%dT%HZ', '%Y-%m-%d']
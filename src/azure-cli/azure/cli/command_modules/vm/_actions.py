@@ -11,6 +11,8 @@
 # --------------------------------------------------------------------------
 
 import json
+import os
+import time
 
 from knack.util import CLIError
 from knack.log import get_logger
@@ -45,59 +47,104 @@ def _get_thread_count():
     return 5  # don't increase too much till https://github.com/Azure/msrestazure-for-python/issues/6 is fixed
 
 
+# The images of a location are indexed as {publisher: {offer: {sku: [version]}}} in a file per cloud, subscription and
+# location in IMAGE_INDEX_DIR_NAME. Each level records when it was listed and is listed again once it is older than
+# IMAGE_INDEX_VALID_SECONDS, so that a refresh only crawls the publishers, offers and SKUs which are new or stale.
+IMAGE_INDEX_DIR_NAME = 'vmImages'
+IMAGE_INDEX_VALID_SECONDS = 3600 * 24
+
+
 def load_images_thru_services(cli_ctx, publisher, offer, sku, location):
     from concurrent.futures import ThreadPoolExecutor, as_completed
-    all_images = []
+    from functools import partial
     client = _compute_client_factory(cli_ctx)
     if location is None:
         location = get_one_of_subscription_locations(cli_ctx)
+    index = _load_image_index(cli_ctx, location)
+    now = time.time()
 
-    def _load_images_from_publisher(publisher):
+    def _refresh(entry, list_names):
+        """List the children of an index entry again if it is stale, keeping the entries of the existing ones."""
         from azure.core.exceptions import ResourceNotFoundError
+        if _is_fresh(entry, now):
+            return True
         try:
-            offers = client.virtual_machine_images.list_offers(location, publisher)
+            names = [x.name for x in list_names()]
         except ResourceNotFoundError as e:
             logger.warning(str(e))
+            return False
+        children = entry.get('children', {})
+        entry['children'] = {name: children.get(name, {}) for name in names}
+        entry['timestamp'] = now
+        return True
+
+    def _load_images_from_publisher(publisher, publisher_entry):
+        if not _refresh(publisher_entry, partial(client.virtual_machine_images.list_offers, location, publisher)):
             return
-        if offer:
-            offers = [o for o in offers if _matched(offer, o.name)]
-        for o in offers:
-            try:
-                skus = client.virtual_machine_images.list_skus(location, publisher, o.name)
-            except ResourceNotFoundError as e:
-                logger.warning(str(e))
+        for o, offer_entry in publisher_entry['children'].items():
+            if not _matched(offer, o) or \
+                    not _refresh(offer_entry, partial(client.virtual_machine_images.list_skus, location, publisher, o)):
                 continue
-            if sku:
-                skus = [s for s in skus if _matched(sku, s.name)]
-            for s in skus:
-                try:
-                    images = client.virtual_machine_images.list(location, publisher, o.name, s.name)
-                except ResourceNotFoundError as e:
-                    logger.warning(str(e))
-                    continue
-                for i in images:
-                    all_images.append({
-                        'publisher': publisher,
-                        'offer': o.name,
-                        'sku': s.name,
-                        'version': i.name})
+            for s, sku_entry in offer_entry['children'].items():
+                if _matched(sku, s):
+                    _refresh(sku_entry, partial(client.virtual_machine_images.list, location, publisher, o, s))
 
-    publishers = client.virtual_machine_images.list_publishers(location)
-    if publisher:
-        publishers = [p for p in publishers if _matched(publisher, p.name)]
+    _refresh(index.data, partial(client.virtual_machine_images.list_publishers, location))
+    publishers = [(p, e) for p, e in index.data.get('children', {}).items() if _matched(publisher, p)]
 
     publisher_num = len(publishers)
     if publisher_num > 1:
         with ThreadPoolExecutor(max_workers=_get_thread_count()) as executor:
-            tasks = [executor.submit(_load_images_from_publisher, p.name) for p in publishers]
+            tasks = [executor.submit(_load_images_from_publisher, p, e) for p, e in publishers]
             for t in as_completed(tasks):
                 t.result()  # don't use the result but expose exceptions from the threads
     elif publisher_num == 1:
-        _load_images_from_publisher(publishers[0].name)
+        _load_images_from_publisher(*publishers[0])
+    index.save()
 
+    all_images = []
+    for p, publisher_entry in publishers:
+        for o, offer_entry in publisher_entry.get('children', {}).items():
+            if not _matched(offer, o):
+                continue
+            for s, sku_entry in offer_entry.get('children', {}).items():
+                if not _matched(sku, s):
+                    continue
+                for v in sku_entry.get('children', {}):
+                    all_images.append({
+                        'publisher': p,
+                        'offer': o,
+                        'sku': s,
+                        'version': v})
     return all_images
 
 
+def get_indexed_image_versions(cli_ctx, location, publisher, offer, sku):
+    """Get the versions of an image SKU from the image index, or None if the index doesn't have fresh versions."""
+    entry = _load_image_index(cli_ctx, location).data
+    for name in (publisher, offer, sku):
+        entry = next((e for n, e in entry.get('children', {}).items() if n.lower() == name.lower()), None)
+        if entry is None:
+            return None
+    return list(entry['children']) if _is_fresh(entry, time.time()) else None
+
+
+def _is_fresh(entry, now):
+    return 'children' in entry and now - entry.get('timestamp', 0) < IMAGE_INDEX_VALID_SECONDS
+
+
+def _load_image_index(cli_ctx, location):
+    from knack.util import ensure_dir
+    from azure.cli.core._session import Session
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    directory = os.path.join(cli_ctx.config.config_dir, IMAGE_INDEX_DIR_NAME)
+    ensure_dir(directory)
+    index = Session()
+    index.load(os.path.join(directory, '{}_{}_{}.json'.format(cli_ctx.cloud.name, get_subscription_id(cli_ctx),
+                                                              location).lower()))
+    return index
+
+
 def load_images_from_aliases_doc(cli_ctx, publisher=None, offer=None, sku=None):
     import requests
     from azure.cli.core.cloud import CloudEndpointNotSetException
@@ -227,7 +274,15 @@ def _create_image_instance(publisher, offer, sku, version):
     }
 
 
-def _get_latest_image_version(cli_ctx, location, publisher, offer, sku):
+def _get_latest_image_version(cli_ctx, location, publisher, offer, sku, use_index=False):
+    if use_index:
+        from packaging.version import parse, InvalidVersion  # pylint: disable=no-name-in-module,import-error
+        versions = get_indexed_image_versions(cli_ctx, location, publisher, offer, sku)
+        try:
+            if versions:
+                return max(versions, key=parse)
+        except InvalidVersion:
+            pass
     top_one = _compute_client_factory(cli_ctx).virtual_machine_images.list(location,
                                                                            publisher,
                                                                            offer,
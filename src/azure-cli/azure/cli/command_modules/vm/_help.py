@@ -1779,6 +1779,7 @@ short-summary: List the VM/VMSS images available in the Azure Marketplace.
 parameters:
   - name: --all
     short-summary: Retrieve image list from live Azure service rather using an offline image list
+    long-summary: The images are indexed per location in the configuration directory. Publishers, offers and SKUs retrieved within the last day are served from the index, others are retrieved again.
   - name: --offer -f
     short-summary: Image offer name, partial name is accepted
   - name: --publisher -p
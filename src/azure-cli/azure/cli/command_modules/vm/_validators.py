@@ -20,7 +20,7 @@ from azure.cli.core.commands.validators import (
     get_default_location_from_resource_group, validate_file_or_dict, validate_parameter_set, validate_tags)
 from azure.cli.core.util import (hash_string, DISALLOWED_USER_NAMES, get_default_admin_username)
 from azure.cli.command_modules.vm._vm_utils import (
-    check_existence, get_target_network_api, get_storage_blob_uri, list_sku_info)
+    check_existence, get_target_network_api, get_storage_blob_uri, get_sku_info)
 from azure.cli.command_modules.vm._template_builder import StorageProfile
 import azure.cli.core.keys as keys
 from azure.core.exceptions import ResourceNotFoundError
@@ -344,8 +344,7 @@ def _validate_location(cmd, namespace, zone_info, size_info):
     if not namespace.location:
         get_default_location_from_resource_group(cmd, namespace)
         if zone_info:
-            sku_infos = list_sku_info(cmd.cli_ctx, namespace.location)
-            temp = next((x for x in sku_infos if x.name.lower() == size_info.lower()), None)
+            temp = get_sku_info(cmd.cli_ctx, namespace.location, size_info)
             # For Stack (compute - 2017-03-30), Resource_sku doesn't implement location_info property
             if not hasattr(temp, 'location_info'):
                 return
@@ -6,6 +6,7 @@
 import json
 import os
 import re
+import time
 
 from azure.cli.core.commands.arm import ArmTemplateBuilder
 
@@ -110,17 +111,81 @@ def get_key_vault_base_url(cli_ctx, vault_name):
     return 'https://{}{}'.format(vault_name, suffix)
 
 
+# The resource SKUs of a location, shared by all the lookups of the current process and persisted in a file per
+# cloud, subscription and location in SKU_CATALOG_DIR_NAME for SKU_CATALOG_VALID_SECONDS
+_sku_catalogs = {}
+SKU_CATALOG_DIR_NAME = 'resourceSkus'
+SKU_CATALOG_VALID_SECONDS = 3600 * 24
+
+
 def list_sku_info(cli_ctx, location=None):
     from ._client_factory import _compute_client_factory
+    if location:
+        # The command lists the SKUs live, and refreshes the catalog for the lookups of other commands
+        skus, _ = _get_sku_catalog(cli_ctx, location, refresh=True)
+        return list(skus)
+    client = _compute_client_factory(cli_ctx)
+    return client.resource_skus.list()
+
+
+def get_sku_info(cli_ctx, location, name, resource_type='virtualMachines'):
+    """Get a SKU of the resource type by name, or None if it is not available in the location."""
+    _, index = _get_sku_catalog(cli_ctx, location)
+    return index.get(((resource_type or '').lower(), name.lower()))
 
-    def _match_location(loc, locations):
-        return next((x for x in locations if x.lower() == loc.lower()), None)
 
+def _get_sku_catalog(cli_ctx, location, refresh=False):
+    """Get the SKUs of a location, and an index of them by lower cased (resource type, name).
+
+    With refresh, the SKUs are listed again instead of read from the cache."""
+    from azure.cli.core.commands.client_factory import get_subscription_id
+    key = '{}_{}_{}'.format(cli_ctx.cloud.name, get_subscription_id(cli_ctx), location).lower()
+    catalog = None if refresh else _sku_catalogs.get(key)
+    if catalog is None:
+        session = _load_sku_catalog(cli_ctx, key)
+        skus = None if refresh else _get_cached_skus(cli_ctx, session)
+        if skus is None:
+            skus = _lookup_skus(cli_ctx, location)
+            with session.batch():
+                session['profile'] = cli_ctx.cloud.profile
+                session['timestamp'] = time.time()
+                session['skus'] = [sku.serialize(keep_readonly=True) for sku in skus]
+        index = {((sku.resource_type or '').lower(), sku.name.lower()): sku for sku in skus}
+        catalog = _sku_catalogs[key] = (skus, index)
+    return catalog
+
+
+def _lookup_skus(cli_ctx, location):
+    from ._client_factory import _compute_client_factory
+    from azure.cli.core.profiles import ResourceType, supported_api_version
     client = _compute_client_factory(cli_ctx)
-    result = client.resource_skus.list()
-    if location:
-        result = [r for r in result if _match_location(location, r.locations)]
-    return result
+    if supported_api_version(cli_ctx, ResourceType.MGMT_COMPUTE, min_api='2019-04-01',
+                             operation_group='resource_skus'):
+        # Only download the SKUs of the location instead of those of all the locations
+        skus = client.resource_skus.list(filter="location eq '{}'".format(location))
+    else:
+        skus = client.resource_skus.list()
+    return [sku for sku in skus if any(x.lower() == location.lower() for x in sku.locations or [])]
+
+
+def _load_sku_catalog(cli_ctx, key):
+    from knack.util import ensure_dir
+    from azure.cli.core._session import Session
+    directory = os.path.join(cli_ctx.config.config_dir, SKU_CATALOG_DIR_NAME)
+    ensure_dir(directory)
+    session = Session()
+    session.load(os.path.join(directory, key + '.json'))
+    return session
+
+
+def _get_cached_skus(cli_ctx, session):
+    from azure.cli.core.profiles import ResourceType, get_sdk
+    if session.get('profile') != cli_ctx.cloud.profile or \
+            time.time() - session.get('timestamp', 0) >= SKU_CATALOG_VALID_SECONDS:
+        return None
+    ResourceSku = get_sdk(cli_ctx, ResourceType.MGMT_COMPUTE, 'ResourceSku', mod='models',
+                          operation_group='resource_skus')
+    return [ResourceSku.deserialize(sku) for sku in session.get('skus', [])]
 
 
 # pylint: disable=too-many-statements
@@ -52,6 +52,9 @@ except ImportError:
 
 logger = get_logger(__name__)
 
+# The maximum number of requests in flight when retrieving the details of multiple VMs
+MAX_CONCURRENT_VM_REQUESTS = 10
+
 
 # Use the same name by portal, so people can update from both cli and portal
 # (VM doesn't allow multiple handlers for the same extension)
@@ -1110,23 +1113,33 @@ def get_vm_details(cmd, resource_group_name, vm_name, include_user_data=False):
     result = get_instance_view(cmd, resource_group_name, vm_name, include_user_data)
     network_client = get_mgmt_service_client(
         cmd.cli_ctx, ResourceType.MGMT_NETWORK, api_version=get_target_network_api(cmd.cli_ctx))
+
+    def _get_nic(nic_id):
+        nic_parts = parse_resource_id(nic_id)
+        return network_client.network_interfaces.get(nic_parts['resource_group'], nic_parts['name'])
+
+    def _get_public_ip(public_ip_id):
+        res = parse_resource_id(public_ip_id)
+        return network_client.public_ip_addresses.get(res['resource_group'], res['name'])
+
+    return _set_vm_details(result, _get_nic, _get_public_ip)
+
+
+def _set_vm_details(result, get_nic, get_public_ip):
     public_ips = []
     fqdns = []
     private_ips = []
     mac_addresses = []
     # pylint: disable=line-too-long,no-member
     for nic_ref in result.network_profile.network_interfaces:
-        nic_parts = parse_resource_id(nic_ref.id)
-        nic = network_client.network_interfaces.get(nic_parts['resource_group'], nic_parts['name'])
+        nic = get_nic(nic_ref.id)
         if nic.mac_address:
             mac_addresses.append(nic.mac_address)
         for ip_configuration in nic.ip_configurations:
             if ip_configuration.private_ip_address:
                 private_ips.append(ip_configuration.private_ip_address)
             if ip_configuration.public_ip_address:
-                res = parse_resource_id(ip_configuration.public_ip_address.id)
-                public_ip_info = network_client.public_ip_addresses.get(res['resource_group'],
-                                                                        res['name'])
+                public_ip_info = get_public_ip(ip_configuration.public_ip_address.id)
                 if public_ip_info.ip_address:
                     public_ips.append(public_ip_info.ip_address)
                 if public_ip_info.dns_settings:
@@ -1162,11 +1175,51 @@ def list_vm(cmd, resource_group_name=None, show_details=False):
     vm_list = ccf.virtual_machines.list(resource_group_name=resource_group_name) \
         if resource_group_name else ccf.virtual_machines.list_all()
     if show_details:
-        return [get_vm_details(cmd, _parse_rg_name(v.id)[0], v.name) for v in vm_list]
+        return _list_vm_details(cmd, list(vm_list), resource_group_name)
 
     return list(vm_list)
 
 
+def _list_vm_details(cmd, vms, resource_group_name=None):
+    """
+    Return the VMs with the details added by `vm show -d`. NICs and public IPs are listed once and looked up by id
+    instead of being retrieved for each VM, and the instance views are retrieved concurrently.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from msrestazure.tools import parse_resource_id
+    from azure.cli.command_modules.vm._vm_utils import get_target_network_api
+    if not vms:
+        return []
+    network_client = get_mgmt_service_client(
+        cmd.cli_ctx, ResourceType.MGMT_NETWORK, api_version=get_target_network_api(cmd.cli_ctx))
+
+    def _list_by_id(operations):
+        items = operations.list(resource_group_name) if resource_group_name else operations.list_all()
+        return {item.id.lower(): item for item in items}
+
+    def _get_instance_view(vm):
+        return get_instance_view(cmd, *_parse_rg_name(vm.id))
+
+    def _get_by_id(items, operations):
+        def _get(resource_id):
+            item = items.get(resource_id.lower())
+            if item is None:
+                # e.g. a NIC in another resource group than its VM
+                parts = parse_resource_id(resource_id)
+                item = items[resource_id.lower()] = operations.get(parts['resource_group'], parts['name'])
+            return item
+        return _get
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_VM_REQUESTS) as executor:
+        nics = executor.submit(_list_by_id, network_client.network_interfaces)
+        public_ips = executor.submit(_list_by_id, network_client.public_ip_addresses)
+        results = list(executor.map(_get_instance_view, vms))
+        get_nic = _get_by_id(nics.result(), network_client.network_interfaces)
+        get_public_ip = _get_by_id(public_ips.result(), network_client.public_ip_addresses)
+
+    return [_set_vm_details(result, get_nic, get_public_ip) for result in results]
+
+
 def list_vm_ip_addresses(cmd, resource_group_name=None, vm_name=None):
     # We start by getting NICs as they are the smack in the middle of all data that we
     # want to collect for a VM (as long as we don't need any info on the VM than what
@@ -1854,7 +1907,7 @@ def show_vm_image(cmd, urn=None, publisher=None, offer=None, sku=None, version=N
             raise InvalidArgumentValueError('--urn should be in the format of publisher:offer:sku:version')
         publisher, offer, sku, version = urn.split(":")
         if version.lower() == 'latest':
-            version = _get_latest_image_version(cmd.cli_ctx, location, publisher, offer, sku)
+            version = _get_latest_image_version(cmd.cli_ctx, location, publisher, offer, sku, use_index=True)
     elif not publisher or not offer or not sku or not version:
         raise RequiredArgumentMissingError(error_msg)
     client = _compute_client_factory(cmd.cli_ctx)
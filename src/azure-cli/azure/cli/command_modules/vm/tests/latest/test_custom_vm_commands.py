@@ -14,7 +14,7 @@ from azure.cli.command_modules.vm.custom import (enable_boot_diagnostics, disabl
                                                  _LINUX_ACCESS_EXT,
                                                  _WINDOWS_ACCESS_EXT,
                                                  _get_extension_instance_name,
-                                                 get_boot_log)
+                                                 get_boot_log, list_vm)
 from azure.cli.command_modules.vm.custom import \
     (attach_unmanaged_data_disk, detach_data_disk, get_vmss_instance_view)
 
@@ -225,6 +225,49 @@ class TestVmCustom(unittest.TestCase):
         vm_client.virtual_machine_scale_set_vms.list.assert_called_once_with('rg1', 'vmss1', expand='instanceView',
                                                                              select='instanceView')
 
+    @mock.patch('azure.cli.command_modules.vm.custom.get_mgmt_service_client')
+    @mock.patch('azure.cli.command_modules.vm.custom._compute_client_factory')
+    def test_list_vm_with_details(self, factory_mock, network_client_factory_mock):
+        prefix = '/subscriptions/sub1/resourceGroups/rg1/providers/'
+        vm_client = mock.MagicMock()
+        network_client = mock.MagicMock()
+        factory_mock.return_value = vm_client
+        network_client_factory_mock.return_value = network_client
+
+        def _make_vm(name, nic_id):
+            vm = mock.MagicMock()
+            vm.id = prefix + 'Microsoft.Compute/virtualMachines/' + name
+            vm.name = name
+            vm.network_profile.network_interfaces = [mock.MagicMock(id=nic_id)]
+            vm.instance_view.statuses = [InstanceViewStatus(code='PowerState/running', display_status='VM running')]
+            return vm
+
+        def _make_nic(nic_id, private_ip, public_ip_id=None):
+            ip_configuration = mock.MagicMock(private_ip_address=private_ip)
+            ip_configuration.public_ip_address = mock.MagicMock(id=public_ip_id) if public_ip_id else None
+            return mock.MagicMock(id=nic_id, mac_address=None, ip_configurations=[ip_configuration])
+
+        nic1_id = prefix + 'Microsoft.Network/networkInterfaces/nic1'
+        nic2_id = '/subscriptions/sub1/resourceGroups/rg2/providers/Microsoft.Network/networkInterfaces/nic2'
+        public_ip_id = prefix + 'Microsoft.Network/publicIPAddresses/ip1'
+        vms = {'vm1': _make_vm('vm1', nic1_id.upper()), 'vm2': _make_vm('vm2', nic2_id)}
+        vm_client.virtual_machines.list.return_value = list(vms.values())
+        vm_client.virtual_machines.get.side_effect = lambda _, name, **__: vms[name]
+        network_client.network_interfaces.list.return_value = [_make_nic(nic1_id, '10.0.0.4', public_ip_id)]
+        network_client.network_interfaces.get.return_value = _make_nic(nic2_id, '10.0.0.5')
+        network_client.public_ip_addresses.list.return_value = [
+            mock.MagicMock(id=public_ip_id, ip_address='1.2.3.4', dns_settings=None)]
+
+        result = list_vm(_get_test_cmd(), 'rg1', show_details=True)
+
+        self.assertEqual([(r.name, r.power_state, r.private_ips, r.public_ips) for r in result],
+                         [('vm1', 'VM running', '10.0.0.4', '1.2.3.4'), ('vm2', 'VM running', '10.0.0.5', '')])
+        # NICs and public IPs are listed once, only the NIC in another resource group is retrieved by name
+        network_client.network_interfaces.list.assert_called_once_with('rg1')
+        network_client.public_ip_addresses.list.assert_called_once_with('rg1')
+        network_client.network_interfaces.get.assert_called_once_with('rg2', 'nic2')
+        network_client.public_ip_addresses.get.assert_not_called()
+
     # pylint: disable=line-too-long
     @mock.patch('azure.cli.command_modules.vm.disk_encryption._compute_client_factory', autospec=True)
     @mock.patch('azure.cli.command_modules.vm.disk_encryption._get_keyvault_key_url', autospec=True)
@@ -6,6 +6,7 @@
 import os
 import shutil
 import tempfile
+import time
 import unittest
 import mock
 
@@ -21,7 +22,7 @@ from azure.cli.command_modules.vm._validators import (validate_ssh_key,
                                                       _validate_vm_vmss_msi,
                                                       _validate_vm_vmss_accelerated_networking,
                                                       process_gallery_image_version_namespace)
-from azure.cli.command_modules.vm._vm_utils import normalize_disk_info, update_disk_sku_info
+from azure.cli.command_modules.vm._vm_utils import normalize_disk_info, update_disk_sku_info, list_sku_info, get_sku_info
 from azure.cli.core.mock import DummyCli
 from knack.util import CLIError
 
@@ -661,6 +662,57 @@ class TestActions(unittest.TestCase):
             else:
                 self.fail("Test Expected value should be a dict or None, instead it is {}.".format(expected))
 
+    @mock.patch('azure.cli.command_modules.vm._vm_utils._sku_catalogs', new_callable=dict)
+    @mock.patch('azure.cli.command_modules.vm._client_factory._compute_client_factory', autospec=True)
+    def test_sku_catalog(self, client_factory_mock, _):
+        from azure.cli.core.profiles import ResourceType, get_sdk
+        from azure.cli.command_modules.vm import _vm_utils
+        ResourceSku = get_sdk(DummyCli(), ResourceType.MGMT_COMPUTE, 'ResourceSku', mod='models',
+                              operation_group='resource_skus')
+        skus = [ResourceSku.deserialize({'resourceType': 'virtualMachines', 'name': 'Standard_DS1_v2',
+                                         'locations': ['westus'], 'locationInfo': [{'location': 'westus',
+                                                                                    'zones': ['1', '2']}]}),
+                ResourceSku.deserialize({'resourceType': 'disks', 'name': 'Premium_LRS', 'locations': ['westus']}),
+                ResourceSku.deserialize({'resourceType': 'disks', 'name': 'Premium_LRS', 'locations': ['eastus']})]
+        client_factory_mock.return_value.resource_skus.list.return_value = skus
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        cli_ctx = mock.MagicMock()
+        cli_ctx.config.config_dir = temp_dir
+        cli_ctx.cloud.name = 'AzureCloud'
+        cli_ctx.cloud.profile = 'latest'
+        cli_ctx.data = {'subscription_id': 'sub1'}
+
+        self.assertEqual([(x.resource_type, x.name) for x in list_sku_info(cli_ctx, 'westus')],
+                         [('virtualMachines', 'Standard_DS1_v2'), ('disks', 'Premium_LRS')])
+        client_factory_mock.return_value.resource_skus.list.assert_called_once_with(filter="location eq 'westus'")
+        self.assertEqual(get_sku_info(cli_ctx, 'westus', 'standard_ds1_v2').location_info[0].zones, ['1', '2'])
+        self.assertIsNone(get_sku_info(cli_ctx, 'westus', 'Premium_LRS'))
+
+        # Other commands load the SKUs from the file instead of listing them again
+        _vm_utils._sku_catalogs.clear()
+        client_factory_mock.reset_mock()
+        self.assertEqual(get_sku_info(cli_ctx, 'westus', 'Premium_LRS', 'disks').name, 'Premium_LRS')
+        self.assertEqual(get_sku_info(cli_ctx, 'westus', 'Standard_DS1_v2').location_info[0].zones, ['1', '2'])
+        client_factory_mock.return_value.resource_skus.list.assert_not_called()
+
+        # The SKUs are listed again once they expire
+        _vm_utils._sku_catalogs.clear()
+        with mock.patch('time.time', return_value=time.time() + _vm_utils.SKU_CATALOG_VALID_SECONDS):
+            get_sku_info(cli_ctx, 'westus', 'Standard_DS1_v2')
+        client_factory_mock.return_value.resource_skus.list.assert_called_once_with(filter="location eq 'westus'")
+
+        # list-skus always lists the SKUs, and the result replaces the cached SKUs
+        client_factory_mock.reset_mock()
+        client_factory_mock.return_value.resource_skus.list.return_value = skus[1:]
+        self.assertEqual([(x.resource_type, x.name) for x in list_sku_info(cli_ctx, 'westus')],
+                         [('disks', 'Premium_LRS')])
+        client_factory_mock.return_value.resource_skus.list.assert_called_once_with(filter="location eq 'westus'")
+        self.assertIsNone(get_sku_info(cli_ctx, 'westus', 'Standard_DS1_v2'))
+        _vm_utils._sku_catalogs.clear()
+        self.assertIsNone(get_sku_info(cli_ctx, 'westus', 'Standard_DS1_v2'))
+        client_factory_mock.return_value.resource_skus.list.assert_called_once()
+
     def test_process_gallery_image_version_namespace(self):
         from azure.cli.core.profiles._shared import AZURE_API_PROFILES, ResourceType
         np = mock.MagicMock(spec='target_regions')
@@ -70,6 +70,64 @@ class TestVMImage(unittest.TestCase):
         self.assertEqual(images[0], {'urnAlias': 'CentOS', 'publisher': 'OpenLogic',
                                      'offer': 'CentOS', 'sku': '7.5', 'version': 'latest'})
 
+    @mock.patch('azure.cli.command_modules.vm._actions._compute_client_factory', autospec=True)
+    def test_load_images_thru_services_with_index(self, client_factory_mock):
+        import shutil
+        import tempfile
+        import time
+        from azure.cli.command_modules.vm._actions import (load_images_thru_services, _get_latest_image_version,
+                                                           IMAGE_INDEX_VALID_SECONDS)
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        cli_ctx = mock.MagicMock()
+        cli_ctx.config.config_dir = temp_dir
+        cli_ctx.cloud.name = 'AzureCloud'
+        cli_ctx.data = {'subscription_id': 'sub1'}
+
+        def _names(*names):
+            result = []
+            for name in names:
+                item = mock.MagicMock()
+                item.name = name
+                result.append(item)
+            return result
+
+        images = client_factory_mock.return_value.virtual_machine_images
+        images.list_publishers.return_value = _names('Canonical', 'OpenLogic')
+        images.list_offers.side_effect = lambda _, publisher: _names('UbuntuServer') if publisher == 'Canonical' \
+            else _names('CentOS')
+        images.list_skus.side_effect = lambda _, __, offer: _names('18.04-LTS', '16.04-LTS') \
+            if offer == 'UbuntuServer' else _names('7.5')
+        images.list.return_value = _names('1.0.9', '1.0.10')
+
+        result = load_images_thru_services(cli_ctx, None, 'ubuntu', '18.04', 'westus')
+        self.assertEqual(result, [{'publisher': 'Canonical', 'offer': 'UbuntuServer', 'sku': '18.04-LTS',
+                                   'version': v} for v in ('1.0.9', '1.0.10')])
+        # Only the matching offers and SKUs are crawled
+        self.assertEqual(images.list_skus.call_count, 1)
+        images.list.assert_called_once_with('westus', 'Canonical', 'UbuntuServer', '18.04-LTS')
+
+        # The index answers the same query and resolves the latest version without calling the service
+        client_factory_mock.reset_mock()
+        self.assertEqual(load_images_thru_services(cli_ctx, 'canonical', 'Ubuntu', '18.04', 'westus'), result)
+        self.assertEqual(_get_latest_image_version(cli_ctx, 'westus', 'canonical', 'ubuntuserver', '18.04-lts',
+                                                   use_index=True), '1.0.10')
+        self.assertEqual(client_factory_mock.return_value.mock_calls, [])
+
+        # A broader query only crawls what is not indexed yet
+        result = load_images_thru_services(cli_ctx, None, None, None, 'westus')
+        self.assertEqual(len(result), 6)
+        self.assertEqual(images.list_skus.call_count, 1)
+        self.assertEqual(images.list.call_count, 2)
+
+        # Stale entries are crawled again
+        images.reset_mock()
+        with mock.patch('time.time', return_value=time.time() + IMAGE_INDEX_VALID_SECONDS):
+            load_images_thru_services(cli_ctx, 'OpenLogic', None, None, 'westus')
+        images.list_publishers.assert_called_once_with('westus')
+        images.list_offers.assert_called_once_with('westus', 'OpenLogic')
+        images.list.assert_called_once_with('westus', 'OpenLogic', 'CentOS', '7.5')
+
 
 if __name__ == '__main__':
     unittest.main()